@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+"""命令行入口：python -m ifc_prop_getter"""
+
+import sys
+
+from ifc_prop_getter.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
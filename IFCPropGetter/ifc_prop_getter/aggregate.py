@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+"""
+汇总模块：在提取过程中按分组字段累计构件数、合计、最小值、最大值与不同值数，只输出汇总表。
+内存占用取决于分组数量（distinct 另需保存每组的不同值），与构件数量无关。
+
+分组字段与汇总项以逗号分隔，字段写法与行过滤相同（GlobalId、Name、Class、Site、Building、Storey
+或提取列表中的属性，可加方括号）：
+  分组    Storey, [Cast unit Mark], Class
+  汇总    count, sum(Weight), min([Cast unit top elevation]), max(Weight), distinct(GlobalId), count(Weight)
+count 为分组的构件数，count(字段) 为该字段有值的构件数；sum/min/max 只统计可转为数值的值。
+"""
+
+import re
+
+from ifc_prop_getter import rowstore
+from ifc_prop_getter.row_filter import SPECIAL_FIELDS, as_number
+from ifc_prop_getter.spatial import LOCATION_FIELDS, NO_LOCATION
+
+# 汇总函数 → 输出列名前缀
+MEASURE_LABELS = {"count": "计数", "sum": "合计", "min": "最小值", "max": "最大值", "distinct": "不同值数"}
+
+# 不带字段的 count 的输出列名
+COUNT_LABEL = "构件数"
+
+_MEASURE = re.compile(r"(\w+)\s*(?:\(\s*(.*?)\s*\))?$", re.DOTALL)
+
+_MEASURE_KINDS = {"count": rowstore.KIND_INT, "distinct": rowstore.KIND_INT, "sum": rowstore.KIND_FLOAT,
+                  "min": rowstore.KIND_FLOAT, "max": rowstore.KIND_FLOAT}
+
+
+def _split_list(text):
+    """按逗号拆分，方括号与圆括号内的逗号不拆分"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char in "[(":
+            depth += 1
+        elif char in "])":
+            depth -= 1
+        if char == "," and depth <= 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _field_name(text):
+    text = text.strip()
+    return text[1:-1].strip() if text.startswith("[") and text.endswith("]") else text
+
+
+def _sort_key(key):
+    """分组排序：数值在前按大小，文本按字典序，缺失值最后"""
+    return tuple((value is None, isinstance(value, str), "" if value is None else value) for value in key)
+
+
+class Aggregation:
+    """
+    编译后的汇总规格。group_by 为分组字段列表，measures 为 [(函数, 字段或 None)]；
+    字段须为内置字段或提取列表中的属性，否则抛出 ValueError。
+    """
+
+    def __init__(self, group_by, measures, properties):
+        slots = {}
+        for idx, prop in enumerate(properties):
+            slots.setdefault(prop, idx)
+
+        def source(name):
+            if name in SPECIAL_FIELDS:
+                return name
+            if name not in slots:
+                raise ValueError(f"字段不在提取列表中: {name}")
+            return slots[name]
+
+        self.group_by = list(group_by)
+        self.measures = list(measures) or [("count", None)]
+        self._group_sources = [source(name) for name in self.group_by]
+        self._measure_sources = []
+        for func, field in self.measures:
+            if func not in MEASURE_LABELS:
+                raise ValueError(f"未知的汇总函数: {func}（可选 {', '.join(MEASURE_LABELS)}）")
+            if field is None and func != "count":
+                raise ValueError(f"{func} 需要指定字段，例如 {func}(Weight)")
+            self._measure_sources.append(None if field is None else source(field))
+        self.fields = self.group_by + [field for _, field in self.measures if field is not None]
+        self.columns = self.group_by + [COUNT_LABEL if field is None else f"{MEASURE_LABELS[func]}({field})"
+                                        for func, field in self.measures]
+        duplicated = {column for column in self.columns if self.columns.count(column) > 1}
+        if duplicated:
+            raise ValueError(f"汇总表中有重复的列: {', '.join(sorted(duplicated))}")
+
+    def accumulator(self, property_kinds=None):
+        """
+        创建累加器。property_kinds 为与提取列表对齐的列类型（类型化模式），
+        分组值按该类型转换，缺失为 None；为 None 时分组值为字符串，缺失为 N/A。
+        """
+        return _Accumulator(self, property_kinds)
+
+
+class _Accumulator:
+    """按分组累计汇总值：add() 每个构件调用一次，to_store() 生成按分组排序的汇总表"""
+
+    def __init__(self, aggregation, property_kinds):
+        self.aggregation = aggregation
+        self.groups = {}   # {分组值元组: [各汇总项的状态]}
+        self.elements = 0
+        specials = {"GlobalId": lambda row: row[2], "Name": lambda row: row[3], "Class": lambda row: row[1]}
+        specials.update((field, lambda row, i=i: row[4][i]) for i, field in enumerate(LOCATION_FIELDS))
+
+        # 取值函数的参数为 (values, ifc_class, global_id, name, location) 元组
+        def getter(src):
+            if isinstance(src, str):
+                return specials[src]
+            return lambda row: row[0][src]
+
+        self._group_getters = [getter(src) for src in aggregation._group_sources]
+        self._group_converters = []
+        self.kinds = []
+        for src in aggregation._group_sources:
+            if property_kinds is None or isinstance(src, str):
+                self._group_converters.append(str)
+                self.kinds.append(rowstore.KIND_STRING)
+            else:
+                self._group_converters.append(rowstore.converter(property_kinds[src]))
+                self.kinds.append(property_kinds[src])
+        self._missing = rowstore.MISSING if property_kinds is None else None
+        self._measures = [(func, None if src is None else getter(src))
+                          for (func, _), src in zip(aggregation.measures, aggregation._measure_sources)]
+        self.kinds += [_MEASURE_KINDS[func] for func, _ in aggregation.measures]
+
+    def __len__(self):
+        return len(self.groups)
+
+    def add(self, values, ifc_class, global_id, name, location=NO_LOCATION):
+        row = (values, ifc_class, global_id, name, location)
+        missing = self._missing
+        key = tuple(missing if value is None else convert(value)
+                    for value, convert in zip((get(row) for get in self._group_getters), self._group_converters))
+        states = self.groups.get(key)
+        if states is None:
+            states = self.groups[key] = [set() if func == "distinct" else 0 if func == "count" else None
+                                         for func, _ in self._measures]
+        self.elements += 1
+        for i, (func, get) in enumerate(self._measures):
+            if get is None:
+                states[i] += 1
+                continue
+            value = get(row)
+            if value is None:
+                continue
+            if func == "count":
+                states[i] += 1
+            elif func == "distinct":
+                states[i].add(str(value))
+            else:
+                number = as_number(value)
+                if number is None:
+                    continue
+                current = states[i]
+                if current is None:
+                    states[i] = number
+                elif func == "sum":
+                    states[i] = current + number
+                elif func == "min":
+                    if number < current:
+                        states[i] = number
+                elif number > current:
+                    states[i] = number
+
+    def to_store(self):
+        """按分组排序输出为类型化的 rowstore.ColumnStore"""
+        store = rowstore.ColumnStore(self.aggregation.columns, self.kinds)
+        for key in sorted(self.groups, key=lambda key: _sort_key(None if value == self._missing else value
+                                                                   for value in key)):
+            states = self.groups[key]
+            row = list(key)
+            for (func, _), state in zip(self._measures, states):
+                if func == "distinct":
+                    row.append(len(state))
+                elif func == "count" or state is None:
+                    row.append(state)
+                else:
+                    row.append(float(state))
+            store.append(row)
+        return store
+
+
+def parse_measures(text):
+    """解析汇总项文本，返回 [(函数, 字段或 None)]；格式错误时抛出 ValueError"""
+    measures = []
+    for part in _split_list(text or ""):
+        match = _MEASURE.match(part)
+        if match is None:
+            raise ValueError(f"无法识别的汇总项: {part}（例如 sum(Weight)）")
+        func, field = match.group(1).lower(), match.group(2)
+        measures.append((func, _field_name(field) if field else None))
+    return measures
+
+
+def parse_fields(text):
+    """解析以逗号分隔的分组字段文本"""
+    return [_field_name(part) for part in _split_list(text or "")]
+
+
+def compile_aggregation(group_by, measures, properties):
+    """
+    由分组字段与汇总项（文本或列表）编译汇总规格；两者均为空时返回 None（不汇总）。
+    measures 为空时只统计构件数。格式错误或字段不在提取列表中时抛出 ValueError
+    """
+    if isinstance(group_by, str):
+        group_by = parse_fields(group_by)
+    if isinstance(measures, str):
+        measures = parse_measures(measures)
+    if not group_by and not measures:
+        return None
+    return Aggregation(group_by or [], [(str(func).lower(), field) for func, field in measures or ()], properties)
\ No newline at end of file
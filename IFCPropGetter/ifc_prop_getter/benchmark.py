@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+
+"""
+基准测试模块：生成合成 IFC 模型，分阶段计时并记录峰值内存，结果写入 JSON 便于跨提交对比。
+用法: python -m ifc_prop_getter.benchmark --elements 20000 -o bench.json [--compare old.json]
+      python -m ifc_prop_getter.benchmark --startup --repeat 5 -o startup.json  （只测量界面启动）
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+# 结果文件格式版本
+BENCHMARK_VERSION = 1
+
+# 在新的解释器中启动界面：窗口可交互时输出 ready，后台预导入完成后输出各阶段耗时（JSON）
+_STARTUP_SCRIPT = r"""
+import json, time
+started = time.perf_counter()
+from ifc_prop_getter import gui
+result = {'import': time.perf_counter() - started}
+try:
+    app = gui.IFCPropertyExtractorApp()
+except Exception as e:
+    result['error'] = f"无法创建窗口: {e}"
+else:
+    app.root.update()
+    ready = time.perf_counter()
+    print("ready", flush=True)
+    app.warm_up_thread.join()
+    result['warm_up'] = time.perf_counter() - ready
+    app.root.destroy()
+print(json.dumps(result), flush=True)
+"""
+
+
+class _PhaseRecorder:
+    """
+    代替消息队列传给提取函数：记录每个阶段最后一次进度消息中的耗时，
+    以及收到每条消息的时间，用于计算没有进度消息的阶段（如构建 DataFrame）。
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self.rows = 0
+        self.error = None
+        self.last_time = time.perf_counter()
+
+    def put(self, msg):
+        self.last_time = time.perf_counter()
+        mtype = msg.get('type')
+        if mtype == 'progress':
+            self.phases[msg['phase']] = round(msg['elapsed'], 4)
+        elif mtype == 'complete':
+            self.rows = msg.get('rows', 0)
+        elif mtype == 'error' and self.error is None:
+            self.error = msg['message']
+
+
+def _peak_rss_mb():
+    """本进程与已结束子进程的峰值常驻内存 (MB)；平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    usage = [resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return round(max(usage) / scale, 1)
+
+
+def _run_stream_case(ifc_path, properties, engine, file_format, workers, output_dir):
+    """默认流程：调用 extract_properties，提取与写出交替进行（extract 阶段包含写出）"""
+    from ifc_prop_getter import extractor
+
+    recorder = _PhaseRecorder()
+    started = time.perf_counter()
+    extractor.extract_properties(ifc_path, properties, True, True, output_dir, "bench", file_format,
+                                 recorder, threading.Event(), engine=engine, workers=workers)
+    return {
+        'phases': recorder.phases,
+        'total': round(time.perf_counter() - started, 4),
+        'rows': recorder.rows,
+        'error': recorder.error,
+    }
+
+
+def _run_dataframe_case(ifc_path, properties, engine, file_formats, workers, output_dir):
+    """完整结果流程（增量对比、缓存时使用）：先构建 DataFrame，再按各格式分别写出"""
+    from ifc_prop_getter import extractor, utils, writers
+    from ifc_prop_getter.constants import OUTPUT_FORMATS
+
+    recorder = _PhaseRecorder()
+    started = time.perf_counter()
+    store = extractor.extract_table(ifc_path, properties, True, True, recorder, threading.Event(), engine=engine,
+                                    workers=workers)
+    if store is None:
+        return {'phases': recorder.phases, 'total': None, 'rows': 0, 'error': recorder.error}
+    df = store.to_dataframe()
+    # 提取阶段最后一条消息之后到返回之间即为 ColumnStore → DataFrame 的耗时
+    phases = dict(recorder.phases, dataframe=round(time.perf_counter() - recorder.last_time, 4))
+    for file_format in file_formats:
+        path = os.path.join(output_dir, utils.make_output_filename("bench_df", OUTPUT_FORMATS[file_format]))
+        write_started = time.perf_counter()
+        writers.write_dataframe(df, path, file_format)
+        phases[f"write_{file_format}"] = round(time.perf_counter() - write_started, 4)
+    return {'phases': phases, 'total': round(time.perf_counter() - started, 4), 'rows': len(df), 'error': None}
+
+
+def _run_case(case):
+    """在独立子进程中执行一个用例，使峰值内存只反映该用例"""
+    with tempfile.TemporaryDirectory(prefix="ifc_bench_") as output_dir:
+        if case['mode'] == "dataframe":
+            result = _run_dataframe_case(case['ifc_path'], case['properties'], case['engine'], case['formats'],
+                                         case['workers'], output_dir)
+        else:
+            result = _run_stream_case(case['ifc_path'], case['properties'], case['engine'], case['formats'][0],
+                                      case['workers'], output_dir)
+    result['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def measure_startup():
+    """
+    在新的子进程中启动一次界面，返回结果条目。各阶段：import 为导入 gui 模块的耗时；
+    interactive 为从启动进程到窗口绘制完成、可以响应操作的耗时（含解释器启动）；
+    warm_up 为窗口可交互后后台预导入提取模块的耗时。没有图形显示时只记录 import，并在 error 中说明
+    """
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [package_root, env.get('PYTHONPATH')]))
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", _STARTUP_SCRIPT], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True, encoding="utf-8", env=env)
+    phases, error = {}, None
+    for line in proc.stdout:
+        if line.strip() == "ready":
+            phases['interactive'] = time.perf_counter() - started
+        elif line.strip():
+            result = json.loads(line)
+            error = result.pop('error', None)
+            phases.update(result)
+    stderr = proc.stderr.read()
+    if proc.wait() != 0:
+        error = error or (stderr.strip().splitlines()[-1] if stderr.strip() else f"退出码 {proc.returncode}")
+    return {'mode': "startup", 'engine': "gui", 'formats': [], 'workers': 1, 'phases': phases,
+            'total': phases.get('interactive'), 'rows': None, 'peak_rss_mb': None, 'error': error}
+
+
+def _git_commit():
+    """当前源码所在仓库的提交号；不在 git 仓库中时返回 None"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _environment():
+    import ifcopenshell
+    import pandas
+    return {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'ifcopenshell': getattr(ifcopenshell, "version", None),
+        'pandas': pandas.__version__,
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def build_cases(ifc_path, properties, engines, formats, workers, repeat, modes):
+    """展开用例列表：每个引擎 × 输出格式（流式流程）与每个引擎（DataFrame 流程），各重复 repeat 次"""
+    cases = []
+    for _ in range(repeat):
+        for engine in engines:
+            if "stream" in modes:
+                for file_format in formats:
+                    cases.append({'mode': "stream", 'engine': engine, 'formats': [file_format]})
+            if "dataframe" in modes:
+                cases.append({'mode': "dataframe", 'engine': engine, 'formats': list(formats)})
+    for case in cases:
+        case.update(ifc_path=ifc_path, properties=properties, workers=workers)
+    return cases
+
+
+def run_cases(cases, report=None):
+    """逐个在新的子进程中执行用例，返回结果列表；report(用例, 结果) 在每个用例结束后调用"""
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(_run_case, case).result()
+        entry = {key: case[key] for key in ("mode", "engine", "formats", "workers")}
+        entry.update(result)
+        results.append(entry)
+        if report is not None:
+            report(case, entry)
+    return results
+
+
+def _case_label(entry):
+    if entry['mode'] == "startup":
+        return "startup/gui"
+    return f"{entry['mode']}/{entry['engine']}/{'+'.join(entry['formats'])}/w{entry['workers']}"
+
+
+def compare(current, baseline):
+    """按用例对比两次结果的阶段耗时中位数，返回 [(用例, 阶段, 基线秒数, 当前秒数, 比值)]"""
+    def medians(data):
+        grouped = {}
+        for entry in data['results']:
+            phases = dict(entry['phases'])
+            if entry.get('total') is not None:
+                phases['total'] = entry['total']
+            if entry.get('peak_rss_mb') is not None:
+                phases['peak_rss_mb'] = entry['peak_rss_mb']
+            for phase, value in phases.items():
+                grouped.setdefault((_case_label(entry), phase), []).append(value)
+        return {key: sorted(values)[len(values) // 2] for key, values in grouped.items()}
+
+    old = medians(baseline)
+    rows = []
+    for key, value in sorted(medians(current).items()):
+        if key in old:
+            ratio = value / old[key] if old[key] else None
+            rows.append((key[0], key[1], old[key], value, ratio))
+    return rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ifc_prop_getter.benchmark",
+        description="生成合成 IFC 模型并测量各阶段耗时与峰值内存")
+    parser.add_argument("--input", help="使用已有 IFC 文件而不生成合成模型")
+    parser.add_argument("-p", "--properties", help="属性列表文件（每行一个属性名）；默认按合成模型生成")
+    parser.add_argument("--elements", type=int, default=20000, help="构件数，默认 %(default)s")
+    parser.add_argument("--psets", type=int, default=3, help="每个构件的属性集数，默认 %(default)s")
+    parser.add_argument("--props", type=int, default=6, help="每个属性集的属性数，默认 %(default)s")
+    parser.add_argument("--types", type=int, default=20, help="类型对象数，默认 %(default)s")
+    parser.add_argument("--type-share", type=float, default=0.5, help="关联类型对象的构件比例，默认 %(default)s")
+    parser.add_argument("--missing", type=float, default=0.2, help="属性缺失比例，默认 %(default)s")
+    parser.add_argument("--seed", type=int, default=1, help="随机种子，默认 %(default)s")
+    parser.add_argument("--engines", default="ifcopenshell,stream", help="逗号分隔的解析引擎，默认 %(default)s")
+    parser.add_argument("--formats", default="CSV,Excel", help="逗号分隔的输出格式，默认 %(default)s")
+    parser.add_argument("--modes", default="stream,dataframe",
+                        help="stream 为默认的边提取边写出流程，dataframe 为构建完整 DataFrame 后写出，默认 %(default)s")
+    parser.add_argument("--workers", type=int, default=1, help="单个文件内部的并行进程数，默认 1")
+    parser.add_argument("--repeat", type=int, default=1, help="每个用例的重复次数，默认 %(default)s")
+    parser.add_argument("--keep-model", help="将生成的合成模型保存到该路径")
+    parser.add_argument("-o", "--output", help="结果 JSON 路径，默认 benchmark_<时间>.json")
+    parser.add_argument("--compare", help="与之前的结果 JSON 对比并打印各阶段耗时比值")
+    parser.add_argument("--startup", action="store_true",
+                        help="只测量界面启动（导入耗时、窗口可交互耗时与后台预导入耗时），按 --repeat 重复")
+    return parser
+
+
+def main(argv=None):
+    from ifc_prop_getter import cli, synthetic
+    from ifc_prop_getter.constants import OUTPUT_FORMATS
+
+    args = build_parser().parse_args(argv)
+    if args.startup:
+        return _main_startup(args)
+    formats = [f for f in args.formats.split(",") if f]
+    unknown = [f for f in formats if f not in OUTPUT_FORMATS]
+    if unknown:
+        print(f"未知的输出格式: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    model = {'source': args.input} if args.input else {
+        'elements': args.elements, 'psets': args.psets, 'props': args.props, 'types': args.types,
+        'type_share': args.type_share, 'missing': args.missing, 'seed': args.seed,
+    }
+    with tempfile.TemporaryDirectory(prefix="ifc_bench_model_") as workdir:
+        ifc_path = args.input or args.keep_model or os.path.join(workdir, "synthetic.ifc")
+        if not args.input:
+            started = time.perf_counter()
+            model['entities'] = synthetic.generate_ifc(ifc_path, args.elements, args.psets, args.props, args.types,
+                                                       args.type_share, args.missing, seed=args.seed)
+            print(f"已生成合成模型: {model['entities']} 个实体, {time.perf_counter() - started:.1f} s", file=sys.stderr)
+        model['size_mb'] = round(os.path.getsize(ifc_path) / 1024 / 1024, 2)
+
+        if args.properties:
+            properties = cli.read_property_file(args.properties)
+        else:
+            properties = synthetic.default_properties(args.psets, args.props)
+
+        def report(case, entry):
+            status = f"失败: {entry['error']}" if entry.get('error') else f"{entry['rows']} 行"
+            phases = ", ".join(f"{k} {v:.2f}s" for k, v in entry['phases'].items())
+            print(f"{_case_label(entry)}: {status}, 总计 {entry['total'] or 0:.2f}s, 峰值内存 "
+                  f"{entry['peak_rss_mb']} MB ({phases})", file=sys.stderr)
+
+        cases = build_cases(ifc_path, properties, [e for e in args.engines.split(",") if e], formats,
+                            args.workers, args.repeat, args.modes.split(","))
+        results = run_cases(cases, report)
+
+    data = {'version': BENCHMARK_VERSION, 'environment': _environment(), 'model': model,
+            'properties': properties, 'results': results}
+    _write_results(data, args)
+    return 1 if any(entry.get('error') for entry in results) else 0
+
+
+def _main_startup(args):
+    """--startup：重复启动界面并记录各阶段耗时；没有图形显示时只记录导入耗时，不视为失败"""
+    results = []
+    for _ in range(args.repeat):
+        entry = measure_startup()
+        results.append(entry)
+        phases = ", ".join(f"{k} {v:.3f}s" for k, v in entry['phases'].items())
+        print(f"{_case_label(entry)}: {phases}" + (f" ({entry['error']})" if entry['error'] else ""),
+              file=sys.stderr)
+    data = {'version': BENCHMARK_VERSION, 'environment': _environment(), 'model': None, 'properties': None,
+            'results': results}
+    _write_results(data, args)
+    return 1 if any('import' not in entry['phases'] for entry in results) else 0
+
+
+def _write_results(data, args):
+    """写出结果 JSON；指定 --compare 时打印与基线的对比"""
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w", encoding="utf-8") as fp:
+        json.dump(data, fp, ensure_ascii=False, indent=2)
+    print(f"结果已写入: {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        for label, phase, old, new, ratio in compare(data, baseline):
+            change = f"{ratio:.2f}x" if ratio is not None else "-"
+            print(f"{label:40s} {phase:16s} {old:10.3f} → {new:10.3f}  {change}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
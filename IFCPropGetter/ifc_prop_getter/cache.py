@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+"""提取结果磁盘缓存模块：按文件内容与属性列表缓存提取出的数据列"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+
+from ifc_prop_getter.constants import CACHE_MAX_BYTES
+from ifc_prop_getter.entity_filter import EntityFilter
+
+# 缓存格式版本，提取规则或条目格式变化时递增以使旧缓存失效
+CACHE_VERSION = 3
+
+_HASH_BLOCK = 4 * 1024 * 1024
+_HASH_INDEX_LIMIT = 1000
+
+
+class ExtractionCache:
+    """
+    缓存目录中每个条目为一个 pickle 文件，键由文件内容哈希、文件大小与规范化的属性规格组成。
+    提取结果条目（表条目）按批保存 rowstore.ColumnStore，边提取边写入、逐批读出，不需要在内存中保留完整结果；
+    属性目录等其他结果为单个对象的条目（get / put）。
+    表条目可附带构件指纹（供下一版增量提取判断哪些构件未变），并记录由其写出的导出文件，
+    以便以导出文件作为上一版时找到对应的条目。
+    文件内容哈希按 (路径, 大小, mtime) 记忆，未修改的文件无需重复计算。
+    总大小超过 max_bytes 时按最近使用时间 (LRU) 淘汰。
+    """
+
+    def __init__(self, cache_dir, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._hash_index_path = os.path.join(cache_dir, "file_hashes.json")
+        self._export_index_path = os.path.join(cache_dir, "exports.json")
+
+    def _load_hash_index(self):
+        return _load_json(self._hash_index_path)
+
+    def file_hash(self, ifc_path):
+        """返回文件内容哈希；(路径, 大小, mtime) 未变时直接复用上次结果"""
+        stat = os.stat(ifc_path)
+        stamp = f"{stat.st_size}:{stat.st_mtime_ns}"
+        path_key = os.path.abspath(ifc_path)
+        with self._lock:
+            hashes = self._load_hash_index()
+        cached = hashes.get(path_key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        digest = hashlib.blake2b(digest_size=20)
+        with open(ifc_path, "rb") as fp:
+            for block in iter(lambda: fp.read(_HASH_BLOCK), b""):
+                digest.update(block)
+        content_hash = digest.hexdigest()
+
+        with self._lock:
+            hashes = self._load_hash_index()
+            hashes.pop(path_key, None)
+            hashes[path_key] = [stamp, content_hash]
+            # 只保留最近记录的若干文件
+            for stale in list(hashes)[:-_HASH_INDEX_LIMIT]:
+                del hashes[stale]
+            _atomic_write_text(self._hash_index_path, json.dumps(hashes, ensure_ascii=False))
+        return content_hash
+
+    def spec_key(self, properties, include_globalid, include_name, entity_filter=None,
+                 type_properties=True, typed_values=False, row_filter=None, locations=()):
+        """
+        由规范化的属性规格、构件类型过滤条件、是否包含类型属性、是否保留值类型、
+        行过滤条件与位置列生成提取规格的哈希（与文件内容无关）
+        """
+        entity_filter = entity_filter or EntityFilter()
+        spec = {
+            "version": CACHE_VERSION,
+            "properties": list(properties),
+            "globalid": bool(include_globalid),
+            "name": bool(include_name),
+            "types": entity_filter.cache_spec(),
+            "type_properties": bool(type_properties),
+            "typed": bool(typed_values),
+            "filter": row_filter.cache_spec() if row_filter is not None else None,
+            "locations": list(locations or ()),
+        }
+        raw = json.dumps(spec, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+    def make_key(self, ifc_path, properties, include_globalid, include_name, entity_filter=None,
+                 type_properties=True, typed_values=False, row_filter=None, locations=()):
+        """由文件内容与提取规格（参数参见 spec_key）生成提取结果条目的缓存键"""
+        spec = {
+            "version": CACHE_VERSION,
+            "size": os.path.getsize(ifc_path),
+            "content": self.file_hash(ifc_path),
+            "spec": self.spec_key(properties, include_globalid, include_name, entity_filter, type_properties,
+                                  typed_values, row_filter, locations),
+        }
+        raw = json.dumps(spec, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+    def catalog_key(self, ifc_path):
+        """属性目录（catalog.discover 的扫描结果）的缓存键，只取决于文件内容"""
+        spec = {
+            "version": CACHE_VERSION,
+            "kind": "catalog",
+            "size": os.path.getsize(ifc_path),
+            "content": self.file_hash(ifc_path),
+        }
+        raw = json.dumps(spec, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """读取单个对象的缓存条目，未命中返回 None；命中时刷新其使用时间"""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as fp:
+                obj = pickle.load(fp)
+        except (OSError, EOFError):
+            return None
+        except Exception:
+            # 损坏的条目直接丢弃
+            _remove_quietly(path)
+            return None
+        _touch(path)
+        return obj
+
+    def put(self, key, obj):
+        """写入单个对象的缓存条目，然后按 LRU 淘汰超出预算的旧条目"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                pickle.dump(obj, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        self.evict()
+
+    def open_table(self, key):
+        """开始逐批写入提取结果条目，返回 TableEntryWriter"""
+        return TableEntryWriter(self, key)
+
+    def put_table(self, key, store):
+        """将完整的 rowstore.ColumnStore 写为一个提取结果条目"""
+        entry = self.open_table(key)
+        try:
+            entry.write(store)
+        except BaseException:
+            entry.discard()
+            raise
+        entry.commit()
+
+    def read_table(self, key):
+        """打开提取结果条目，返回逐批读取的 TableEntry；未命中返回 None，命中时刷新其使用时间"""
+        path = self._entry_path(key)
+        try:
+            entry = TableEntry(path)
+        except (OSError, EOFError):
+            return None
+        except Exception:
+            _remove_quietly(path)
+            return None
+        _touch(path)
+        return entry
+
+    def get_table(self, key):
+        """读取提取结果条目为一个 DataFrame；未命中或条目损坏时返回 None"""
+        entry = self.read_table(key)
+        if entry is None:
+            return None
+        try:
+            with entry:
+                store = None
+                for batch in entry.batches():
+                    if store is None:
+                        store = batch
+                    else:
+                        store.extend(batch)
+        except Exception:
+            _remove_quietly(entry.path)
+            return None
+        return store.to_dataframe() if store is not None else None
+
+    def get_fingerprints(self, key):
+        """读取表条目附带的构件指纹记录（incremental.revision_state 的结果），没有时返回 None"""
+        return self.get(f"{key}-fingerprints")
+
+    def put_fingerprints(self, key, state):
+        """为表条目写入构件指纹记录"""
+        self.put(f"{key}-fingerprints", state)
+
+    def link_export(self, export_path, key, spec):
+        """记录导出文件由哪个表条目写出及其提取规格（spec_key），供以该文件作为上一版时查找"""
+        stat = os.stat(export_path)
+        with self._lock:
+            exports = _load_json(self._export_index_path)
+            path_key = os.path.abspath(export_path)
+            exports.pop(path_key, None)
+            exports[path_key] = [f"{stat.st_size}:{stat.st_mtime_ns}", key, spec]
+            for stale in list(exports)[:-_HASH_INDEX_LIMIT]:
+                del exports[stale]
+            _atomic_write_text(self._export_index_path, json.dumps(exports, ensure_ascii=False))
+
+    def export_key(self, export_path, spec):
+        """返回导出文件对应的表条目键；没有记录、文件导出后被修改或提取规格不同时返回 None"""
+        stat = os.stat(export_path)
+        with self._lock:
+            exports = _load_json(self._export_index_path)
+        record = exports.get(os.path.abspath(export_path))
+        if not record or record[0] != f"{stat.st_size}:{stat.st_mtime_ns}" or record[2] != spec:
+            return None
+        return record[1]
+
+    def evict(self):
+        """淘汰最久未使用的条目，直到总大小不超过预算"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                _remove_quietly(path)
+                total -= size
+
+
+class TableEntryWriter:
+    """
+    逐批写入的提取结果条目：各批 ColumnStore 依次 pickle 到缓存目录中的临时文件，
+    commit() 时改名为正式条目，discard() 时删除临时文件。
+    提交前设置 fingerprints（incremental.revision_state 的结果）时一并写入构件指纹
+    """
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self._key = key
+        self._path = cache._entry_path(key)
+        self.fingerprints = None
+        fd, self._tmp_path = tempfile.mkstemp(dir=cache.cache_dir, suffix=".tmp")
+        self._fp = os.fdopen(fd, "wb")
+
+    def write(self, store):
+        """追加一批 rowstore.ColumnStore"""
+        pickle.dump(store, self._fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def commit(self):
+        """完成写入，替换同键的旧条目，然后按 LRU 淘汰超出预算的旧条目"""
+        try:
+            self._fp.close()
+            if self.fingerprints is not None:
+                self._cache.put_fingerprints(self._key, self.fingerprints)
+            os.replace(self._tmp_path, self._path)
+        except BaseException:
+            _remove_quietly(self._tmp_path)
+            raise
+        self._cache.evict()
+
+    def discard(self):
+        """放弃写入"""
+        self._fp.close()
+        _remove_quietly(self._tmp_path)
+
+
+class TableEntry:
+    """打开的提取结果条目；batches() 按写入顺序逐批读出 ColumnStore，用完后 close()（或用作上下文管理器）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fp = open(path, "rb")
+
+    def batches(self):
+        """逐批产出 rowstore.ColumnStore"""
+        while True:
+            try:
+                yield pickle.load(self._fp)
+            except EOFError:
+                return
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _load_json(path):
+    try:
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _atomic_write_text(path, text):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fp:
+            fp.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        _remove_quietly(tmp_path)
+        raise
+
+
+def _touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
\ No newline at end of file
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""属性目录模块：流式扫描 IFC 文件，列出全部 属性集.属性 名称及其出现次数与示例值，供选择提取属性"""
+
+import os
+import traceback
+from collections import Counter
+
+import pandas as pd
+
+from ifc_prop_getter import parallel, progress
+from ifc_prop_getter.entity_filter import EntityFilter
+
+# 目录 DataFrame 的列
+CATALOG_COLUMNS = ["属性集", "属性", "完整名称", "出现次数", "示例值"]
+
+# 每个属性最多保留的不同示例值数量
+SAMPLE_LIMIT = 3
+
+# 示例值的最大显示长度
+SAMPLE_MAX_CHARS = 40
+
+
+class _AnyName:
+    """包含任意属性名的集合"""
+
+    def __contains__(self, name):
+        return True
+
+
+class AllPropertiesPlan:
+    """保留全部属性的查找计划，接口与 utils.PropertyPlan 中扫描用到的部分一致"""
+
+    names = _AnyName()
+    type_properties = True
+    locations = False
+
+    @staticmethod
+    def wants(pset_name, prop_name):
+        return True
+
+
+def _sample_text(value):
+    text = ", ".join(map(str, value)) if isinstance(value, (list, tuple)) else str(value)
+    return text if len(text) <= SAMPLE_MAX_CHARS else text[:SAMPLE_MAX_CHARS - 1] + "…"
+
+
+def build_catalog(tables):
+    """
+    由流式扫描的实体表汇总属性目录，返回按 属性集、属性 排序的 DataFrame（列见 CATALOG_COLUMNS）。
+    出现次数为带有该属性的构件数（实例属性集与类型继承的属性集合并计算，同一构件只计一次），
+    与按 ifcopenshell get_psets 逐个构件统计的结果一致。
+    """
+    products = tables.products
+    element_psets = {}  # {构件 id: [属性集定义 id]}
+    for _, related, definitions in tables.rels_by_props:
+        for obj_id in related:
+            if obj_id in products:
+                element_psets.setdefault(obj_id, []).extend(definitions)
+    typed = set()
+    for _, related, type_id in tables.rels_by_type:
+        definitions = tables.type_psets.get(type_id, ())
+        for obj_id in related:
+            if obj_id in products and obj_id not in typed:
+                typed.add(obj_id)
+                element_psets.setdefault(obj_id, []).extend(definitions)
+
+    # 属性集组合相同的构件一起计数
+    signatures = Counter(tuple(definitions) for definitions in element_psets.values())
+
+    names = {}    # {属性集定义 id: ((属性集名, 属性名), ...)}
+    samples = {}  # {(属性集名, 属性名): [示例值]}
+
+    def definition_props(definition_id):
+        """属性集定义的 (属性集名, [(属性名, 值或 None)])"""
+        if definition_id in tables.predefined_psets:
+            # 预定义属性集（门窗衬板等）的属性为实体属性；id 不是属性，引用其他实体的属性只列出名称
+            pset_name, props, unparsed = tables.predefined_psets[definition_id]
+            return pset_name, [item for item in props.items() if item[0] != "id"] + [(name, None) for name in unparsed]
+        pset_name, prop_ids = tables.psets.get(definition_id, (None, ()))
+        props = []
+        for prop_id in prop_ids:
+            prop = tables.properties.get(prop_id)
+            if prop is None and prop_id in tables.complex_properties:
+                # 有界值、表格值与复合属性只列出名称，不提供示例值
+                prop = (tables.complex_properties[prop_id], None)
+            props.append(prop)
+        return pset_name, props
+
+    def definition_names(definition_id):
+        if definition_id not in names:
+            pset_name, props = definition_props(definition_id)
+            keys = []
+            for prop in props if pset_name is not None else ():
+                if prop is None or prop[0] is None:
+                    continue
+                key = (pset_name, prop[0])
+                keys.append(key)
+                values = samples.setdefault(key, [])
+                if prop[1] is not None and len(values) < SAMPLE_LIMIT:
+                    sample = _sample_text(prop[1])
+                    if sample not in values:
+                        values.append(sample)
+            names[definition_id] = tuple(keys)
+        return names[definition_id]
+
+    counts = Counter()
+    for signature, count in signatures.items():
+        keys = set()
+        for definition_id in signature:
+            keys.update(definition_names(definition_id))
+        for key in keys:
+            counts[key] += count
+
+    rows = [(pset_name, prop_name, f"{pset_name}.{prop_name}", count, " | ".join(samples[(pset_name, prop_name)]))
+            for (pset_name, prop_name), count in sorted(counts.items())]
+    return pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+
+
+def scan_catalog(ifc_path, workers, queue, stop_event, progress_callback=None):
+    """流式扫描（可多进程）并汇总属性目录；用户取消时返回 None"""
+    scanned = parallel.scan_tables(ifc_path, AllPropertiesPlan(), workers, queue, stop_event, progress_callback,
+                                   EntityFilter())
+    if scanned is None:
+        return None
+    return build_catalog(scanned[1])
+
+
+def filter_catalog(catalog, text):
+    """按关键字（不区分大小写，空格分隔的多个关键字须全部匹配）筛选目录中的完整名称与示例值"""
+    mask = pd.Series(True, index=catalog.index)
+    haystack = (catalog["完整名称"] + " " + catalog["示例值"]).str.lower()
+    for word in text.lower().split():
+        mask &= haystack.str.contains(word, regex=False)
+    return catalog[mask]
+
+
+def discover(ifc_path, queue, stop_event, workers=None, cache=None):
+    """
+    工作线程函数：扫描 IFC 文件的属性目录。
+    完成时发送 {'type': 'catalog', 'catalog': DataFrame, 'filepath': ifc_path}；
+    cache 为 cache.ExtractionCache 实例，同一文件（内容未变）再次扫描时直接读取。
+    """
+    try:
+        workers = workers or parallel.default_workers()
+        catalog = None
+        cache_key = None
+        if cache is not None:
+            try:
+                cache_key = cache.catalog_key(ifc_path)
+                catalog = cache.get(cache_key)
+            except Exception as e:
+                queue.put({'type': 'log', 'message': f"警告: 缓存不可用: {str(e)}"})
+            if catalog is not None:
+                queue.put({'type': 'log', 'message': "属性目录命中缓存"})
+
+        if catalog is None:
+            queue.put({'type': 'status', 'message': "正在扫描属性目录..."})
+            scanning = progress.PhaseProgress(queue, "open", "扫描属性", total=os.path.getsize(ifc_path), unit="B")
+            try:
+                catalog = scan_catalog(ifc_path, workers, queue, stop_event, scanning.update)
+            except Exception as e:
+                queue.put({'type': 'error', 'message': f"文件解析失败: {str(e)}"})
+                return
+            if catalog is None:
+                queue.put({'type': 'log', 'message': "任务已被用户取消"})
+                return
+            scanning.finish()
+            if cache_key is not None:
+                try:
+                    cache.put(cache_key, catalog)
+                except Exception as e:
+                    queue.put({'type': 'log', 'message': f"警告: 写入缓存失败: {str(e)}"})
+
+        queue.put({'type': 'log', 'message': f"属性目录: 共 {len(catalog)} 个属性"})
+        queue.put({'type': 'catalog', 'catalog': catalog, 'filepath': ifc_path})
+
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"未捕获的异常: {str(e)}"})
+        queue.put({'type': 'log', 'message': traceback.format_exc()})
+    finally:
+        queue.put({'type': 'finished'})
\ No newline at end of file
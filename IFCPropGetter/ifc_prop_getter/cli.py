@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+
+"""命令行批处理模块：无界面批量提取多个 IFC 文件"""
+
+import argparse
+import csv
+import glob
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from ifc_prop_getter import catalog, extractor, federation, parallel, utils, writers
+from ifc_prop_getter.aggregate import compile_aggregation
+from ifc_prop_getter.cache import ExtractionCache
+from ifc_prop_getter.entity_filter import parse_class_list
+from ifc_prop_getter.messages import MessageChannel
+from ifc_prop_getter.row_filter import compile_filter
+from ifc_prop_getter.spatial import parse_locations
+from ifc_prop_getter.constants import (CACHE_MAX_BYTES, COMPRESSION_CHOICES, DEFAULT_COMPRESSION,
+                                       DEFAULT_PROPERTIES, DUPLICATE_MODES, OUTPUT_FORMATS)
+
+
+def read_property_file(path):
+    """读取属性列表文件：每行一个属性名，忽略空行和 # 开头的注释"""
+    properties = []
+    with open(path, encoding="utf-8-sig") as fp:
+        for line in fp:
+            line = line.strip()
+            if line and not line.startswith("#") and line not in properties:
+                properties.append(line)
+    return properties
+
+
+def expand_inputs(patterns):
+    """展开文件路径与通配符，去重并保持首次出现顺序"""
+    files = []
+    seen = set()
+    for pattern in patterns:
+        if not glob.has_magic(pattern) and not os.path.isfile(pattern):
+            print(f"警告: 文件不存在 {pattern}", file=sys.stderr)
+            continue
+        matches = glob.glob(pattern, recursive=True) if glob.has_magic(pattern) else [pattern]
+        for path in sorted(matches):
+            key = os.path.abspath(path)
+            if key not in seen and os.path.isfile(path):
+                seen.add(key)
+                files.append(path)
+    return files
+
+
+def output_stems(files):
+    """
+    各文件输出与日志文件名的基础部分，返回 {路径: 名称}：文件名（不含扩展名）；
+    不同文件夹中的文件重名时加上级文件夹名前缀，仍然重复时再加序号（不区分大小写比较）
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in files]
+    counts = Counter(stem.lower() for stem in stems)
+    used = {stem.lower() for stem in stems if counts[stem.lower()] == 1}
+    result = {}
+    for path, stem in zip(files, stems):
+        if counts[stem.lower()] > 1:
+            parent = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            stem = candidate = f"{parent}_{stem}" if parent else stem
+            index = 1
+            while candidate.lower() in used:
+                index += 1
+                candidate = f"{stem}_{index}"
+            used.add(candidate.lower())
+            stem = candidate
+        result[path] = stem
+    return result
+
+
+def run_job(ifc_path, options, stem=None):
+    """在当前进程中提取单个文件，返回汇总信息字典；stem 为输出文件名的基础部分，默认为文件名"""
+    stop_event = threading.Event()
+    stem = stem or os.path.splitext(os.path.basename(ifc_path))[0]
+    base = f"{stem}{options['suffix']}"
+    msg_queue = MessageChannel()
+    if options['log_dir']:
+        msg_queue.reset(os.path.join(options['log_dir'], f"{base}.log"))
+
+    cache = None
+    if options['cache_dir']:
+        cache = ExtractionCache(options['cache_dir'], options['cache_max_bytes'])
+
+    started = time.perf_counter()
+    extractor.extract_properties(
+        ifc_path, options['properties'], options['include_globalid'], options['include_name'],
+        options['output_dir'], base, options['file_format'], msg_queue, stop_event,
+        engine=options['engine'], workers=options['workers'], cache=cache,
+        compression=options['compression'],
+        include_types=options['include_types'], exclude_types=options['exclude_types'],
+        type_properties=options['type_properties'], profile=options['profile'],
+        typed_values=options['typed_values'], row_filter=options['row_filter'],
+        group_by=options['group_by'], measures=options['measures'], locations=options['locations'])
+    elapsed = time.perf_counter() - started
+
+    result = {'file': ifc_path, 'size_mb': round(os.path.getsize(ifc_path) / 1024 / 1024, 2),
+              'status': 'error', 'rows': 0, 'seconds': round(elapsed, 3), 'output': '', 'message': ''}
+    logs = []
+    for msg in msg_queue.drain():
+        if msg['type'] == 'log':
+            logs.append(msg['message'])
+        elif msg['type'] == 'complete':
+            result.update(status='ok', rows=msg.get('rows', 0), output=msg['filepath'], message=msg['message'])
+        elif msg['type'] == 'error':
+            result['message'] = msg['message']
+    result['logs'] = logs
+    return result
+
+
+def _failed_result(ifc_path, error):
+    """任务本身异常（如子进程意外退出）时该文件的汇总信息"""
+    return {'file': ifc_path, 'size_mb': round(os.path.getsize(ifc_path) / 1024 / 1024, 2),
+            'status': 'error', 'rows': 0, 'seconds': 0.0, 'output': '', 'message': f"任务异常: {error!r}",
+            'logs': []}
+
+
+def run_merged(files, options, args):
+    """联合提取模式：并行提取全部文件并合并写出一个文件，返回退出码"""
+    cache = ExtractionCache(options['cache_dir'], options['cache_max_bytes']) if options['cache_dir'] else None
+    msg_queue = MessageChannel()
+    if options['log_dir']:
+        msg_queue.reset(os.path.join(options['log_dir'], f"{args.merge_name}{options['suffix']}.log"))
+    started = time.perf_counter()
+    federation.extract_federated(
+        files, options['properties'], options['include_globalid'], options['include_name'],
+        options['output_dir'], f"{args.merge_name}{options['suffix']}", options['file_format'], msg_queue,
+        threading.Event(), engine=options['engine'], workers=args.jobs, cache=cache,
+        compression=options['compression'], include_types=options['include_types'],
+        exclude_types=options['exclude_types'], type_properties=options['type_properties'],
+        typed_values=options['typed_values'], row_filter=options['row_filter'], locations=options['locations'],
+        duplicates=args.duplicates)
+    status, code = "失败", 1
+    for msg in msg_queue.drain():
+        if msg['type'] == 'log' and args.verbose:
+            print(f"    {msg['message']}", file=sys.stderr)
+        elif msg['type'] == 'complete':
+            status, code = f"{msg['rows']} 行 → {msg['filepath']}", 0
+        elif msg['type'] == 'error':
+            status = f"失败: {msg['message']}"
+    print(f"[{utils.format_timestamp()}] 联合提取 {len(files)} 个文件: {status}, "
+          f"总耗时 {time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return code
+
+
+def write_summary(results, path):
+    """将每个文件的耗时与行数写入 CSV 汇总文件"""
+    fields = ['file', 'size_mb', 'status', 'rows', 'seconds', 'output', 'message']
+    with open(path, 'w', newline='', encoding='utf-8-sig') as fp:
+        writer = csv.DictWriter(fp, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def write_catalogs(files, args):
+    """属性目录模式：逐个扫描文件，在输出文件夹写出 *_catalog_*.csv，返回失败的文件数"""
+    cache = ExtractionCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+    failed = 0
+    stems = output_stems(files)
+    for done, path in enumerate(files, 1):
+        msg_queue = MessageChannel()
+        started = time.perf_counter()
+        catalog.discover(path, msg_queue, threading.Event(), args.workers, cache)
+        entries = None
+        message = ""
+        for msg in msg_queue.drain():
+            if msg['type'] == 'catalog':
+                entries = msg['catalog']
+            elif msg['type'] == 'error':
+                message = msg['message']
+        if entries is None:
+            failed += 1
+            status = f"失败: {message}"
+        else:
+            output = os.path.join(args.output_dir, utils.make_output_filename(f"{stems[path]}_catalog", "csv"))
+            writers.write_dataframe(entries, output, "CSV")
+            status = f"{len(entries)} 个属性 → {output}"
+        print(f"[{utils.format_timestamp()}] [{done}/{len(files)}] {path}: {status}, "
+              f"{time.perf_counter() - started:.1f} s", file=sys.stderr)
+    return failed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ifc_prop_getter",
+        description="批量从 IFC 文件中提取属性（无需图形界面）")
+    parser.add_argument("inputs", nargs="+", help="IFC 文件路径或通配符，例如 models/**/*.ifc")
+    parser.add_argument("-p", "--properties", help="属性列表文件（每行一个属性名）；默认使用内置属性列表")
+    parser.add_argument("-o", "--output-dir", default=os.getcwd(), help="输出文件夹，默认当前目录")
+    parser.add_argument("-f", "--format", dest="file_format", choices=list(OUTPUT_FORMATS), default="CSV",
+                        help="输出格式，默认 CSV")
+    parser.add_argument("--compression", choices=COMPRESSION_CHOICES, default=DEFAULT_COMPRESSION,
+                        help="Parquet/Feather 的压缩算法（Feather 仅支持 zstd、lz4、none），默认 %(default)s")
+    parser.add_argument("--suffix", default="_data", help="输出文件名后缀，默认 _data")
+    parser.add_argument("--no-globalid", action="store_true", help="不输出 GlobalId 列")
+    parser.add_argument("--name", action="store_true", help="输出 Name 列")
+    parser.add_argument("--no-type-properties", action="store_true",
+                        help="不读取类型对象继承的属性，只使用构件实例自身的属性集")
+    parser.add_argument("--typed", action="store_true",
+                        help="保留属性值的原生类型：数值列写为数值，缺失值为空而不是 N/A")
+    parser.add_argument("--include-types", default="",
+                        help="只提取这些 IFC 类（含子类），逗号分隔，例如 IfcBeam,IfcColumn；默认全部构件")
+    parser.add_argument("--exclude-types", default=None,
+                        help="不提取这些 IFC 类（含子类），逗号分隔，优先于 --include-types；默认排除空间结构等非构件类")
+    parser.add_argument("--locations",
+                        help="输出所属位置列，逗号分隔，可选 Site,Building,Storey（场地、建筑、楼层），例如 Storey,Building")
+    parser.add_argument("--filter", dest="row_filter",
+                        help="行过滤表达式，只输出满足条件的构件，例如 \"[Cast unit Mark] startswith 'PC-'\"")
+    parser.add_argument("--group-by",
+                        help="汇总模式：分组字段，逗号分隔，例如 \"[Cast unit Mark], Class\"；只输出汇总表")
+    parser.add_argument("--measures",
+                        help="汇总模式：汇总项，例如 \"count, sum(Weight), max(Weight), distinct(GlobalId)\"，默认 count")
+    parser.add_argument("--merge", action="store_true",
+                        help="联合提取：并行提取全部输入文件并合并为一个输出文件，首列为来源文件，按 GlobalId 去重")
+    parser.add_argument("--merge-name", default="merged", help="联合提取的输出文件名（不含后缀），默认 merged")
+    parser.add_argument("--duplicates", choices=list(DUPLICATE_MODES.values()), default="merge",
+                        help="联合提取时同一 GlobalId 出现在多个来源中的处理方式：merge 合并值相同的行（默认），"
+                             "keep 全部保留，first 只保留首个；值不一致的行均在 GlobalId 冲突列中标记")
+    parser.add_argument("--engine", choices=["ifcopenshell", "stream"], default="ifcopenshell",
+                        help="解析引擎，默认 ifcopenshell")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="同时处理的文件数，默认为 CPU 核心数")
+    parser.add_argument("--workers", type=int, default=1, help="单个文件内部的并行进程数，默认 1")
+    parser.add_argument("--cache-dir", help="启用提取结果缓存并指定缓存目录")
+    parser.add_argument("--cache-size", type=int, default=CACHE_MAX_BYTES // 1024 // 1024,
+                        help="缓存容量上限 (MB)，默认 %(default)s")
+    parser.add_argument("--summary", help="汇总 CSV 路径，默认写入输出文件夹")
+    parser.add_argument("--log-dir", help="将每个文件的完整日志写入该文件夹")
+    parser.add_argument("--profile", choices=["phases", "cprofile"],
+                        help="在输出文件夹为每个文件写出性能报告 (*_profile_*.json)；cprofile 另外记录函数级热点")
+    parser.add_argument("--catalog", action="store_true",
+                        help="只扫描属性目录：为每个文件写出 *_catalog_*.csv（属性集、属性、构件数、示例值），不提取属性")
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印每个文件的详细日志（同类警告合并显示）")
+    return parser
+
+
+def _report(done, total, result, verbose):
+    status = f"{result['rows']} 行" if result['status'] == 'ok' else f"失败: {result['message']}"
+    print(f"[{utils.format_timestamp()}] [{done}/{total}] {result['file']}: {status}, {result['seconds']:.1f} s",
+          file=sys.stderr)
+    if verbose:
+        for line in result['logs']:
+            print(f"    {line}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("未找到任何输入文件", file=sys.stderr)
+        return 2
+
+    if args.catalog:
+        os.makedirs(args.output_dir, exist_ok=True)
+        return 1 if write_catalogs(files, args) else 0
+
+    properties = read_property_file(args.properties) if args.properties else DEFAULT_PROPERTIES.copy()
+    if not properties:
+        print("属性列表为空", file=sys.stderr)
+        return 2
+    try:
+        locations = parse_locations(args.locations)
+    except ValueError as e:
+        print(f"位置列无效: {e}", file=sys.stderr)
+        return 2
+    try:
+        compile_filter(args.row_filter, properties)
+    except ValueError as e:
+        print(f"过滤条件无效: {e}", file=sys.stderr)
+        return 2
+    try:
+        compile_aggregation(args.group_by, args.measures, properties)
+    except ValueError as e:
+        print(f"汇总设置无效: {e}", file=sys.stderr)
+        return 2
+    try:
+        writers.check_compression(args.file_format, args.compression)
+    except ValueError as e:
+        print(f"压缩设置无效: {e}", file=sys.stderr)
+        return 2
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    options = {
+        'properties': properties,
+        'include_globalid': not args.no_globalid,
+        'include_name': args.name,
+        'type_properties': not args.no_type_properties,
+        'typed_values': args.typed,
+        'row_filter': args.row_filter,
+        'group_by': args.group_by,
+        'measures': args.measures,
+        'locations': locations,
+        'output_dir': args.output_dir,
+        'file_format': args.file_format,
+        'compression': args.compression,
+        'include_types': parse_class_list(args.include_types),
+        'exclude_types': None if args.exclude_types is None else parse_class_list(args.exclude_types),
+        'suffix': args.suffix,
+        'engine': args.engine,
+        'workers': args.workers,
+        'cache_dir': args.cache_dir,
+        'cache_max_bytes': args.cache_size * 1024 * 1024,
+        'log_dir': args.log_dir,
+        'profile': args.profile,
+    }
+
+    if args.merge:
+        if compile_aggregation(args.group_by, args.measures, properties) is not None:
+            print("联合提取不支持汇总模式", file=sys.stderr)
+            return 2
+        return run_merged(files, options, args)
+
+    # 不同文件夹中的同名文件输出到同一文件夹时加前缀区分，避免互相覆盖
+    stems = output_stems(files)
+    # 大文件优先调度，缩短整体耗时的长尾
+    files.sort(key=os.path.getsize, reverse=True)
+    jobs = max(1, min(args.jobs or parallel.default_workers(), len(files)))
+    print(f"[{utils.format_timestamp()}] 共 {len(files)} 个文件, {jobs} 个并行任务", file=sys.stderr)
+
+    started = time.perf_counter()
+    summary_path = args.summary or os.path.join(
+        args.output_dir, f"batch_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    results = []
+    try:
+        if jobs == 1:
+            for path in files:
+                try:
+                    result = run_job(path, options, stems[path])
+                except Exception as e:
+                    result = _failed_result(path, e)
+                results.append(result)
+                _report(len(results), len(files), result, args.verbose)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(run_job, path, options, stems[path]): path for path in files}
+                try:
+                    for future in as_completed(futures):
+                        # 子进程异常退出（如内存不足被系统终止）时只记为该文件失败，其余文件照常汇总
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            result = _failed_result(futures[future], e)
+                        results.append(result)
+                        _report(len(results), len(files), result, args.verbose)
+                except KeyboardInterrupt:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    finally:
+        # 中断时也写出已完成文件的汇总
+        order = {path: i for i, path in enumerate(files)}
+        results.sort(key=lambda r: order[r['file']])
+        write_summary(results, summary_path)
+
+    failed = sum(1 for r in results if r['status'] != 'ok')
+    print(f"[{utils.format_timestamp()}] 完成: 成功 {len(results) - failed}, 失败 {failed}, "
+          f"总耗时 {time.perf_counter() - started:.1f} s, 汇总: {summary_path}", file=sys.stderr)
+    return 1 if failed else 0
\ No newline at end of file
@@ -20,8 +20,64 @@ SKIP_ENTITY_TYPES = {
 # 日期格式
 DATE_FORMAT = "%m-%d"
 
-# 处理块大小
+# 处理块大小：热循环中每处理 CHUNK_SIZE 个条目检查一次取消并更新进度
 CHUNK_SIZE = 50
 
+# 进度消息的最短发送间隔（秒）
+PROGRESS_INTERVAL = 0.25
+
+# 日志通道：待显示日志的最大条数；同类警告逐条显示的上限；日志区保留的最大行数
+LOG_QUEUE_SIZE = 1000
+WARNING_REPEAT_LIMIT = 20
+LOG_VIEW_MAX_LINES = 2000
+
+# 并行提取：流式扫描每个分片的最小字节数；完整加载引擎每个分片的最少关系数
+PARALLEL_MIN_SHARD_BYTES = 8 * 1024 * 1024
+PARALLEL_MIN_SHARD_RELATIONS = 2000
+
+# 提取结果缓存的默认容量上限（字节）
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# 流式写出：每批写入的行数
+WRITE_BATCH_ROWS = 5000
+
+# 输出格式及对应的文件扩展名
+OUTPUT_FORMATS = {
+    "Excel": "xlsx",
+    "CSV": "csv",
+    "Parquet": "parquet",
+    "Feather": "feather",
+    "SQLite": "sqlite",
+}
+
+# 列式格式（Parquet/Feather）可选的压缩算法；"none" 表示不压缩
+COMPRESSION_CHOICES = ["zstd", "lz4", "snappy", "gzip", "none"]
+DEFAULT_COMPRESSION = "zstd"
+
+# 各列式格式实际支持的压缩算法：Feather (Arrow IPC) 只支持 zstd、lz4 或不压缩；其他格式忽略压缩设置
+FORMAT_COMPRESSION_CHOICES = {"Parquet": COMPRESSION_CHOICES, "Feather": ["zstd", "lz4", "none"]}
+
+# 列式格式每个行组（记录批）的行数
+COLUMNAR_BATCH_ROWS = 65536
+
+# SQLite 输出的表名
+SQLITE_TABLE = "properties"
+
 # 文件名非法字符正则
-INVALID_FILENAME_CHARS = re.compile(r'[\\/*?:"<>|]')
\ No newline at end of file
+INVALID_FILENAME_CHARS = re.compile(r'[\\/*?:"<>|]')
+
+# 性能报告选项：界面显示名 → extract_properties 的 profile 参数
+PROFILE_MODES = {"关闭": None, "按阶段": "phases", "含 cProfile": "cprofile"}
+
+# 联合提取时同一 GlobalId 出现在多个来源中的处理方式：界面显示名 → federation.merge_members 的 duplicates 参数
+DUPLICATE_MODES = {"合并相同构件": "merge", "全部保留": "keep", "只保留首个": "first"}
+
+# 本地提取服务：默认监听地址与端口
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+
+# 提取服务中常驻模型的默认内存预算（字节）
+SERVICE_MEMORY_BYTES = 4 * 1024 * 1024 * 1024
+
+# 每个常驻模型保留的属性索引数（不同属性列表 / 过滤条件各占一个）
+SERVICE_INDEX_SLOTS = 8
\ No newline at end of file
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+"""构件类型过滤模块：按 IFC 类（含子类）包含或排除构件，并预先在 schema 上解析为具体类列表"""
+
+import re
+from functools import lru_cache
+
+from ifc_prop_getter.constants import SKIP_ENTITY_TYPES
+
+_SEPARATORS = re.compile(r"[\s,;，；]+")
+
+
+def parse_class_list(text):
+    """解析以逗号、分号或空白分隔的 IFC 类名列表，去重并保持顺序"""
+    names = []
+    for name in _SEPARATORS.split(text or ""):
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def _as_names(value):
+    return parse_class_list(value) if isinstance(value, str) else list(value or ())
+
+
+def _schema(identifier):
+    # 延迟导入：界面启动时只用到 parse_class_list，不必加载 ifcopenshell
+    import ifcopenshell.ifcopenshell_wrapper as ifc_wrapper
+
+    identifier = (identifier or "IFC4").upper()
+    try:
+        return ifc_wrapper.schema_by_name(identifier)
+    except Exception:
+        return ifc_wrapper.schema_by_name(identifier.split("_")[0])
+
+
+class EntityFilter:
+    """
+    构件类型过滤条件：include 为空时包含全部 IfcProduct；include/exclude 中的类均包含其子类，
+    exclude 优先。默认排除 SKIP_ENTITY_TYPES。两者均可为类名序列或 parse_class_list 能解析的字符串。
+    """
+
+    def __init__(self, include=(), exclude=None):
+        self.include = tuple(_as_names(include))
+        self.exclude = tuple(sorted(SKIP_ENTITY_TYPES) if exclude is None else _as_names(exclude))
+
+    def cache_spec(self):
+        """用于缓存键的规范化表示"""
+        return {"include": sorted(self.include), "exclude": sorted(self.exclude)}
+
+    def resolve(self, schema_identifier):
+        """返回 (允许的类名元组, 无法识别的类名元组)；类名按 by_type("IfcProduct") 的遍历顺序排列"""
+        return _resolve(schema_identifier, self.include, self.exclude)
+
+    def keywords(self, schema_identifier):
+        """允许的类名（大写），供流式扫描按实体关键字匹配"""
+        return frozenset(name.upper() for name in self.resolve(schema_identifier)[0])
+
+
+@lru_cache(maxsize=32)
+def _resolve(schema_identifier, include, exclude):
+    schema = _schema(schema_identifier)
+    product = schema.declaration_by_name("IfcProduct")
+
+    unknown = []
+
+    def canonical(names, products_only):
+        result = set()
+        for name in names:
+            try:
+                decl = schema.declaration_by_name(name)
+            except Exception:
+                unknown.append(name)
+                continue
+            ancestor = decl
+            while ancestor is not None and ancestor.name() != "IfcProduct":
+                ancestor = ancestor.supertype() if hasattr(ancestor, "supertype") else None
+            if ancestor is not None:
+                result.add(decl.name())
+            elif products_only:
+                unknown.append(name)
+        return result
+
+    # 包含列表只接受 IfcProduct 子类；排除列表中的非构件类（如 IfcProject）本就不会出现，直接忽略
+    included = canonical(include, True)
+    excluded = canonical(exclude, False)
+
+    allowed = []
+
+    def walk(decl, inside):
+        name = decl.name()
+        if name in excluded:
+            return
+        inside = inside or name in included
+        if inside:
+            allowed.append(name)
+        for sub in decl.subtypes():
+            walk(sub, inside)
+
+    walk(product, not include)
+    return tuple(allowed), tuple(unknown)
\ No newline at end of file
@@ -2,117 +2,1015 @@
 
 """核心提取模块"""
 
+import copy
+import itertools
 import os
 import traceback
+from contextlib import ExitStack
+
 import ifcopenshell
-import ifcopenshell.util.element
-import pandas as pd
 
-from ifc_prop_getter import utils
-from ifc_prop_getter.constants import SKIP_ENTITY_TYPES
+from ifc_prop_getter import (aggregate, incremental, parallel, profiler, progress, rowstore, spatial, stream_scanner,
+                             utils, writers)
+from ifc_prop_getter.constants import CHUNK_SIZE, DEFAULT_COMPRESSION, OUTPUT_FORMATS, WRITE_BATCH_ROWS
+from ifc_prop_getter.entity_filter import EntityFilter
+from ifc_prop_getter.row_filter import compile_filter
 
 
-def extract_properties(ifc_path, properties, include_globalid, include_name,
-                       output_dir, base_filename, file_format, queue, stop_event):
-    """工作线程函数：执行 IFC 实体扫描与属性提取"""
+def _resolve_classes(entity_filter, schema_identifier, queue):
+    """按模型 schema 解析类型过滤条件，返回允许的类名元组；没有可提取的类型时报告错误并返回 None"""
+    classes, unknown = entity_filter.resolve(schema_identifier)
+    if unknown:
+        queue.put({'type': 'log', 'message': f"警告: {schema_identifier} 中不存在以下构件类型，已忽略: {', '.join(unknown)}"})
+    if not classes:
+        queue.put({'type': 'error', 'message': "类型过滤后没有可提取的构件类型"})
+        return None
+    if entity_filter.include:
+        queue.put({'type': 'log', 'message': f"构件类型过滤: 共 {len(classes)} 个 IFC 类"})
+    return classes
+
+
+def _open_with_ifcopenshell(ifc_path, plan, workers, queue, stop_event, entity_filter):
+    """完整加载模型后建立属性索引，返回 (products, property_index)；失败或取消时返回 None"""
+    opening = progress.PhaseProgress(queue, "open", "打开模型")
     try:
-        queue.put({'type': 'log', 'message': f"开始处理文件: {ifc_path}"})
+        ifc_file = ifcopenshell.open(ifc_path)
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"文件打开失败: {str(e)}"})
+        return None
+    opening.finish()
+
+    if stop_event.is_set(): return None
+    return index_model(ifc_file, plan, workers, queue, stop_event, entity_filter)
+
+
+def index_model(ifc_file, plan, workers, queue, stop_event, entity_filter):
+    """在已加载的模型上收集构件并建立属性索引，返回 (products, property_index)；失败或取消时返回 None"""
+    classes = _resolve_classes(entity_filter, ifc_file.schema, queue)
+    if classes is None:
+        return None
+    # 按具体类逐个查询，顺序与 by_type("IfcProduct") 一致；被排除的类不会被实例化
+    all_products = [(e.id(), e.is_a(), e.GlobalId, e.Name)
+                    for cls in classes for e in ifc_file.by_type(cls, include_subtypes=False)]
+    queue.put({'type': 'log', 'message': f"共找到 {len(all_products)} 个待提取的 IfcProduct 实例"})
+
+    if not all_products:
+        queue.put({'type': 'error', 'message': "文件中未找到任何符合条件的 IfcProduct 实体"})
+        return None
+
+    # 阶段 2: 建立属性索引
+    queue.put({'type': 'status', 'message': "正在建立属性索引..."})
+    indexing = progress.PhaseProgress(queue, "index", "建立属性索引", unit="关系")
+    wanted = {product[0] for product in all_products}
+    property_index = parallel.build_index(ifc_file, plan, workers, queue, stop_event, indexing.update, wanted)
+    if property_index is None:
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    if plan.locations:
+        property_index.spatial = spatial.build_spatial_index(ifc_file)
+    indexing.finish()
+    return all_products, property_index
+
+
+def _open_with_stream(ifc_path, plan, workers, queue, stop_event, entity_filter, fingerprint=False):
+    """
+    流式扫描 SPF 文本，返回 (products, property_index)；失败或取消时返回 None。
+    所需属性含流式引擎不解析的类型时记录警告并改用完整加载引擎，保证输出一致。
+    fingerprint 为真时扫描中同时计算构件指纹（property_index.fingerprints）
+    """
+    try:
+        if _resolve_classes(entity_filter, stream_scanner.read_header(ifc_path)[0], queue) is None:
+            return None
+        scanning = progress.PhaseProgress(queue, "open", "流式扫描", total=os.path.getsize(ifc_path), unit="B")
+        scanned = parallel.scan_stream(ifc_path, plan, workers, queue, stop_event, scanning.update, entity_filter,
+                                       fingerprint)
+    except stream_scanner.UnsupportedPropertyError as e:
+        queue.put({'type': 'log', 'message': f"警告: {str(e)}，改用完整加载引擎"})
+        return _open_with_ifcopenshell(ifc_path, plan, workers, queue, stop_event, entity_filter)
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"文件解析失败: {str(e)}"})
+        return None
+
+    if scanned is None:
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    scanning.finish()
+
+    all_products = scanned[0]
+    queue.put({'type': 'log', 'message': f"共找到 {len(all_products)} 个待提取的 IfcProduct 实例"})
+    if not all_products:
+        queue.put({'type': 'error', 'message': "文件中未找到任何符合条件的 IfcProduct 实体"})
+        return None
+    return scanned
+
+
+def _output_columns(properties, include_globalid, include_name, locations=()):
+    """输出列顺序：GlobalId、Name、位置列（LOCATION_FIELDS 中选定的字段），然后是属性列"""
+    columns = list(locations) + list(properties)
+    if include_name:
+        columns.insert(0, "Name")
+    if include_globalid:
+        columns.insert(0, "GlobalId")
+    return columns
+
+
+def _output_kinds(property_index, plan, include_globalid, include_name, locations=()):
+    """类型化模式下与输出列对齐的列类型；GlobalId、Name 与位置列为字符串。字符串模式返回 None"""
+    if not plan.typed_values:
+        return None
+    prefix = [rowstore.KIND_STRING] * (bool(include_globalid) + bool(include_name) + len(locations))
+    return prefix + property_index.value_kinds(plan)
 
-        # 阶段 1: 扫描
+
+def _make_plan(properties, type_properties, typed_values, locations=(), *specs):
+    """编译查找计划；输出位置列，或行过滤、汇总（specs 中带 fields 的规格）引用了位置字段时建立空间结构索引"""
+    needs_locations = bool(locations) or any(spatial.uses_location(spec.fields) for spec in specs if spec is not None)
+    return utils.PropertyPlan(properties, type_properties, typed_values, needs_locations)
+
+
+def index_tables(schema_identifier, tables, plan, queue, stop_event, entity_filter):
+    """
+    由流式扫描的实体表（含全部构件）建立属性索引，按 entity_filter 筛选构件。
+    返回 (products, property_index)；失败或取消时返回 None。
+    """
+    if _resolve_classes(entity_filter, schema_identifier, queue) is None:
+        return None
+    # 只为允许的构件建立索引，结果与直接按 entity_filter 扫描一致；实体表本身保持不变
+    keywords = entity_filter.keywords(schema_identifier)
+    selected = copy.copy(tables)
+    selected.products = {entity_id: product for entity_id, product in tables.products.items()
+                         if product[0] in keywords}
+    queue.put({'type': 'status', 'message': "正在建立属性索引..."})
+    indexing = progress.PhaseProgress(queue, "index", "建立属性索引")
+    built = selected.build(stream_scanner.schema_info_for(schema_identifier), plan, stop_event)
+    if built is None:
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    indexing.finish()
+    all_products = built[0]
+    queue.put({'type': 'log', 'message': f"共找到 {len(all_products)} 个待提取的 IfcProduct 实例"})
+    if not all_products:
+        queue.put({'type': 'error', 'message': "文件中未找到任何符合条件的 IfcProduct 实体"})
+        return None
+    return all_products, built[1]
+
+
+def _scan(ifc_path, plan, engine, workers, queue, stop_event, entity_filter, models=None, fingerprint=False):
+    """
+    阶段 1、2：扫描实体并建立属性索引，返回 (products, property_index)；失败或取消时返回 None。
+    只收集 entity_filter 允许的构件，也只为这些构件解析属性集。
+    models 为 service.ModelStore 时从常驻内存的模型取得结果，不重新解析文件。
+    fingerprint 为真且使用流式引擎时扫描中同时计算构件指纹，参见 _revision_state。
+    """
+    if models is not None:
+        queue.put({'type': 'status', 'message': "正在读取常驻模型..."})
+        loaded = models.scan(ifc_path, plan, engine, workers, queue, stop_event, entity_filter)
+    elif engine == "stream":
+        queue.put({'type': 'status', 'message': "正在流式扫描 IFC 文件..."})
+        loaded = _open_with_stream(ifc_path, plan, workers, queue, stop_event, entity_filter, fingerprint)
+    else:
         queue.put({'type': 'status', 'message': "正在扫描 IFC 实体..."})
+        loaded = _open_with_ifcopenshell(ifc_path, plan, workers, queue, stop_event, entity_filter)
+    if loaded is not None:
+        queue.put({'type': 'log', 'message': f"属性索引完成，共 {len(loaded[1])} 个构件含相关属性集"})
+        if plan.locations:
+            queue.put({'type': 'log', 'message': f"空间结构索引: {len(loaded[1].spatial)} 个对象直接包含于空间结构"})
+    return loaded
 
+
+def _fingerprint_scan(ifc_path, plan, workers, queue, stop_event, entity_filter):
+    """流式扫描并计算构件指纹，返回 (schema 标识, ScanTables, {构件 id: 指纹})；用户取消时返回 None"""
+    scanning = progress.PhaseProgress(queue, "fingerprint", "计算构件指纹", total=os.path.getsize(ifc_path), unit="B")
+    scanned = parallel.scan_tables(ifc_path, plan, workers, queue, stop_event, scanning.update, entity_filter,
+                                   fingerprint=True)
+    if scanned is None:
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    scanning.finish()
+    schema_id, tables = scanned
+    return schema_id, tables, tables.fingerprints(plan)
+
+
+def _revision_state(ifc_path, loaded, plan, workers, queue, stop_event, entity_filter):
+    """建立随缓存条目保存的构件指纹记录（incremental.revision_state）；无法计算时记录警告并返回 None"""
+    products, property_index = loaded
+    fingerprints = property_index.fingerprints
+    if fingerprints is None:
         try:
-            ifc_file = ifcopenshell.open(ifc_path)
+            scanned = _fingerprint_scan(ifc_path, plan, workers, queue, stop_event, entity_filter)
         except Exception as e:
-            queue.put({'type': 'error', 'message': f"文件打开失败: {str(e)}"})
-            return
+            queue.put({'type': 'log', 'message': f"警告: 计算构件指纹失败，下一版无法增量提取: {str(e)}"})
+            return None
+        if scanned is None:
+            return None
+        fingerprints = scanned[2]
+    return incremental.revision_state(((product[0], product[2]) for product in products), fingerprints,
+                                      property_index.value_types(plan))
+
 
-        if stop_event.is_set(): return
+def _iter_row_batches(all_products, property_index, plan, include_globalid, include_name, queue, stop_event,
+                      extracting, kinds=None, row_filter=None, locations=()):
+    """
+    阶段 3：逐个构件提取属性，按 WRITE_BATCH_ROWS 行一批产出 ColumnStore；用户取消时提前结束。
+    每处理 CHUNK_SIZE 个构件检查一次取消并更新 extracting 进度。
+    kinds 为 _output_kinds 的结果；给定时属性值按列类型转换，否则转为字符串。
+    row_filter 为 row_filter.RowFilter，按原始属性值求值，不满足条件的构件直接跳过。
+    locations 为输出的位置列（LOCATION_FIELDS 中的字段名），由 plan 建立的空间结构索引取得。
+    """
+    columns = _output_columns(plan.columns, include_globalid, include_name, locations)
+    batch = rowstore.ColumnStore(columns, kinds)
+    resolve = property_index.resolver(plan)
+    locate = property_index.spatial.resolver() if plan.locations else None
+    location_slots = [spatial.LOCATION_FIELDS.index(field) for field in locations]
+    converters = None
+    if kinds is not None:
+        converters = [rowstore.converter(kind) for kind in kinds[len(columns) - len(plan.columns):]]
+    keep = row_filter.test if row_filter is not None else None
+    rejected = 0
+    total = len(all_products)
+    for count, (element_id, ifc_class, global_id, name) in enumerate(all_products):
+        if not count % CHUNK_SIZE:
+            if stop_event.is_set():
+                return
+            extracting.update(count, total)
+
+        try:
+            raw = resolve(element_id)
+            if converters is None:
+                values = [None if value is None else str(value)
+                          for value in raw]
+            else:
+                values = [None if value is None else convert(value)
+                          for value, convert in zip(raw, converters)]
+            if all(value is None or value == rowstore.MISSING for value in values):
+                continue
+            location = locate(element_id) if locate is not None else spatial.NO_LOCATION
+            if keep is not None and not keep(raw, ifc_class, global_id, name, location):
+                rejected += 1
+                continue
 
-        all_products = ifc_file.by_type("IfcProduct")
-        total_count = len(all_products)
-        queue.put({'type': 'log', 'message': f"共找到 {total_count} 个 IfcProduct 实例"})
+            row = []
+            if include_globalid:
+                row.append(None if global_id is None else str(global_id))
+            if include_name:
+                row.append(None if name is None else str(name))
+            for slot in location_slots:
+                row.append(location[slot])
+            row.extend(values)
+            batch.append(row)
 
-        if total_count == 0:
-            queue.put({'type': 'error', 'message': "文件中未找到任何 IfcProduct 实体"})
-            return
+        except Exception as e:
+            queue.put({'type': 'log', 'message': f"警告: 构件 {global_id} 提取失败: {str(e)}", 'key': "构件提取失败"})
+            continue
+
+        if len(batch) >= WRITE_BATCH_ROWS:
+            yield batch
+            batch = rowstore.ColumnStore(columns, kinds)
 
-        results = []
+    if len(batch):
+        yield batch
+    if row_filter is not None:
+        queue.put({'type': 'log', 'message': f"过滤条件排除了 {rejected} 个构件"})
+    extracting.finish()
 
-        # 阶段 2: 提取
-        queue.put({'type': 'status', 'message': "正在提取属性..."})
 
-        for element in all_products:
+def _aggregate(ifc_path, properties, engine, workers, queue, stop_event, entity_filter, type_properties, aggregation,
+               typed_values=False, models=None, row_filter=None):
+    """
+    汇总模式：逐个构件累计到 aggregation（aggregate.Aggregation）的分组中，不保存数据行。
+    参与汇总的构件与普通导出的数据行相同（至少有一个属性值且满足 row_filter）。
+    返回汇总表 ColumnStore；失败或取消时返回 None。
+    """
+    plan = _make_plan(properties, type_properties, typed_values, (), row_filter, aggregation)
+    loaded = _scan(ifc_path, plan, engine, workers, queue, stop_event, entity_filter, models)
+    if loaded is None:
+        return None
+
+    queue.put({'type': 'status', 'message': "正在提取并汇总属性..."})
+    all_products, property_index = loaded
+    extracting = progress.PhaseProgress(queue, "extract", "提取并汇总", total=len(all_products))
+    accumulator = aggregation.accumulator(property_index.value_kinds(plan) if typed_values else None)
+    resolve = property_index.resolver(plan)
+    locate = property_index.spatial.resolver() if plan.locations else None
+    keep = row_filter.test if row_filter is not None else None
+    add = accumulator.add
+    rejected = 0
+    total = len(all_products)
+    for count, (element_id, ifc_class, global_id, name) in enumerate(all_products):
+        if not count % CHUNK_SIZE:
             if stop_event.is_set():
                 queue.put({'type': 'log', 'message': "任务已被用户取消"})
-                return
+                return None
+            extracting.update(count, total)
 
-            if element.is_a() in SKIP_ENTITY_TYPES:
+        try:
+            raw = resolve(element_id)
+            if all(value is None or value == rowstore.MISSING for value in raw):
                 continue
-
-            try:
-                psets = ifcopenshell.util.element.get_psets(element)
-                row = {}
-                has_valid = False
-
-                for prop_name in properties:
-                    value = utils.extract_property_from_psets(psets, prop_name)
-                    if value not in (None, "N/A"):
-                        has_valid = True
-                    row[prop_name] = value
-
-                if has_valid:
-                    if include_globalid:
-                        row["GlobalId"] = utils.safe_str(element.GlobalId)
-                    if include_name:
-                        row["Name"] = utils.safe_str(element.Name)
-                    results.append(row)
-
-            except Exception as e:
-                queue.put({'type': 'log', 'message': f"警告: 构件 {element.GlobalId} 提取失败: {str(e)}"})
+            location = locate(element_id) if locate is not None else spatial.NO_LOCATION
+            if keep is not None and not keep(raw, ifc_class, global_id, name, location):
+                rejected += 1
                 continue
+            add(raw, ifc_class, global_id, name, location)
+        except Exception as e:
+            queue.put({'type': 'log', 'message': f"警告: 构件 {global_id} 提取失败: {str(e)}", 'key': "构件提取失败"})
+    extracting.finish()
 
-        queue.put({'type': 'log', 'message': f"提取完成，共获取 {len(results)} 个有效构件"})
+    if row_filter is not None:
+        queue.put({'type': 'log', 'message': f"过滤条件排除了 {rejected} 个构件"})
+    queue.put({'type': 'log', 'message': f"汇总完成: {accumulator.elements} 个构件, {len(accumulator)} 个分组"})
+    if not accumulator.elements:
+        queue.put({'type': 'error', 'message': "未提取到任何有效数据"})
+        return None
+    return accumulator.to_store()
+
+
+def _extract_store(ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                   entity_filter, type_properties, typed_values=False, models=None, row_filter=None, locations=(),
+                   cache_entry=None):
+    """
+    完整提取为 rowstore.ColumnStore（需要完整结果时使用）；失败或取消时返回 None。
+    cache_entry 为 cache.TableEntryWriter 时数据行与构件指纹同时写入缓存条目，由调用方提交或放弃
+    """
+    plan = _make_plan(properties, type_properties, typed_values, locations, row_filter)
+    loaded = _scan(ifc_path, plan, engine, workers, queue, stop_event, entity_filter, models,
+                   fingerprint=cache_entry is not None)
+    if loaded is None:
+        return None
+
+    queue.put({'type': 'status', 'message': "正在提取属性..."})
+    extracting = progress.PhaseProgress(queue, "extract", "提取属性", total=len(loaded[0]))
+    kinds = _output_kinds(loaded[1], plan, include_globalid, include_name, locations)
+    store = rowstore.ColumnStore(_output_columns(properties, include_globalid, include_name, locations), kinds)
+    for batch in _iter_row_batches(*loaded, plan, include_globalid, include_name, queue, stop_event, extracting,
+                                   kinds, row_filter, locations):
+        store.extend(batch)
+        if cache_entry is not None:
+            cache_entry.write(batch)
+    if stop_event.is_set():
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+
+    queue.put({'type': 'log', 'message': f"提取完成，共获取 {len(store)} 个有效构件"})
+    if not len(store):
+        queue.put({'type': 'error', 'message': "未提取到任何有效数据"})
+        return None
+    if cache_entry is not None:
+        cache_entry.fingerprints = _revision_state(ifc_path, loaded, plan, workers, queue, stop_event, entity_filter)
+    return store
 
-        if not results:
-            queue.put({'type': 'error', 'message': "未提取到任何有效数据"})
-            return
 
-        # 阶段 3: 写入
-        queue.put({'type': 'status', 'message': f"正在写入 {file_format}..."})
+def _extract_dataframe(ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                       entity_filter, type_properties, typed_values=False, models=None, row_filter=None, locations=()):
+    """完整提取为 DataFrame；失败或取消时返回 None"""
+    store = _extract_store(ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                           entity_filter, type_properties, typed_values, models, row_filter, locations)
+    return store.to_dataframe() if store is not None else None
 
-        df = pd.DataFrame(results)
 
-        cols = [c for c in properties if c in df.columns]
-        if include_name and "Name" in df.columns:
-            cols.insert(0, "Name")
-        if include_globalid and "GlobalId" in df.columns:
-            cols.insert(0, "GlobalId")
-        df = df[cols]
+def _stream_extract(ifc_path, properties, include_globalid, include_name, engine, workers,
+                    filepath, file_format, compression, queue, stop_event, entity_filter, type_properties,
+                    typed_values=False, cache_entry=None, models=None, row_filter=None, locations=()):
+    """
+    边提取边写出：数据行按批写入输出文件，内存中不保留完整结果。
+    cache_entry 为 cache.TableEntryWriter 时各批数据行与构件指纹同时写入缓存条目，由调用方提交或放弃。
+    返回写出的行数；失败或取消时返回 None。取消或出错时已写出的部分保留在带 .partial 标记的文件中。
+    """
+    plan = _make_plan(properties, type_properties, typed_values, locations, row_filter)
+    loaded = _scan(ifc_path, plan, engine, workers, queue, stop_event, entity_filter, models,
+                   fingerprint=cache_entry is not None)
+    if loaded is None:
+        return None
 
-        if stop_event.is_set(): return
+    # 阶段 3、4: 提取并写入
+    queue.put({'type': 'status', 'message': f"正在提取属性并写入 {file_format}..."})
+    kinds = _output_kinds(loaded[1], plan, include_globalid, include_name, locations)
+    try:
+        writer = writers.open_writer(filepath, file_format,
+                                     _output_columns(properties, include_globalid, include_name, locations),
+                                     compression, kinds)
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+
+    extracting = progress.PhaseProgress(queue, "extract", "提取并写入", total=len(loaded[0]))
+    try:
+        for batch in _iter_row_batches(*loaded, plan, include_globalid, include_name, queue, stop_event,
+                                       extracting, kinds, row_filter, locations):
+            writer.write_store(batch)
+            if cache_entry is not None:
+                cache_entry.write(batch)
+    except Exception as e:
+        partial = writer.abort()
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        if partial:
+            queue.put({'type': 'log', 'message': f"已保留部分结果 ({writer.rows} 行): {partial}"})
+        return None
+
+    if stop_event.is_set():
+        partial = writer.abort()
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        if partial:
+            queue.put({'type': 'log', 'message': f"已保留部分结果 ({writer.rows} 行): {partial}"})
+        return None
+
+    queue.put({'type': 'log', 'message': f"提取完成，共获取 {writer.rows} 个有效构件"})
+    if not writer.rows:
+        writer.abort(keep=False)
+        queue.put({'type': 'error', 'message': "未提取到任何有效数据"})
+        return None
+
+    try:
+        writer.close()
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+    if cache_entry is not None:
+        cache_entry.fingerprints = _revision_state(ifc_path, loaded, plan, workers, queue, stop_event, entity_filter)
+    return writer.rows
 
-        ext = "xlsx" if file_format == "Excel" else "csv"
-        filename = utils.make_output_filename(base_filename, ext)
-        filepath = os.path.join(output_dir, filename)
 
+def _write_cached(entry, filepath, file_format, compression, queue, stop_event):
+    """命中缓存：逐批读出缓存条目（cache.TableEntry）并写出，返回写出的行数；失败或取消时返回 None"""
+    queue.put({'type': 'status', 'message': f"正在写入 {file_format}..."})
+    writing = progress.PhaseProgress(queue, "write", f"写入 {file_format}", unit="行")
+    writer = None
+    with entry:
         try:
-            if file_format == "Excel":
-                utils.export_to_excel_with_format(df, filepath)
-            else:
-                df.to_csv(filepath, index=False, encoding='utf-8-sig')
+            for batch in entry.batches():
+                if writer is None:
+                    writer = writers.open_writer(filepath, file_format, batch.columns, compression, batch.kinds)
+                writer.write_store(batch)
+                writing.update(writer.rows)
+                if stop_event.is_set():
+                    writer.abort(keep=False)
+                    queue.put({'type': 'log', 'message': "任务已被用户取消"})
+                    return None
+            if writer is None:
+                raise ValueError("缓存条目为空")
+            writer.close()
         except Exception as e:
+            if writer is not None:
+                writer.abort(keep=False)
             queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+            return None
+    writing.finish()
+    return writer.rows
+
+
+def _open_cache_entry(cache, key, queue):
+    """开始写入缓存条目；缓存不可写时记录警告并返回 None"""
+    try:
+        return cache.open_table(key)
+    except Exception as e:
+        queue.put({'type': 'log', 'message': f"警告: 写入缓存失败: {str(e)}"})
+        return None
+
+
+def _finish_cache_entry(entry, succeeded, queue):
+    """提取成功时提交缓存条目，否则放弃；返回是否已提交。缓存写入失败只记录警告"""
+    try:
+        if succeeded:
+            entry.commit()
+            return True
+        entry.discard()
+    except Exception as e:
+        queue.put({'type': 'log', 'message': f"警告: 写入缓存失败: {str(e)}"})
+    return False
+
+
+def _link_export(cache, filepath, key, spec, queue):
+    """记录导出文件对应的缓存条目，之后可直接以该文件作为上一版增量提取"""
+    try:
+        cache.link_export(filepath, key, spec)
+    except Exception as e:
+        queue.put({'type': 'log', 'message': f"警告: 写入缓存失败: {str(e)}"})
+
+
+def _load_previous(task, previous):
+    """读取上一版结果：导出文件直接读取；IFC 文件优先使用缓存，未命中时以相同设置重新提取"""
+    if not previous.lower().endswith(".ifc"):
+        return incremental.load_previous_export(previous)
+
+    if task.cache is not None:
+        df = task.cache.get_table(task.cache.make_key(previous, *task.spec))
+        if df is not None:
+            task.queue.put({'type': 'log', 'message': "上一版模型命中缓存"})
+            return df
+    task.queue.put({'type': 'log', 'message': f"上一版模型无缓存，正在提取: {previous}"})
+    return _extract_dataframe(previous, task.properties, True, task.include_name, task.engine, task.workers,
+                              task.queue, task.stop_event, task.entity_filter, task.type_properties,
+                              task.typed_values, task.models, task.row_filter, task.locations)
+
+
+def _previous_state(task, previous):
+    """查找上一版在缓存中的提取结果与构件指纹，返回 (cache.TableEntry, 指纹记录)；没有时返回 None"""
+    cache = task.cache
+    # 导出文件按缓存记录的导出对应关系查找；IFC 按内容查找，条目没有指纹记录时扫描上一版补算
+    is_ifc = previous.lower().endswith(".ifc")
+    key = cache.make_key(previous, *task.spec) if is_ifc else cache.export_key(previous, task.cache_spec)
+    if key is None:
+        return None
+    entry = cache.read_table(key)
+    if entry is None:
+        return None
+    try:
+        state = cache.get_fingerprints(key)
+        if state is None and is_ifc:
+            task.queue.put({'type': 'log', 'message': "上一版缓存没有构件指纹，正在扫描上一版计算"})
+            scanned = _fingerprint_scan(previous, task.plan, task.workers, task.queue, task.stop_event,
+                                        task.entity_filter)
+            if scanned is not None:
+                state = incremental.revision_state(
+                    ((entity_id, product[1]) for entity_id, product in scanned[1].products.items()), scanned[2])
+                cache.put_fingerprints(key, state)
+    except BaseException:
+        entry.close()
+        raise
+    if state is None:
+        entry.close()
+        return None
+    return entry, state
+
+
+def _incremental_extract(task, previous, cache_entry=None):
+    """只重新提取新增或指纹变化的构件，其余沿用上一版缓存的行；返回 (行数, 变更报告) 或 None"""
+    entry, state = previous
+    queue, stop_event, plan = task.queue, task.stop_event, task.plan
+    if _resolve_classes(task.entity_filter, stream_scanner.read_header(task.ifc_path)[0], queue) is None:
+        return None
+    queue.put({'type': 'status', 'message': "正在扫描新版并计算构件指纹..."})
+    scanned = _fingerprint_scan(task.ifc_path, plan, task.workers, queue, stop_event, task.entity_filter)
+    if scanned is None:
+        return None
+    schema_id, tables, fingerprints = scanned
+    current = incremental.revision_state(
+        ((entity_id, product[1]) for entity_id, product in tables.products.items()), fingerprints)
+    current_fps = current["fingerprints"]
+    previous_fps = state["fingerprints"]
+    changed = {entity_id: product for entity_id, product in tables.products.items()
+               if current_fps.get(product[1]) is None or previous_fps.get(product[1]) != current_fps[product[1]]}
+    queue.put({'type': 'log', 'message': (f"增量提取: {len(tables.products)} 个构件中 {len(changed)} 个为新增或内容有变化，"
+                                          f"只重新提取这些构件")})
+
+    # 只为变化的构件建立索引，其余构件的属性值不解析
+    queue.put({'type': 'status', 'message': "正在建立属性索引..."})
+    indexing = progress.PhaseProgress(queue, "index", "建立属性索引")
+    selected = copy.copy(tables)
+    selected.products = changed
+    built = selected.build(stream_scanner.schema_info_for(schema_id), plan, stop_event)
+    if built is None:
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    indexing.finish()
+    products, property_index = built
+
+    columns = _output_columns(task.properties, True, task.include_name, task.locations)
+    prefix = len(columns) - len(task.properties)
+    batches = entry.batches()
+    first = next(batches, None)
+    previous_kinds = first.kinds[prefix:] if first is not None and first.kinds is not None else None
+    value_types = incremental.merge_value_types(state.get("value_types"), previous_kinds,
+                                                property_index.value_types(plan))
+    kinds = None
+    converters = None
+    if task.typed_values:
+        kinds = [rowstore.KIND_STRING] * prefix + [rowstore.infer_kind(types) for types in value_types]
+        if first is not None and first.kinds != kinds:
+            converters = [rowstore.converter(kind) for kind in kinds]
+
+    queue.put({'type': 'status', 'message': "正在提取变化构件的属性..."})
+    extracting = progress.PhaseProgress(queue, "extract", "提取属性", total=len(products))
+    fresh = rowstore.ColumnStore(columns, kinds)
+    for batch in _iter_row_batches(products, property_index, plan, True, task.include_name, queue, stop_event,
+                                   extracting, kinds, task.row_filter, task.locations):
+        fresh.extend(batch)
+    if stop_event.is_set():
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        return None
+    fresh_rows = {}
+    for rows in fresh.iter_batches(WRITE_BATCH_ROWS):
+        for row in rows:
+            fresh_rows.setdefault(row[0], row)
+
+    # 按上一版的行顺序合并写出：重新提取的构件取新行，指纹未变的构件沿用上一版的行
+    queue.put({'type': 'status', 'message': f"正在合并上一版并写入 {task.file_format}..."})
+    try:
+        writer = writers.open_writer(task.filepath, task.file_format, columns, task.compression, kinds)
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+    writing = progress.PhaseProgress(queue, "write", f"写入 {task.file_format}", unit="行")
+    merged = rowstore.ColumnStore(columns, kinds)
+    # 上一版中被删除或重新提取的构件的行（保持上一版的列类型），用于变更报告
+    replaced = rowstore.ColumnStore(columns, first.kinds if first is not None else kinds)
+    seen = set()
+    reused = 0
+
+    def flush(store):
+        writer.write_store(store)
+        if cache_entry is not None:
+            cache_entry.write(store)
+        writing.update(writer.rows)
+        return rowstore.ColumnStore(columns, kinds)
+
+    try:
+        for batch in itertools.chain((first,) if first is not None else (), batches):
+            for rows in batch.iter_batches(WRITE_BATCH_ROWS):
+                for row in rows:
+                    global_id = row[0]
+                    if global_id in seen:
+                        continue
+                    seen.add(global_id)
+                    fresh_row = fresh_rows.pop(global_id, None)
+                    if fresh_row is not None:
+                        replaced.append(row)
+                        merged.append(fresh_row)
+                    elif previous_fps.get(global_id) is not None and current_fps.get(global_id) == previous_fps[global_id]:
+                        if converters is not None:
+                            row = [None if value is None else convert(value) for value, convert in zip(row, converters)]
+                        merged.append(row)
+                        reused += 1
+                    else:
+                        replaced.append(row)
+                if len(merged) >= WRITE_BATCH_ROWS:
+                    merged = flush(merged)
+            if stop_event.is_set():
+                break
+        if not stop_event.is_set():
+            # 新增构件按新版顺序追加在末尾
+            for row in fresh_rows.values():
+                merged.append(row)
+                if len(merged) >= WRITE_BATCH_ROWS:
+                    merged = flush(merged)
+            if len(merged):
+                flush(merged)
+    except Exception as e:
+        partial = writer.abort()
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        if partial:
+            queue.put({'type': 'log', 'message': f"已保留部分结果 ({writer.rows} 行): {partial}"})
+        return None
+
+    if stop_event.is_set():
+        partial = writer.abort()
+        queue.put({'type': 'log', 'message': "任务已被用户取消"})
+        if partial:
+            queue.put({'type': 'log', 'message': f"已保留部分结果 ({writer.rows} 行): {partial}"})
+        return None
+
+    queue.put({'type': 'log', 'message': f"提取完成，共 {writer.rows} 个有效构件，其中 {reused} 行沿用上一版结果"})
+    if not writer.rows:
+        writer.abort(keep=False)
+        queue.put({'type': 'error', 'message': "未提取到任何有效数据"})
+        return None
+    try:
+        writer.close()
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+    writing.finish()
+    if cache_entry is not None:
+        current["value_types"] = value_types
+        cache_entry.fingerprints = current
+    return writer.rows, incremental.change_report(replaced.to_dataframe(), fresh.to_dataframe())
+
+
+def report_complete(queue, filepath, rows):
+    """发送导出完成消息，并记入性能报告"""
+    job = profiler.current()
+    if job is not None:
+        job.set_info(status="ok", rows=rows, output=filepath)
+    queue.put({
+        'type': 'complete',
+        'filepath': filepath,
+        'rows': rows,
+        'message': f"成功导出 {rows} 行数据"
+    })
+
+
+def _write_profile(job, output_dir, base_filename, stop_event, queue):
+    """在输出文件夹写出性能报告，并在日志中显示摘要"""
+    if 'status' not in job.info:
+        job.set_info(status="cancelled" if stop_event.is_set() else "failed")
+    report_path = os.path.join(output_dir, utils.make_output_filename(f"{base_filename}_profile", "json"))
+    try:
+        report = job.write(report_path)
+    except Exception as e:
+        queue.put({'type': 'log', 'message': f"警告: 写入性能报告失败: {str(e)}"})
+        return
+    for line in profiler.summary_lines(report):
+        queue.put({'type': 'log', 'message': line})
+    queue.put({'type': 'log', 'message': f"性能报告: {report_path}"})
+
+
+class _Task:
+    """一次提取任务的已解析设置，供各模式的执行函数共用"""
+
+    def __init__(self, ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                 entity_filter, type_properties, typed_values, models, row_filter, locations, filepath, file_format,
+                 compression):
+        self.ifc_path = ifc_path
+        self.properties = properties
+        self.include_globalid = include_globalid
+        self.include_name = include_name
+        self.engine = engine
+        self.workers = workers
+        self.queue = queue
+        self.stop_event = stop_event
+        self.entity_filter = entity_filter
+        self.type_properties = type_properties
+        self.typed_values = typed_values
+        self.models = models
+        self.row_filter = row_filter
+        self.locations = locations
+        self.filepath = filepath
+        self.file_format = file_format
+        self.compression = compression
+        self.plan = _make_plan(properties, type_properties, typed_values, locations, row_filter)
+        self.cache = None
+        self.cache_key = None
+        self.cache_spec = None
+
+    @property
+    def spec(self):
+        """cache.make_key 除文件路径外的参数"""
+        return (self.properties, self.include_globalid, self.include_name, self.entity_filter, self.type_properties,
+                self.typed_values, self.row_filter, self.locations)
+
+    def use_cache(self, cache):
+        """计算缓存键；缓存不可用时记录警告，任务不使用缓存"""
+        self.queue.put({'type': 'status', 'message': "正在检查缓存..."})
+        try:
+            self.cache_key = cache.make_key(self.ifc_path, *self.spec)
+            self.cache_spec = cache.spec_key(*self.spec)
+            self.cache = cache
+        except Exception as e:
+            self.queue.put({'type': 'log', 'message': f"警告: 缓存不可用: {str(e)}"})
+
+    def open_cache_entry(self):
+        """开始写入本任务的缓存条目；未使用缓存或缓存不可写时返回 None"""
+        return _open_cache_entry(self.cache, self.cache_key, self.queue) if self.cache is not None else None
+
+    def finish_cache_entry(self, entry, succeeded, link=True):
+        """提交或放弃缓存条目；提交成功且 link 为真时记录输出文件对应的条目"""
+        if entry is not None and _finish_cache_entry(entry, succeeded, self.queue) and link:
+            _link_export(self.cache, self.filepath, self.cache_key, self.cache_spec, self.queue)
+
+
+def _run_aggregate(task, aggregation):
+    """汇总模式：只写出汇总表，返回行数；失败或取消时返回 None"""
+    queue = task.queue
+    queue.put({'type': 'log', 'message': f"汇总模式: 按 {', '.join(aggregation.group_by) or '全部构件'} 分组"})
+    summary = _aggregate(task.ifc_path, task.properties, task.engine, task.workers, queue, task.stop_event,
+                         task.entity_filter, task.type_properties, aggregation, task.typed_values, task.models,
+                         task.row_filter)
+    if summary is None:
+        return None
+    queue.put({'type': 'status', 'message': f"正在写入 {task.file_format}..."})
+    try:
+        writing = progress.PhaseProgress(queue, "write", f"写入 {task.file_format}", total=len(summary), unit="行")
+        writer = writers.open_writer(task.filepath, task.file_format, summary.columns, task.compression,
+                                     summary.kinds)
+        try:
+            writer.write_store(summary)
+        except BaseException:
+            writer.abort(keep=False)
+            raise
+        writer.close()
+        writing.finish()
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+    return len(summary)
+
+
+def _run_cached(task):
+    """命中缓存时直接写出缓存条目，返回行数；未命中返回 False，失败或取消时返回 None"""
+    try:
+        entry = task.cache.read_table(task.cache_key)
+    except Exception as e:
+        task.queue.put({'type': 'log', 'message': f"警告: 缓存不可用: {str(e)}"})
+        return False
+    if entry is None:
+        return False
+    task.queue.put({'type': 'log', 'message': "命中缓存，跳过解析"})
+    rows = _write_cached(entry, task.filepath, task.file_format, task.compression, task.queue, task.stop_event)
+    if rows is not None:
+        _link_export(task.cache, task.filepath, task.cache_key, task.cache_spec, task.queue)
+    return rows
+
+
+def _run_stream(task):
+    """边提取边写出（启用缓存时同时写入缓存条目），返回行数；失败或取消时返回 None"""
+    cache_entry = task.open_cache_entry()
+    rows = None
+    try:
+        rows = _stream_extract(task.ifc_path, task.properties, task.include_globalid, task.include_name, task.engine,
+                               task.workers, task.filepath, task.file_format, task.compression, task.queue,
+                               task.stop_event, task.entity_filter, task.type_properties, task.typed_values,
+                               cache_entry=cache_entry, models=task.models, row_filter=task.row_filter,
+                               locations=task.locations)
+    finally:
+        task.finish_cache_entry(cache_entry, rows is not None)
+    return rows
+
+
+def _run_incremental(task, previous):
+    """上一版对比：缓存中有上一版的结果与构件指纹时增量提取，否则回退到 _run_full；返回 (行数, 变更报告) 或 None"""
+    queue = task.queue
+    state = None
+    if task.cache is None:
+        queue.put({'type': 'log', 'message': "未启用缓存，无法沿用上一版的提取结果，将完整提取后对比"})
+    else:
+        queue.put({'type': 'status', 'message': "正在查找上一版的缓存..."})
+        try:
+            state = _previous_state(task, previous)
+        except Exception as e:
+            queue.put({'type': 'log', 'message': f"警告: 读取上一版缓存失败: {str(e)}"})
+        if state is None and not task.stop_event.is_set():
+            queue.put({'type': 'log', 'message': ("缓存中没有上一版的提取结果与构件指纹（上一版需以相同设置启用缓存导出），"
+                                                  "将完整提取后对比")})
+    if state is None:
+        return None if task.stop_event.is_set() else _run_full(task, previous)
+
+    entry = state[0]
+    cache_entry = task.open_cache_entry()
+    result = None
+    fall_back = False
+    try:
+        result = _incremental_extract(task, state, cache_entry)
+    except Exception as e:
+        queue.put({'type': 'log', 'message': f"警告: 增量提取失败，将完整提取后对比: {str(e)}"})
+        fall_back = True
+    finally:
+        entry.close()
+        task.finish_cache_entry(cache_entry, result is not None)
+    return _run_full(task, previous) if fall_back else result
+
+
+def _run_full(task, previous):
+    """完整提取新版（或读取新版缓存）后与上一版按 GlobalId 合并写出，返回 (行数, 变更报告)；失败或取消时返回 None"""
+    queue = task.queue
+    df = task.cache.get_table(task.cache_key) if task.cache is not None else None
+    if df is not None:
+        queue.put({'type': 'log', 'message': f"新版命中缓存，跳过解析 ({len(df)} 行)"})
+    else:
+        cache_entry = task.open_cache_entry()
+        store = None
+        try:
+            store = _extract_store(task.ifc_path, task.properties, task.include_globalid, task.include_name,
+                                   task.engine, task.workers, queue, task.stop_event, task.entity_filter,
+                                   task.type_properties, task.typed_values, task.models, task.row_filter,
+                                   task.locations, cache_entry)
+        finally:
+            # 输出文件尚未写出，写出后再记录导出对应关系
+            task.finish_cache_entry(cache_entry, store is not None, link=False)
+        if store is None:
+            return None
+        df = store.to_dataframe()
+
+    queue.put({'type': 'status', 'message': "正在对比上一版..."})
+    try:
+        previous_df = _load_previous(task, previous)
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"读取上一版失败: {str(e)}"})
+        return None
+    if previous_df is None:
+        return None
+    df, report = incremental.merge_revision(previous_df, df)
+
+    queue.put({'type': 'status', 'message': f"正在写入 {task.file_format}..."})
+    if task.stop_event.is_set():
+        return None
+    try:
+        writing = progress.PhaseProgress(queue, "write", f"写入 {task.file_format}", total=len(df), unit="行")
+        writers.write_dataframe(df, task.filepath, task.file_format, task.compression, writing.update)
+        writing.finish()
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return None
+    if task.cache is not None:
+        _link_export(task.cache, task.filepath, task.cache_key, task.cache_spec, queue)
+    return len(df), report
+
+
+def _write_change_report(task, report, report_path):
+    """记录变更统计，report_path 非空时写出变更报告；返回是否成功"""
+    counts = report["变更类型"].value_counts()
+    task.queue.put({'type': 'log', 'message': (
+        f"增量对比: 新增 {counts.get(incremental.CHANGE_ADDED, 0)}, "
+        f"删除 {counts.get(incremental.CHANGE_REMOVED, 0)}, "
+        f"修改 {counts.get(incremental.CHANGE_MODIFIED, 0)}")})
+    if report_path is None:
+        return True
+    try:
+        writers.write_dataframe(report, report_path, task.file_format, task.compression)
+    except Exception as e:
+        task.queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+        return False
+    task.queue.put({'type': 'log', 'message': f"变更报告: {report_path}"})
+    return True
+
+
+def _compile_options(properties, row_filter, group_by, measures, locations, queue):
+    """解析位置列、行过滤与汇总设置，返回 (locations, RowFilter, Aggregation)；无效时报告错误并返回 None"""
+    try:
+        locations = spatial.parse_locations(locations)
+    except ValueError as e:
+        queue.put({'type': 'error', 'message': f"位置列无效: {str(e)}"})
+        return None
+    try:
+        compiled_filter = compile_filter(row_filter, properties)
+    except ValueError as e:
+        queue.put({'type': 'error', 'message': f"过滤条件无效: {str(e)}"})
+        return None
+    if compiled_filter is not None:
+        queue.put({'type': 'log', 'message': f"行过滤: {compiled_filter.expression}"})
+    try:
+        aggregation = aggregate.compile_aggregation(group_by, measures, properties)
+    except ValueError as e:
+        queue.put({'type': 'error', 'message': f"汇总设置无效: {str(e)}"})
+        return None
+    return locations, compiled_filter, aggregation
+
+
+def extract_table(ifc_path, properties, include_globalid, include_name, queue, stop_event,
+                  engine="ifcopenshell", workers=None, include_types=None, exclude_types=None, type_properties=True,
+                  typed_values=False, models=None, row_filter=None, group_by=None, measures=None, locations=None):
+    """在内存中提取为 rowstore.ColumnStore（给定汇总设置时为汇总表），不写出文件；失败或取消时返回 None"""
+    compiled = _compile_options(properties, row_filter, group_by, measures, locations, queue)
+    if compiled is None:
+        return None
+    locations, compiled_filter, aggregation = compiled
+    workers = workers or parallel.default_workers()
+    entity_filter = EntityFilter(include_types, exclude_types)
+    if aggregation is not None:
+        return _aggregate(ifc_path, properties, engine, workers, queue, stop_event, entity_filter, type_properties,
+                          aggregation, typed_values, models, compiled_filter)
+    return _extract_store(ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                          entity_filter, type_properties, typed_values, models, compiled_filter, locations)
+
+
+def extract_properties(ifc_path, properties, include_globalid, include_name,
+                       output_dir, base_filename, file_format, queue, stop_event,
+                       engine="ifcopenshell", workers=None, cache=None,
+                       previous_export=None, change_report=False, compression=DEFAULT_COMPRESSION,
+                       include_types=None, exclude_types=None, type_properties=True, profile=None,
+                       typed_values=False, models=None, row_filter=None, group_by=None, measures=None,
+                       locations=None):
+    """工作线程函数：执行 IFC 实体扫描与属性提取（各选项的说明见 README）"""
+    job = profiler.JobProfiler(hot_loop=profile == "cprofile") if profile else None
+    stack = ExitStack()
+    try:
+        queue.put({'type': 'log', 'message': f"开始处理文件: {ifc_path}"})
+        workers = workers or parallel.default_workers()
+        if job is not None:
+            stack.enter_context(job)
+            job.set_info(input=ifc_path, size_mb=round(os.path.getsize(ifc_path) / 1048576, 2), engine=engine,
+                         workers=workers, file_format=file_format, properties=len(properties), typed=typed_values,
+                         row_filter=row_filter or None, aggregate=bool(group_by or measures))
+        compiled = _compile_options(properties, row_filter, group_by, measures, locations, queue)
+        if compiled is None:
+            return
+        locations, compiled_filter, aggregation = compiled
+        if previous_export and not include_globalid:
+            queue.put({'type': 'error', 'message': "增量对比需要包含 GlobalId"})
             return
+        if previous_export and aggregation is not None:
+            queue.put({'type': 'error', 'message': "汇总模式不支持增量对比"})
+            return
+
+        ext = OUTPUT_FORMATS[file_format]
+        filepath = os.path.join(output_dir, utils.make_output_filename(base_filename, ext))
+        task = _Task(ifc_path, properties, include_globalid, include_name, engine, workers, queue, stop_event,
+                     EntityFilter(include_types, exclude_types), type_properties, typed_values, models,
+                     compiled_filter, locations, filepath, file_format, compression)
+        if cache is not None and aggregation is None:
+            task.use_cache(cache)
 
-        queue.put({
-            'type': 'complete',
-            'filepath': filepath,
-            'message': f"成功导出 {len(results)} 行数据"
-        })
+        if aggregation is not None:
+            rows = _run_aggregate(task, aggregation)
+        elif not previous_export:
+            rows = _run_cached(task) if task.cache is not None else False
+            if rows is False:
+                rows = _run_stream(task)
+        else:
+            report_path = None
+            if change_report:
+                report_path = os.path.join(output_dir, utils.make_output_filename(f"{base_filename}_changes", ext))
+            revision = _run_incremental(task, previous_export)
+            rows = None
+            if revision is not None and _write_change_report(task, revision[1], report_path):
+                rows = revision[0]
+        if rows is not None:
+            report_complete(queue, filepath, rows)
 
     except Exception as e:
         queue.put({'type': 'error', 'message': f"未捕获的异常: {str(e)}"})
         queue.put({'type': 'log', 'message': traceback.format_exc()})
     finally:
+        stack.close()
+        if job is not None:
+            _write_profile(job, output_dir, base_filename, stop_event, queue)
         queue.put({'type': 'finished'})
\ No newline at end of file
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+"""
+联合提取模块：同时提取多个 IFC 模型（如结构、预制、机电分专业模型），合并为一个带来源文件列的输出。
+各模型在独立进程中并行打开与提取（大文件优先调度），总耗时接近最大的单个模型；
+合并时用 GlobalId 哈希索引找出出现在多个来源中的构件，按 duplicates 去重或标记值不一致的冲突。
+"""
+
+import multiprocessing
+import os
+import threading
+import traceback
+
+import numpy as np
+import pandas as pd
+
+from ifc_prop_getter import extractor, parallel, progress, rowstore, spatial, utils, writers
+from ifc_prop_getter.constants import DEFAULT_COMPRESSION, OUTPUT_FORMATS
+from ifc_prop_getter.entity_filter import EntityFilter
+from ifc_prop_getter.messages import MessageChannel
+from ifc_prop_getter.row_filter import compile_filter
+
+# 来源文件列与 GlobalId 冲突列的列名
+SOURCE_COLUMN = "来源文件"
+CONFLICT_COLUMN = "GlobalId 冲突"
+
+# 多个来源的值合并显示时的分隔符
+SOURCE_SEPARATOR = "; "
+
+
+def _source_labels(ifc_paths):
+    """来源文件列的取值：文件名；文件名重复时使用完整路径"""
+    names = [os.path.basename(path) for path in ifc_paths]
+    if len(set(names)) == len(names):
+        return names
+    return [os.path.abspath(path) for path in ifc_paths]
+
+
+def _relay_cancel(cancel, stop_event, finished):
+    """子进程中每 0.2 秒检查一次跨进程的取消标志，置位（或无法访问）时设置本进程的 stop_event"""
+    while not finished.wait(0.2):
+        try:
+            cancelled = cancel.is_set()
+        except Exception:
+            cancelled = True
+        if cancelled:
+            stop_event.set()
+            return
+
+
+def _extract_member(ifc_path, options, stop_event=None, cancel=None):
+    """
+    提取单个成员模型（可在子进程中执行），返回 (rowstore.ColumnStore 或 None, 日志与错误消息列表)。
+    始终包含 GlobalId 列以便合并时去重；options 只含可跨进程传递的简单值。
+    在子进程中执行时 cancel 为跨进程的取消标志，转为本进程的 stop_event，提取中频繁的取消检查不需要跨进程通信。
+    """
+    channel = MessageChannel()
+    stop_event = stop_event or threading.Event()
+    finished = threading.Event()
+    if cancel is not None:
+        threading.Thread(target=_relay_cancel, args=(cancel, stop_event, finished), daemon=True).start()
+    try:
+        store = extractor.extract_table(
+            ifc_path, options['properties'], True, options['include_name'], channel, stop_event,
+            engine=options['engine'], workers=options['workers'], include_types=options['include_types'],
+            exclude_types=options['exclude_types'], type_properties=options['type_properties'],
+            typed_values=options['typed_values'], row_filter=options['row_filter'], locations=options['locations'])
+    except Exception as e:
+        channel.put({'type': 'error', 'message': f"未捕获的异常: {str(e)}"})
+        channel.put({'type': 'log', 'message': traceback.format_exc()})
+        store = None
+    finally:
+        finished.set()
+    return store, [msg for msg in channel.drain() if msg['type'] in ('log', 'error')]
+
+
+def merge_members(frames, sources, duplicates="merge", typed_values=False):
+    """
+    纵向合并各模型的提取结果（均含 GlobalId 列），在首列加入来源文件，末列加入 GlobalId 冲突。
+    只对出现多次的 GlobalId 建立哈希索引逐行比较：值完全相同的为重复构件，值不同的为冲突，
+    冲突列列出同一 GlobalId 下值不同的其他来源。duplicates:
+      "merge" 重复构件只保留首行，来源文件列合并列出各来源；冲突的各行均保留
+      "keep"  保留全部行，只标记冲突
+      "first" 每个 GlobalId 只保留首次出现的行（按输入顺序）
+    typed_values 与提取时一致：为真时无冲突的行冲突列为空值，否则为 N/A。返回 (合并后的 DataFrame, 统计字典)
+    """
+    df = pd.concat([frame.assign(**{SOURCE_COLUMN: source}) for frame, source in zip(frames, sources)],
+                   ignore_index=True)
+    value_columns = [column for column in df.columns if column != SOURCE_COLUMN]
+    df = df[[SOURCE_COLUMN] + value_columns]
+    sources_out = df[SOURCE_COLUMN].tolist()
+    conflicts = [None] * len(df)
+    dropped = []
+    stats = {'shared': 0, 'conflicting': 0, 'dropped': 0}
+
+    global_ids = df["GlobalId"]
+    candidates = global_ids.notna() & (global_ids != rowstore.MISSING) & global_ids.duplicated(keep=False)
+    positions = np.flatnonzero(candidates.to_numpy())
+    if len(positions):
+        # 哈希索引：{GlobalId: [行号]}，行号按输入顺序
+        groups = {}
+        for position, global_id in zip(positions, global_ids.iloc[positions]):
+            groups.setdefault(global_id, []).append(position)
+        rows = df[value_columns].iloc[positions].astype(object)
+        rows = dict(zip(positions, rows.where(rows.notna(), None).itertuples(index=False, name=None)))
+        for members in groups.values():
+            variants = {}  # {行值: [行号]}
+            for position in members:
+                variants.setdefault(rows[position], []).append(position)
+            stats['shared'] += 1
+            variant_sources = [list(dict.fromkeys(sources_out[p] for p in group)) for group in variants.values()]
+            if len(variants) > 1:
+                stats['conflicting'] += 1
+                for i, group in enumerate(variants.values()):
+                    others = [s for j, names in enumerate(variant_sources) if j != i for s in names]
+                    text = SOURCE_SEPARATOR.join(dict.fromkeys(others))
+                    for position in group:
+                        conflicts[position] = text
+            if duplicates == "first":
+                dropped.extend(members[1:])
+            elif duplicates == "merge":
+                for group, names in zip(variants.values(), variant_sources):
+                    sources_out[group[0]] = SOURCE_SEPARATOR.join(names)
+                    dropped.extend(group[1:])
+
+    df[SOURCE_COLUMN] = sources_out
+    df[CONFLICT_COLUMN] = conflicts if typed_values else [rowstore.MISSING if text is None else text
+                                                          for text in conflicts]
+    if dropped:
+        df = df.drop(index=dropped).reset_index(drop=True)
+    stats['dropped'] = len(dropped)
+    return df, stats
+
+
+def extract_federated(ifc_paths, properties, include_globalid, include_name,
+                      output_dir, base_filename, file_format, queue, stop_event,
+                      engine="ifcopenshell", workers=None, cache=None, compression=DEFAULT_COMPRESSION,
+                      include_types=None, exclude_types=None, type_properties=True, typed_values=False,
+                      row_filter=None, locations=None, duplicates="merge"):
+    """
+    工作线程函数：并行提取多个 IFC 模型并合并写出一个文件。参数与 extractor.extract_properties 相同，另有：
+    ifc_paths: 成员模型路径列表；输出首列为来源文件
+    workers: 总并行进程数，默认为 CPU 核心数；同时提取的模型数不超过该值，剩余的进程数分给各模型内部
+    duplicates: 同一 GlobalId 出现在多个来源中时的处理方式，参见 merge_members
+    cache 按单个模型缓存（与单独提取该模型且包含 GlobalId 时共用缓存），只有未命中的模型需要重新解析。
+    不支持汇总模式与上一版对比。
+    """
+    try:
+        queue.put({'type': 'log', 'message': f"联合提取: {len(ifc_paths)} 个模型"})
+        workers = workers or parallel.default_workers()
+        try:
+            locations = spatial.parse_locations(locations)
+            compiled_filter = compile_filter(row_filter, properties)
+        except ValueError as e:
+            queue.put({'type': 'error', 'message': f"参数无效: {str(e)}"})
+            return
+        entity_filter = EntityFilter(include_types, exclude_types)
+        sources = _source_labels(ifc_paths)
+        frames = [None] * len(ifc_paths)
+
+        keys = [None] * len(ifc_paths)
+        if cache is not None:
+            for i, path in enumerate(ifc_paths):
+                try:
+                    keys[i] = cache.make_key(path, properties, True, include_name, entity_filter, type_properties,
+                                             typed_values, compiled_filter, locations)
+                    frames[i] = cache.get_table(keys[i])
+                except Exception as e:
+                    queue.put({'type': 'log', 'message': f"警告: 缓存不可用: {str(e)}"})
+                if frames[i] is not None:
+                    queue.put({'type': 'log', 'message': f"[{sources[i]}] 命中缓存 ({len(frames[i])} 行)"})
+
+        pending = [i for i, frame in enumerate(frames) if frame is None]
+        # 大文件优先，缩短整体耗时的长尾
+        pending.sort(key=lambda i: os.path.getsize(ifc_paths[i]), reverse=True)
+        concurrent = max(1, min(workers, len(pending)))
+        options = {
+            'properties': list(properties), 'include_name': include_name, 'engine': engine,
+            'workers': max(1, workers // concurrent), 'include_types': entity_filter.include,
+            'exclude_types': entity_filter.exclude, 'type_properties': type_properties,
+            'typed_values': typed_values, 'row_filter': row_filter, 'locations': locations,
+        }
+
+        queue.put({'type': 'status', 'message': f"正在并行提取 {len(pending)} 个模型..."})
+        extracting = progress.PhaseProgress(queue, "extract", "提取模型", total=len(pending), unit="文件")
+        if concurrent > 1:
+            queue.put({'type': 'log', 'message': f"并行提取: {concurrent} 个模型同时进行，"
+                                                 f"每个模型 {options['workers']} 个进程"})
+            # 取消时通过共享的取消标志通知各子进程中的提取，等待其结束后返回
+            with multiprocessing.Manager() as manager:
+                cancel = manager.Event()
+                results = parallel.run_shards(_extract_member, [(ifc_paths[i], options, None, cancel) for i in pending],
+                                              concurrent, stop_event, extracting.update, cancel_event=cancel)
+        else:
+            results = []
+            for count, i in enumerate(pending):
+                results.append(_extract_member(ifc_paths[i], options, stop_event))
+                extracting.update(count + 1, len(pending))
+                if stop_event.is_set():
+                    break
+        if results is None or stop_event.is_set():
+            queue.put({'type': 'log', 'message': "任务已被用户取消"})
+            return
+
+        for i, (store, messages) in zip(pending, results):
+            error = None
+            for msg in messages:
+                if msg['type'] == 'error':
+                    error = error or msg['message']
+                else:
+                    queue.put(dict(msg, message=f"[{sources[i]}] {msg['message']}"))
+            if store is None:
+                queue.put({'type': 'error', 'message': f"模型 {sources[i]} 提取失败: {error or '未知错误'}"})
+                return
+            frames[i] = store.to_dataframe()
+            if keys[i] is not None:
+                try:
+                    cache.put_table(keys[i], store)
+                except Exception as e:
+                    queue.put({'type': 'log', 'message': f"警告: 写入缓存失败: {str(e)}"})
+        extracting.finish()
+
+        queue.put({'type': 'status', 'message': "正在合并模型..."})
+        df, stats = merge_members(frames, sources, duplicates, typed_values)
+        queue.put({'type': 'log', 'message': (
+            f"合并完成: {len(df)} 行; {stats['shared']} 个 GlobalId 出现在多处，"
+            f"其中 {stats['conflicting']} 个值不一致; 去重删除 {stats['dropped']} 行")})
+        if not include_globalid:
+            df = df.drop(columns="GlobalId")
+
+        queue.put({'type': 'status', 'message': f"正在写入 {file_format}..."})
+        filepath = os.path.join(output_dir, utils.make_output_filename(base_filename, OUTPUT_FORMATS[file_format]))
+        try:
+            writing = progress.PhaseProgress(queue, "write", f"写入 {file_format}", total=len(df), unit="行")
+            writers.write_dataframe(df, filepath, file_format, compression, writing.update)
+            writing.finish()
+        except Exception as e:
+            queue.put({'type': 'error', 'message': f"写入文件失败: {str(e)}"})
+            return
+        extractor.report_complete(queue, filepath, len(df))
+
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"未捕获的异常: {str(e)}"})
+        queue.put({'type': 'log', 'message': traceback.format_exc()})
+    finally:
+        queue.put({'type': 'finished'})
\ No newline at end of file
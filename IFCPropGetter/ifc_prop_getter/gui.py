@@ -1,18 +1,40 @@
 # -*- coding: utf-8 -*-
 
-"""GUI 界面模块"""
+"""
+GUI 界面模块。启动时只导入界面与参数校验所需的轻量模块，提取流程及其依赖（ifcopenshell、pandas、openpyxl）
+在窗口显示后由后台线程预先导入，各操作在用到时再从已导入的模块中取用。
+"""
 
+import importlib
 import os
 import sys
-import queue
 import threading
 from pathlib import Path
 from tkinter import messagebox, filedialog, BooleanVar, StringVar, ttk
 
 import customtkinter as ctk
 
-from ifc_prop_getter import extractor, utils
-from ifc_prop_getter.constants import DEFAULT_PROPERTIES
+from ifc_prop_getter import progress, utils
+from ifc_prop_getter.entity_filter import parse_class_list
+from ifc_prop_getter.messages import MessageChannel
+from ifc_prop_getter.row_filter import SPECIAL_FIELDS, compile_filter
+from ifc_prop_getter.spatial import LOCATION_FIELDS, LOCATION_LABELS
+from ifc_prop_getter.constants import (COMPRESSION_CHOICES, DEFAULT_COMPRESSION, DEFAULT_PROPERTIES, DUPLICATE_MODES,
+                                       FORMAT_COMPRESSION_CHOICES, LOG_VIEW_MAX_LINES, PROFILE_MODES,
+                                       SKIP_ENTITY_TYPES)
+
+# 窗口显示后在后台预先导入的模块，按首次使用的可能性排序
+WARM_UP_MODULES = ("ifc_prop_getter.extractor", "openpyxl", "ifc_prop_getter.cache", "ifc_prop_getter.aggregate",
+                   "ifc_prop_getter.catalog", "ifc_prop_getter.federation", "ifc_prop_getter.service")
+
+
+def warm_up(modules=WARM_UP_MODULES):
+    """依次导入 modules；导入失败的模块跳过，错误留到实际使用时再报告"""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
 
 
 def get_resource_path(relative_path):
@@ -60,32 +82,58 @@ class IFCPropertyExtractorApp:
             self.root.iconbitmap(default=icon_path)
 
         self.ifc_path = StringVar()
+        # 所选 IFC 文件；多于一个时联合提取，合并为一个输出
+        self.ifc_paths = []
+        self.duplicate_mode = StringVar(value=next(iter(DUPLICATE_MODES)))
         self.file_size = StringVar(value="未选择文件")
         self.properties = DEFAULT_PROPERTIES.copy()
 
         # 属性选项
         self.include_globalid = BooleanVar(value=True)
         self.include_name = BooleanVar(value=False)
+        self.type_properties = BooleanVar(value=True)
+        self.typed_values = BooleanVar(value=False)
+        self.use_cache = BooleanVar(value=False)
+        self.save_log = BooleanVar(value=False)
+        # 位置列：所属场地、建筑、楼层
+        self.locations = {field: BooleanVar(value=False) for field in LOCATION_FIELDS}
+        # 构件类型过滤（逗号分隔的 IFC 类名，均包含子类）
+        self.include_types = StringVar()
+        self.exclude_types = StringVar(value=", ".join(sorted(SKIP_ENTITY_TYPES)))
+        self.row_filter = StringVar()
+        self.group_by = StringVar()
+        self.measures = StringVar()
 
         self.output_filename = StringVar(value="output_data")
         self.output_dir = StringVar(value=utils.get_default_output_dir())
         self.output_format = StringVar(value="Excel")
-
-        self.queue = queue.Queue()
+        self.compression = StringVar(value=DEFAULT_COMPRESSION)
+        self.engine = StringVar(value="ifcopenshell")
+        self.previous_export = StringVar()
+        self.change_report = BooleanVar(value=True)
+        self.workers = StringVar(value=str(utils.default_workers()))
+        self.profile_mode = StringVar(value=next(iter(PROFILE_MODES)))
+        self.service_url = StringVar()
+
+        self.queue = MessageChannel()
         self.worker_thread = None
         self.progress_window = None
         self.running = False
         self.stop_event = threading.Event()
+        self.warm_up_thread = None
 
         # 进度文本
         self.status_text = StringVar(value="准备就绪")
-
-        # 动画控制
-        self.marquee_val = 0.0
-        self.marquee_after_id = None
+        self.progress_text = StringVar(value="")
 
         self._create_widgets()
         self.root.after(100, self._check_queue)
+        self.root.after_idle(self._start_warm_up)
+
+    def _start_warm_up(self):
+        """窗口首次绘制后在后台导入提取模块；用户选择文件期间即可完成，点击开始时无需等待"""
+        self.warm_up_thread = threading.Thread(target=warm_up, daemon=True)
+        self.warm_up_thread.start()
 
     def _create_widgets(self):
         main_frame = ctk.CTkFrame(self.root, fg_color=self.colors["bg"], corner_radius=0)
@@ -110,6 +158,10 @@ class IFCPropertyExtractorApp:
         row2.pack(fill="x", pady=3)
         ctk.CTkLabel(row2, textvariable=self.file_size, font=("微软雅黑", 11), text_color=self.colors["fg"]).pack(
             side="left")
+        ctk.CTkOptionMenu(row2, variable=self.duplicate_mode, width=120, height=28, values=list(DUPLICATE_MODES),
+                          fg_color=self.colors["primary"], font=self.font_main).pack(side="right")
+        ctk.CTkLabel(row2, text="多个文件时重复的 GlobalId:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="right", padx=8)
 
         # --- 属性管理区 ---
         prop_frame = ctk.CTkFrame(main_frame, fg_color=self.colors["frame_bg"], corner_radius=12)
@@ -125,6 +177,8 @@ class IFCPropertyExtractorApp:
         self.prop_entry.pack(side="left", padx=8)
         ctk.CTkButton(add_row, text="添加", command=self._add_property, width=60, height=30,
                       fg_color=self.colors["primary"], font=self.font_main).pack(side="left")
+        ctk.CTkButton(add_row, text="从模型选择...", command=self._scan_catalog, width=110, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=8)
 
         # Treeview 列表
         tree_container = ctk.CTkFrame(inner_prop, fg_color="transparent", border_width=1, border_color="#ccc")
@@ -177,6 +231,58 @@ class IFCPropertyExtractorApp:
                         fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
         ctk.CTkCheckBox(check_row, text="包含 Name", variable=self.include_name,
                         fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+        ctk.CTkCheckBox(check_row, text="包含类型属性", variable=self.type_properties,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+        ctk.CTkCheckBox(check_row, text="保留数值类型", variable=self.typed_values,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+        ctk.CTkCheckBox(check_row, text="使用缓存", variable=self.use_cache,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+        ctk.CTkCheckBox(check_row, text="保存完整日志", variable=self.save_log,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+
+        location_row = ctk.CTkFrame(inner_prop, fg_color="transparent")
+        location_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(location_row, text="位置列:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        for field in LOCATION_FIELDS:
+            ctk.CTkCheckBox(location_row, text=f"{LOCATION_LABELS[field]} ({field})", variable=self.locations[field],
+                            fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=5)
+        ctk.CTkLabel(location_row, text="零件继承所属装配体的位置", text_color=self.colors["fg"],
+                     font=self.font_main).pack(side="right")
+
+        include_row = ctk.CTkFrame(inner_prop, fg_color="transparent")
+        include_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(include_row, text="包含类型:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        ctk.CTkLabel(include_row, text="留空为全部，均含子类", text_color=self.colors["fg"],
+                     font=self.font_main).pack(side="right")
+        ctk.CTkEntry(include_row, textvariable=self.include_types, height=30, font=self.font_main).pack(
+            side="left", fill="x", expand=True, padx=8)
+
+        exclude_row = ctk.CTkFrame(inner_prop, fg_color="transparent")
+        exclude_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(exclude_row, text="排除类型:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        ctk.CTkEntry(exclude_row, textvariable=self.exclude_types, height=30, font=self.font_main).pack(
+            side="left", fill="x", expand=True, padx=8)
+
+        filter_row = ctk.CTkFrame(inner_prop, fg_color="transparent")
+        filter_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(filter_row, text="行过滤:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        ctk.CTkButton(filter_row, text="编辑...", command=self._show_filter_editor, width=70, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="right")
+        ctk.CTkEntry(filter_row, textvariable=self.row_filter, height=30, font=self.font_main,
+                     placeholder_text="可选：只输出满足条件的构件，例如 [Cast unit Mark] startswith 'PC-'").pack(
+            side="left", fill="x", expand=True, padx=8)
+
+        aggregate_row = ctk.CTkFrame(inner_prop, fg_color="transparent")
+        aggregate_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(aggregate_row, text="汇总分组:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="left")
+        ctk.CTkEntry(aggregate_row, textvariable=self.group_by, width=220, height=30, font=self.font_main,
+                     placeholder_text="例如 [Cast unit Mark], Class").pack(side="left", padx=8)
+        ctk.CTkLabel(aggregate_row, text="汇总项:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="left")
+        ctk.CTkEntry(aggregate_row, textvariable=self.measures, height=30, font=self.font_main,
+                     placeholder_text="count, sum(Weight), min/max(...), distinct(...)；留空则输出明细").pack(
+            side="left", fill="x", expand=True, padx=8)
 
         self._refresh_tree()
 
@@ -202,6 +308,20 @@ class IFCPropertyExtractorApp:
         ctk.CTkButton(dir_row, text="浏览", command=self._browse_output_dir, width=60, height=30,
                       fg_color=self.colors["primary"], font=self.font_main).pack(side="right")
 
+        prev_row = ctk.CTkFrame(inner_opt, fg_color="transparent")
+        prev_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(prev_row, text="上一版对比:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        self.prev_entry = ctk.CTkEntry(prev_row, textvariable=self.previous_export, state="readonly", height=30,
+                                       placeholder_text="可选：上一版导出文件或 IFC", font=self.font_main)
+        self.prev_entry.pack(side="left", fill="x", expand=True, padx=8)
+        ctk.CTkCheckBox(prev_row, text="变更报告", variable=self.change_report,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="right", padx=5)
+        ctk.CTkButton(prev_row, text="清除", command=lambda: self.previous_export.set(""), width=50, height=30,
+                      fg_color=self.colors["secondary"], text_color=self.colors["fg"],
+                      font=self.font_main).pack(side="right", padx=2)
+        ctk.CTkButton(prev_row, text="浏览", command=self._browse_previous, width=60, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="right", padx=2)
+
         format_row = ctk.CTkFrame(inner_opt, fg_color="transparent")
         format_row.pack(fill="x", pady=3)
         ctk.CTkLabel(format_row, text="输出格式:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
@@ -209,6 +329,46 @@ class IFCPropertyExtractorApp:
                            fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=10)
         ctk.CTkRadioButton(format_row, text="CSV (.csv)", variable=self.output_format, value="CSV",
                            fg_color=self.colors["primary"], font=self.font_main).pack(side="left")
+        ctk.CTkRadioButton(format_row, text="Parquet", variable=self.output_format, value="Parquet",
+                           fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=10)
+        ctk.CTkRadioButton(format_row, text="Feather", variable=self.output_format, value="Feather",
+                           fg_color=self.colors["primary"], font=self.font_main).pack(side="left")
+        ctk.CTkRadioButton(format_row, text="SQLite", variable=self.output_format, value="SQLite",
+                           fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=10)
+        self.compression_menu = ctk.CTkOptionMenu(format_row, variable=self.compression, width=80, height=28,
+                                                  values=COMPRESSION_CHOICES, fg_color=self.colors["primary"],
+                                                  font=self.font_main)
+        self.compression_menu.pack(side="right")
+        ctk.CTkLabel(format_row, text="压缩:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="right", padx=8)
+        self.output_format.trace_add("write", self._update_compression_choices)
+        self._update_compression_choices()
+
+        engine_row = ctk.CTkFrame(inner_opt, fg_color="transparent")
+        engine_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(engine_row, text="解析引擎:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        ctk.CTkRadioButton(engine_row, text="完整加载 (ifcopenshell)", variable=self.engine, value="ifcopenshell",
+                           fg_color=self.colors["primary"], font=self.font_main).pack(side="left", padx=10)
+        ctk.CTkRadioButton(engine_row, text="流式扫描 (低内存)", variable=self.engine, value="stream",
+                           fg_color=self.colors["primary"], font=self.font_main).pack(side="left")
+        ctk.CTkOptionMenu(engine_row, variable=self.workers, width=70, height=28,
+                          values=[str(i) for i in range(1, utils.default_workers() + 1)],
+                          fg_color=self.colors["primary"], font=self.font_main).pack(side="right")
+        ctk.CTkLabel(engine_row, text="并行进程:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="right", padx=8)
+        ctk.CTkOptionMenu(engine_row, variable=self.profile_mode, width=110, height=28, values=list(PROFILE_MODES),
+                          fg_color=self.colors["primary"], font=self.font_main).pack(side="right")
+        ctk.CTkLabel(engine_row, text="性能报告:", text_color=self.colors["fg"], font=self.font_main).pack(
+            side="right", padx=8)
+
+        service_row = ctk.CTkFrame(inner_opt, fg_color="transparent")
+        service_row.pack(fill="x", pady=3)
+        ctk.CTkLabel(service_row, text="提取服务:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        ctk.CTkLabel(service_row, text="留空则在本程序中提取", text_color=self.colors["fg"],
+                     font=self.font_main).pack(side="right")
+        ctk.CTkEntry(service_row, textvariable=self.service_url, height=30, font=self.font_main,
+                     placeholder_text="可选：如 http://127.0.0.1:8765，模型常驻服务内存，重复提取无需重新解析").pack(
+            side="left", fill="x", expand=True, padx=8)
 
         # --- 日志区 ---
         log_frame = ctk.CTkFrame(main_frame, fg_color=self.colors["frame_bg"], corner_radius=12)
@@ -252,6 +412,15 @@ class IFCPropertyExtractorApp:
                 messagebox.showwarning("提示", "属性已存在")
             self.prop_entry.delete(0, 'end')
 
+    def _add_properties(self, props):
+        """批量添加属性，跳过已存在的属性"""
+        added = [prop for prop in dict.fromkeys(props) if prop not in self.properties]
+        if added:
+            self.properties.extend(added)
+            self._refresh_tree()
+            self._log(f"添加属性: {', '.join(added)}")
+        return added
+
     def _move_up(self):
         """上移选中的属性"""
         sel = self.tree.selection()
@@ -287,28 +456,61 @@ class IFCPropertyExtractorApp:
             self._refresh_tree()
 
     def _browse_ifc(self):
-        """浏览并选择 IFC 文件"""
-        path = filedialog.askopenfilename(filetypes=[("IFC files", "*.ifc"), ("All", "*.*")])
-        if path:
-            self.ifc_path.set(path)
-            stem = Path(path).stem
-            if len(stem) > 8:
-                short_stem = stem[-8:]
-            else:
-                short_stem = stem
-            self.output_filename.set(f"{short_stem}_data")
-            size = Path(path).stat().st_size
-            self.file_size.set(f"文件大小: {size / 1024 / 1024:.2f} MB")
+        """浏览并选择 IFC 文件；可多选，多个文件时联合提取"""
+        paths = list(filedialog.askopenfilenames(filetypes=[("IFC files", "*.ifc"), ("All", "*.*")]))
+        if not paths:
+            return
+        self.ifc_paths = paths
+        if len(paths) > 1:
+            self.ifc_path.set("; ".join(paths))
+            self.output_filename.set("merged_data")
+            size = sum(Path(path).stat().st_size for path in paths)
+            self.file_size.set(f"{len(paths)} 个文件, 合计 {size / 1024 / 1024:.2f} MB（联合提取，合并输出）")
+            return
+        path = paths[0]
+        self.ifc_path.set(path)
+        stem = Path(path).stem
+        if len(stem) > 8:
+            short_stem = stem[-8:]
+        else:
+            short_stem = stem
+        self.output_filename.set(f"{short_stem}_data")
+        size = Path(path).stat().st_size
+        self.file_size.set(f"文件大小: {size / 1024 / 1024:.2f} MB")
 
     def _browse_output_dir(self):
         """浏览并选择输出目录"""
         path = filedialog.askdirectory()
         if path: self.output_dir.set(path)
 
+    def _browse_previous(self):
+        """浏览并选择上一版导出文件或 IFC 文件"""
+        path = filedialog.askopenfilename(filetypes=[("导出文件", "*.csv *.xlsx *.parquet *.feather *.sqlite"), ("IFC files", "*.ifc"),
+                                                     ("All", "*.*")])
+        if path: self.previous_export.set(path)
+
+    def _update_compression_choices(self, *_):
+        """按输出格式刷新可选的压缩算法：Feather 不提供 snappy/gzip，非列式格式禁用压缩选项"""
+        choices = FORMAT_COMPRESSION_CHOICES.get(self.output_format.get())
+        self.compression_menu.configure(values=choices or COMPRESSION_CHOICES,
+                                        state="normal" if choices else "disabled")
+        if choices and self.compression.get() not in choices:
+            self.compression.set(DEFAULT_COMPRESSION)
+
     def _log(self, msg):
         """在日志区追加信息"""
+        self._log_lines([msg])
+
+    def _log_lines(self, messages):
+        """一次性追加多行日志；日志区只保留最近 LOG_VIEW_MAX_LINES 行"""
+        if not messages:
+            return
+        stamp = utils.format_timestamp()
         self.log_text.configure(state="normal")
-        self.log_text.insert("end", f"[{utils.format_timestamp()}] {msg}\n")
+        self.log_text.insert("end", "".join(f"[{stamp}] {msg}\n" for msg in messages))
+        excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - LOG_VIEW_MAX_LINES
+        if excess > 0:
+            self.log_text.delete("1.0", f"{excess + 1}.0")
         self.log_text.see("end")
         self.log_text.configure(state="disabled")
 
@@ -322,21 +524,60 @@ class IFCPropertyExtractorApp:
 
     def _start_extraction(self):
         """启动属性提取后台任务"""
-        if not self.ifc_path.get() or not self.properties:
+        if not self.ifc_paths or not self.properties:
             messagebox.showerror("错误", "请检查文件路径和属性列表")
             return
+        federated = len(self.ifc_paths) > 1
+        if federated and (self.previous_export.get() or self.service_url.get().strip()
+                          or self.group_by.get().strip() or self.measures.get().strip()):
+            messagebox.showerror("错误", "联合提取多个文件时不支持上一版对比、汇总与提取服务")
+            return
+        try:
+            compile_filter(self.row_filter.get(), self.properties)
+        except ValueError as e:
+            messagebox.showerror("错误", f"过滤条件无效: {e}")
+            return
+        from ifc_prop_getter.aggregate import compile_aggregation
+        try:
+            compile_aggregation(self.group_by.get(), self.measures.get(), self.properties)
+        except ValueError as e:
+            messagebox.showerror("错误", f"汇总设置无效: {e}")
+            return
 
         self.running = True
         self.stop_event.clear()
         self.start_btn.configure(state="disabled")
 
+        cache = self._cache_or_none()
+
+        spill_path = None
+        if self.save_log.get():
+            spill_path = os.path.join(self.output_dir.get(), utils.make_output_filename(
+                f"{self.output_filename.get()}_log", "txt"))
+        try:
+            self.queue.reset(spill_path)
+        except OSError as e:
+            self.queue.reset()
+            self._log(f"无法创建日志文件，已禁用: {e}")
+        else:
+            if spill_path:
+                self._log(f"完整日志: {spill_path}")
+
         self._show_progress_window()
         self._log("开始后台提取任务...")
 
+        if federated:
+            self._start_federated_extraction(cache)
+            return
+        if self.service_url.get().strip():
+            self._start_remote_extraction()
+            return
+
+        from ifc_prop_getter import extractor
         self.worker_thread = threading.Thread(
             target=extractor.extract_properties,
             args=(
-                self.ifc_path.get(),
+                self.ifc_paths[0],
                 self.properties.copy(),
                 self.include_globalid.get(),
                 self.include_name.get(),
@@ -344,24 +585,294 @@ class IFCPropertyExtractorApp:
                 self.output_filename.get(),
                 self.output_format.get(),
                 self.queue,
-                self.stop_event
+                self.stop_event,
+                self.engine.get(),
+                int(self.workers.get()),
+                cache,
+                self.previous_export.get() or None,
+                self.change_report.get(),
+                self.compression.get()
             ),
+            kwargs={
+                'include_types': parse_class_list(self.include_types.get()),
+                'exclude_types': parse_class_list(self.exclude_types.get()),
+                'type_properties': self.type_properties.get(),
+                'typed_values': self.typed_values.get(),
+                'row_filter': self.row_filter.get().strip() or None,
+                'group_by': self.group_by.get().strip() or None,
+                'measures': self.measures.get().strip() or None,
+                'locations': self._selected_locations(),
+                'profile': PROFILE_MODES[self.profile_mode.get()],
+            },
             daemon=True
         )
         self.worker_thread.start()
 
+    def _start_remote_extraction(self):
+        """通过提取服务执行任务；服务端直接写出到输出文件夹"""
+        request = {
+            'ifc_path': os.path.abspath(self.ifc_paths[0]),
+            'properties': self.properties.copy(),
+            'include_globalid': self.include_globalid.get(),
+            'include_name': self.include_name.get(),
+            'output_dir': os.path.abspath(self.output_dir.get()),
+            'base_filename': self.output_filename.get(),
+            'file_format': self.output_format.get(),
+            'engine': self.engine.get(),
+            'workers': int(self.workers.get()),
+            'previous_export': os.path.abspath(self.previous_export.get()) if self.previous_export.get() else None,
+            'change_report': self.change_report.get(),
+            'compression': self.compression.get(),
+            'include_types': parse_class_list(self.include_types.get()),
+            'exclude_types': parse_class_list(self.exclude_types.get()),
+            'type_properties': self.type_properties.get(),
+            'typed_values': self.typed_values.get(),
+            'row_filter': self.row_filter.get().strip() or None,
+            'group_by': self.group_by.get().strip() or None,
+            'measures': self.measures.get().strip() or None,
+            'locations': self._selected_locations(),
+            'profile': PROFILE_MODES[self.profile_mode.get()],
+        }
+        from ifc_prop_getter import service
+        self.worker_thread = threading.Thread(
+            target=service.extract_remote,
+            args=(self.service_url.get().strip(), request, self.queue, self.stop_event),
+            daemon=True
+        )
+        self.worker_thread.start()
+
+    def _start_federated_extraction(self, cache):
+        """联合提取所选的多个 IFC 文件，合并写出一个文件"""
+        from ifc_prop_getter import federation
+        self.worker_thread = threading.Thread(
+            target=federation.extract_federated,
+            args=(self.ifc_paths.copy(), self.properties.copy(), self.include_globalid.get(), self.include_name.get(),
+                  self.output_dir.get(), self.output_filename.get(), self.output_format.get(), self.queue,
+                  self.stop_event),
+            kwargs={
+                'engine': self.engine.get(),
+                'workers': int(self.workers.get()),
+                'cache': cache,
+                'compression': self.compression.get(),
+                'include_types': parse_class_list(self.include_types.get()),
+                'exclude_types': parse_class_list(self.exclude_types.get()),
+                'type_properties': self.type_properties.get(),
+                'typed_values': self.typed_values.get(),
+                'row_filter': self.row_filter.get().strip() or None,
+                'locations': self._selected_locations(),
+                'duplicates': DUPLICATE_MODES[self.duplicate_mode.get()],
+            },
+            daemon=True
+        )
+        self.worker_thread.start()
+
+    def _selected_locations(self):
+        """勾选的位置列，按 LOCATION_FIELDS 顺序"""
+        return [field for field in LOCATION_FIELDS if self.locations[field].get()]
+
+    def _cache_or_none(self):
+        """勾选使用缓存时返回缓存实例；缓存目录不可用时记录日志并返回 None"""
+        if not self.use_cache.get():
+            return None
+        from ifc_prop_getter.cache import ExtractionCache
+        try:
+            return ExtractionCache(utils.get_default_cache_dir())
+        except OSError as e:
+            self._log(f"缓存目录不可用，已禁用缓存: {e}")
+            return None
+
+    def _scan_catalog(self):
+        """后台扫描所选 IFC 文件的属性目录，完成后打开属性选择窗口"""
+        if self.running:
+            return
+        if not self.ifc_paths:
+            messagebox.showerror("错误", "请先选择 IFC 文件")
+            return
+
+        self.running = True
+        self.stop_event.clear()
+        self.start_btn.configure(state="disabled")
+        self.queue.reset()
+        self._show_progress_window()
+        self._log("开始扫描属性目录...")
+
+        from ifc_prop_getter import catalog
+        self.worker_thread = threading.Thread(
+            target=catalog.discover,
+            args=(self.ifc_paths[0], self.queue, self.stop_event, int(self.workers.get()), self._cache_or_none()),
+            daemon=True
+        )
+        self.worker_thread.start()
+
+    def _show_catalog_picker(self, entries):
+        """属性选择窗口：按关键字筛选属性目录，选中的属性加入提取列表"""
+        from ifc_prop_getter import catalog
+        window = ctk.CTkToplevel(self.root)
+        window.title("从模型选择属性")
+        window.geometry("760x520")
+        window.transient(self.root)
+
+        search = StringVar()
+        bare_names = BooleanVar(value=False)
+        count_text = StringVar()
+
+        search_row = ctk.CTkFrame(window, fg_color="transparent")
+        search_row.pack(fill="x", padx=12, pady=(12, 6))
+        ctk.CTkLabel(search_row, text="搜索:", text_color=self.colors["fg"], font=self.font_main).pack(side="left")
+        search_entry = ctk.CTkEntry(search_row, textvariable=search, height=30, font=self.font_main)
+        search_entry.pack(side="left", fill="x", expand=True, padx=8)
+        ctk.CTkLabel(search_row, textvariable=count_text, text_color="#666666", font=("微软雅黑", 11)).pack(side="left")
+
+        tree_container = ctk.CTkFrame(window, fg_color="transparent", border_width=1, border_color="#ccc")
+        tree_container.pack(fill="both", expand=True, padx=12, pady=6)
+        tree = ttk.Treeview(tree_container, columns=('name', 'count', 'samples'), show='headings',
+                            selectmode='extended')
+        tree.heading('name', text='属性集.属性')
+        tree.column('name', width=300, anchor='w')
+        tree.heading('count', text='构件数')
+        tree.column('count', width=70, anchor='center')
+        tree.heading('samples', text='示例值')
+        tree.column('samples', width=300, anchor='w')
+        vsb = ttk.Scrollbar(tree_container, orient='vertical', command=tree.yview)
+        tree.configure(yscrollcommand=vsb.set)
+        tree.pack(side="left", fill="both", expand=True)
+        vsb.pack(side="right", fill="y")
+
+        shown = {}
+
+        def refresh(*_):
+            tree.delete(*tree.get_children())
+            shown.clear()
+            matches = catalog.filter_catalog(entries, search.get())
+            for row in matches.itertuples(index=False):
+                item = tree.insert('', 'end', values=(row.完整名称, row.出现次数, row.示例值))
+                shown[item] = row
+            count_text.set(f"{len(matches)} / {len(entries)}")
+
+        def add_selected():
+            rows = [shown[item] for item in tree.selection()]
+            if not rows:
+                messagebox.showwarning("提示", "请先选择属性", parent=window)
+                return
+            added = self._add_properties(row.属性 if bare_names.get() else row.完整名称 for row in rows)
+            count_text.set(f"已添加 {len(added)} 个属性")
+
+        btn_row = ctk.CTkFrame(window, fg_color="transparent")
+        btn_row.pack(fill="x", padx=12, pady=(6, 12))
+        ctk.CTkCheckBox(btn_row, text="只添加属性名（不限定属性集）", variable=bare_names,
+                        fg_color=self.colors["primary"], font=self.font_main).pack(side="left")
+        ctk.CTkButton(btn_row, text="关闭", command=window.destroy, width=80, height=30,
+                      fg_color=self.colors["secondary"], text_color=self.colors["fg"],
+                      font=self.font_main).pack(side="right", padx=4)
+        ctk.CTkButton(btn_row, text="添加选中", command=add_selected, width=100, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="right", padx=4)
+
+        search.trace_add("write", refresh)
+        tree.bind("<Double-1>", lambda _: add_selected())
+        refresh()
+        search_entry.focus_set()
+
+    def _show_filter_editor(self):
+        """行过滤编辑窗口：点击字段与运算符插入表达式，检查语法后应用"""
+        window = ctk.CTkToplevel(self.root)
+        window.title("编辑行过滤条件")
+        window.geometry("720x460")
+        window.transient(self.root)
+
+        check_text = StringVar()
+
+        body = ctk.CTkFrame(window, fg_color="transparent")
+        body.pack(fill="both", expand=True, padx=12, pady=(12, 6))
+
+        field_container = ctk.CTkFrame(body, fg_color="transparent", border_width=1, border_color="#ccc")
+        field_container.pack(side="left", fill="y")
+        fields = ttk.Treeview(field_container, columns=('field',), show='headings', selectmode='browse')
+        fields.heading('field', text='字段（双击插入）')
+        fields.column('field', width=240, anchor='w')
+        for name in list(SPECIAL_FIELDS) + self.properties:
+            fields.insert('', 'end', values=(name,))
+        vsb = ttk.Scrollbar(field_container, orient='vertical', command=fields.yview)
+        fields.configure(yscrollcommand=vsb.set)
+        fields.pack(side="left", fill="y")
+        vsb.pack(side="right", fill="y")
+
+        editor_frame = ctk.CTkFrame(body, fg_color="transparent")
+        editor_frame.pack(side="left", fill="both", expand=True, padx=(8, 0))
+        editor = ctk.CTkTextbox(editor_frame, height=120, font=self.font_log, border_color="#D0D0D0", border_width=1)
+        editor.pack(fill="both", expand=True)
+        editor.insert("1.0", self.row_filter.get())
+
+        def insert(text):
+            editor.insert("insert", text)
+            editor.focus_set()
+
+        def insert_field(_=None):
+            sel = fields.selection()
+            if sel:
+                name = fields.item(sel[0], 'values')[0]
+                insert(f" {name} " if name in SPECIAL_FIELDS else f" [{name}] ")
+
+        operators = ["=", "!=", ">", ">=", "<", "<=", "contains", "startswith", "endswith", "matches", "in ( )",
+                     "is missing", "is not missing", "and", "or", "not", "(", ")"]
+        for start in range(0, len(operators), 6):
+            op_row = ctk.CTkFrame(editor_frame, fg_color="transparent")
+            op_row.pack(fill="x", pady=(4, 0))
+            for op in operators[start:start + 6]:
+                ctk.CTkButton(op_row, text=op, command=lambda op=op: insert(f" {op} "), width=60, height=26,
+                              fg_color=self.colors["secondary"], text_color=self.colors["fg"],
+                              font=self.font_main).pack(side="left", padx=2)
+
+        ctk.CTkLabel(editor_frame, text="文本常量加引号，例如 'PC-'；缺失值不满足任何比较，可用 is missing 判断",
+                     text_color="#666666", font=("微软雅黑", 11), wraplength=420, justify="left").pack(
+            anchor="w", pady=(6, 0))
+        ctk.CTkLabel(editor_frame, textvariable=check_text, text_color=self.colors["fg"], font=self.font_main,
+                     wraplength=420, justify="left").pack(anchor="w", pady=(4, 0))
+
+        def expression():
+            return " ".join(editor.get("1.0", "end").splitlines()).strip()
+
+        def check():
+            try:
+                compile_filter(expression(), self.properties)
+            except ValueError as e:
+                check_text.set(f"语法错误: {e}")
+                return False
+            check_text.set("语法正确" if expression() else "未设置过滤条件")
+            return True
+
+        def apply():
+            if check():
+                self.row_filter.set(expression())
+                window.destroy()
+
+        btn_row = ctk.CTkFrame(window, fg_color="transparent")
+        btn_row.pack(fill="x", padx=12, pady=(6, 12))
+        ctk.CTkButton(btn_row, text="清除", command=lambda: editor.delete("1.0", "end"), width=80, height=30,
+                      fg_color=self.colors["secondary"], text_color=self.colors["fg"],
+                      font=self.font_main).pack(side="left")
+        ctk.CTkButton(btn_row, text="取消", command=window.destroy, width=80, height=30,
+                      fg_color=self.colors["secondary"], text_color=self.colors["fg"],
+                      font=self.font_main).pack(side="right", padx=4)
+        ctk.CTkButton(btn_row, text="确定", command=apply, width=80, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="right", padx=4)
+        ctk.CTkButton(btn_row, text="检查", command=check, width=80, height=30,
+                      fg_color=self.colors["primary"], font=self.font_main).pack(side="right", padx=4)
+
+        fields.bind("<Double-1>", insert_field)
+        editor.focus_set()
+
     def _show_progress_window(self):
         """显示提取进度弹窗"""
         self.progress_window = ctk.CTkToplevel(self.root)
         self.progress_window.title("处理中")
-        self.progress_window.geometry("400x120")
+        self.progress_window.geometry("400x150")
         self.progress_window.transient(self.root)
         self.progress_window.grab_set()
 
         self.progress_window.protocol("WM_DELETE_WINDOW", self._cancel_task)
 
         x = self.root.winfo_x() + (self.root.winfo_width() - 400) // 2
-        y = self.root.winfo_y() + (self.root.winfo_height() - 120) // 2
+        y = self.root.winfo_y() + (self.root.winfo_height() - 150) // 2
         self.progress_window.geometry(f"+{x}+{y}")
 
         self.status_label = ctk.CTkLabel(self.progress_window, textvariable=self.status_text, font=("微软雅黑", 12))
@@ -371,21 +882,26 @@ class IFCPropertyExtractorApp:
         self.progress_bar.pack(pady=5)
         self.progress_bar.set(0)
 
-        self.marquee_val = 0.0
-        self._animate_marquee()
+        self.progress_text.set("")
+        ctk.CTkLabel(self.progress_window, textvariable=self.progress_text, font=("微软雅黑", 11),
+                     text_color="#666666").pack()
 
         ctk.CTkButton(self.progress_window, text="取消", command=self._cancel_task,
                       fg_color="#d9534f", hover_color="#c9302c", height=28, width=80).pack(pady=10)
 
-    def _animate_marquee(self):
-        """进度条单向循环滚动动画"""
-        if self.progress_window and self.progress_window.winfo_exists():
-            self.marquee_val += 0.015
-            if self.marquee_val > 1.0:
-                self.marquee_val = 0.0
-
-            self.progress_bar.set(self.marquee_val)
-            self.marquee_after_id = self.root.after(30, self._animate_marquee)
+    def _update_progress(self, msg):
+        """按 'progress' 消息更新进度条与进度文字；总量未知时显示不确定进度"""
+        if not (self.progress_window and self.progress_window.winfo_exists()):
+            return
+        if msg['total']:
+            if self.progress_bar.cget("mode") != "determinate":
+                self.progress_bar.stop()
+                self.progress_bar.configure(mode="determinate")
+            self.progress_bar.set(min(msg['done'] / msg['total'], 1.0))
+        elif self.progress_bar.cget("mode") != "indeterminate":
+            self.progress_bar.configure(mode="indeterminate")
+            self.progress_bar.start()
+        self.progress_text.set(progress.format_progress(msg))
 
     def _cancel_task(self):
         """取消当前后台任务"""
@@ -393,36 +909,46 @@ class IFCPropertyExtractorApp:
         self.status_text.set("正在停止...")
 
     def _check_queue(self):
-        """检查线程通信队列并更新 UI"""
+        """批量取出通信通道中的消息并更新 UI，日志每次刷新只插入一次"""
         try:
             if not self.root.winfo_exists():
                 return
 
-            while True:
-                msg = self.queue.get_nowait()
+            lines = []
+            for msg in self.queue.drain():
                 mtype = msg.get('type')
 
                 if mtype == 'log':
-                    self._log(msg['message'])
+                    lines.append(msg['message'])
 
                 elif mtype == 'status':
                     self.status_text.set(msg['message'])
 
+                elif mtype == 'progress':
+                    self._update_progress(msg)
+
                 elif mtype == 'complete':
-                    self._log(f"任务完成: {msg['filepath']}")
+                    self._log_lines(lines + [f"任务完成: {msg['filepath']}"])
+                    lines = []
                     self._cleanup_task()
                     messagebox.showinfo("成功", f"导出完成！\n路径: {msg['filepath']}")
 
+                elif mtype == 'catalog':
+                    self._log_lines(lines)
+                    lines = []
+                    self._cleanup_task()
+                    self._show_catalog_picker(msg['catalog'])
+
                 elif mtype == 'error':
-                    self._log(f"错误: {msg['message']}")
+                    self._log_lines(lines + [f"错误: {msg['message']}"])
+                    lines = []
                     self._cleanup_task()
                     messagebox.showerror("错误", msg['message'])
 
                 elif mtype == 'finished':
                     self._cleanup_task()
 
-        except queue.Empty:
-            pass
+            self._log_lines(lines)
         finally:
             if self.root.winfo_exists():
                 self.root.after(50, self._check_queue)
@@ -432,15 +958,9 @@ class IFCPropertyExtractorApp:
         self.running = False
         self.start_btn.configure(state="normal")
 
-        if self.marquee_after_id:
-            try:
-                self.root.after_cancel(self.marquee_after_id)
-            except Exception:
-                pass
-            self.marquee_after_id = None
-
         if self.progress_window:
             try:
+                self.progress_bar.stop()
                 self.progress_window.destroy()
             except Exception:
                 pass
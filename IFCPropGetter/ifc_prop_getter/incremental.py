@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+"""
+增量对比模块：按 GlobalId 对比新旧两版提取结果，合并表格并生成变更报告；
+记录各构件的内容指纹，供下一版只重新提取内容有变化的构件
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from ifc_prop_getter import rowstore
+from ifc_prop_getter.constants import SQLITE_TABLE
+
+CHANGE_ADDED = "新增"
+CHANGE_REMOVED = "删除"
+CHANGE_MODIFIED = "修改"
+
+
+def _as_text(df):
+    """转为输出字符串：缺失值（含类型化列中的空值）与空字符串均为 N/A"""
+    return df.astype(object).where(df.notna(), "N/A").astype(str).replace("", "N/A")
+
+
+def load_previous_export(path):
+    """
+    读取上一版导出文件（CSV、Excel、Parquet、Feather 或 SQLite），所有值按字符串读取。
+    类型化导出中的空值读取为 N/A；Parquet/Feather 的整数列保持整数，不因含空值变为浮点数。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xlsm", ".xls"):
+        df = pd.read_excel(path, dtype=str, keep_default_na=False)
+    elif ext == ".parquet":
+        df = _as_text(pd.read_parquet(path, dtype_backend="numpy_nullable"))
+    elif ext == ".feather":
+        df = _as_text(pd.read_feather(path, dtype_backend="numpy_nullable"))
+    elif ext in (".sqlite", ".db"):
+        with closing(sqlite3.connect(path)) as conn:
+            df = pd.read_sql_query(f'SELECT * FROM "{SQLITE_TABLE}"', conn, dtype_backend="numpy_nullable")
+            # 布尔列以 0/1 存储，按声明类型还原
+            for _, name, decl_type, *_ in conn.execute(f'PRAGMA table_info("{SQLITE_TABLE}")'):
+                if decl_type.upper() == "BOOLEAN":
+                    df[name] = df[name].astype("boolean")
+        df = _as_text(df)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    if "GlobalId" not in df.columns:
+        raise ValueError("上一版导出文件中没有 GlobalId 列")
+    return df
+
+
+def _by_globalid(df):
+    """以 GlobalId 为索引；重复的 GlobalId 只保留第一行"""
+    df = df.drop_duplicates(subset="GlobalId", keep="first")
+    return df.set_index("GlobalId", drop=False)
+
+
+def merge_revision(previous, current):
+    """
+    对比两版结果，返回 (merged, report)。
+    merged：以新版数值为准，沿用旧版的行顺序，新增构件追加在末尾，删除的构件移除；
+    report：参见 change_report。
+    """
+    report = change_report(previous, current)
+    previous = _by_globalid(previous)
+    current = _by_globalid(current)
+    columns = list(current.columns)
+
+    prev_ids = previous.index
+    common = prev_ids[prev_ids.isin(current.index)]
+    added = current.index[~current.index.isin(prev_ids)]
+    merged = pd.concat([current.loc[common], current.loc[added]])
+    return merged.reset_index(drop=True)[columns], report
+
+
+def change_report(previous, current):
+    """变更报告：每个新增、删除、修改的构件一行；只需传入可能变化的构件的行"""
+    previous = _by_globalid(previous)
+    current = _by_globalid(current)
+    columns = list(current.columns)
+
+    prev_ids = previous.index
+    curr_ids = current.index
+    common = prev_ids[prev_ids.isin(curr_ids)]
+    removed = prev_ids[~prev_ids.isin(curr_ids)]
+    added = curr_ids[~curr_ids.isin(prev_ids)]
+
+    # 统一按输出字符串比较；旧版缺少的列视为 N/A
+    value_cols = [c for c in columns if c != "GlobalId"]
+    old_values = _as_text(previous.reindex(index=common, columns=value_cols))
+    new_values = _as_text(current.loc[common, value_cols])
+    # 数值按数值比较：Excel 中的 2.0 读回为 "2"，与新版的 "2.0" 视为相同
+    numeric_equal = (old_values.apply(pd.to_numeric, errors="coerce")
+                     .eq(new_values.apply(pd.to_numeric, errors="coerce")))
+    diff_mask = old_values.ne(new_values) & ~numeric_equal
+    modified = common[diff_mask.any(axis=1).to_numpy()]
+
+    records = [{"GlobalId": gid, "变更类型": CHANGE_ADDED, "变更内容": ""} for gid in added]
+    records += [{"GlobalId": gid, "变更类型": CHANGE_REMOVED, "变更内容": ""} for gid in removed]
+    for gid in modified:
+        row_mask = diff_mask.loc[gid]
+        changes = [f"{col}: {old_values.at[gid, col]} → {new_values.at[gid, col]}"
+                   for col in value_cols if row_mask[col]]
+        records.append({"GlobalId": gid, "变更类型": CHANGE_MODIFIED, "变更内容": "; ".join(changes)})
+    return pd.DataFrame(records, columns=["GlobalId", "变更类型", "变更内容"])
+
+
+def revision_state(products, fingerprints, value_types=None):
+    """随提取结果缓存的指纹记录 {"fingerprints": {GlobalId: 指纹}, "value_types": ...}；GlobalId 重复或为空时指纹为 None"""
+    by_globalid = {}
+    for entity_id, global_id in products:
+        if global_id is None or global_id in by_globalid:
+            by_globalid[global_id] = None
+        else:
+            by_globalid[global_id] = fingerprints.get(entity_id)
+    return {"fingerprints": by_globalid, "value_types": value_types}
+
+
+_KIND_TYPES = {rowstore.KIND_STRING: str, rowstore.KIND_INT: int, rowstore.KIND_FLOAT: float,
+               rowstore.KIND_BOOL: bool}
+
+
+def merge_value_types(previous_types, previous_kinds, current_types):
+    """合并上一版（没有记录时由列类型代替）与重新提取的构件的各列值类型集合"""
+    if previous_types is None:
+        if previous_kinds is None:
+            previous_types = [()] * len(current_types)
+        else:
+            previous_types = [{_KIND_TYPES[kind]} for kind in previous_kinds]
+    return [set(old) | set(new) for old, new in zip(previous_types, current_types)]
\ No newline at end of file
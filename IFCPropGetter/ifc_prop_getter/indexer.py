@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+"""属性索引模块：一次遍历关系实体，建立构件到所需属性的索引"""
+
+import ifcopenshell.util.element
+
+from ifc_prop_getter import rowstore
+from ifc_prop_getter.constants import CHUNK_SIZE
+
+
+def _unpack_definitions(definition):
+    """展开 IfcPropertySetDefinitionSet 包装的属性集列表"""
+    if definition is None:
+        return ()
+    if definition.is_a("IfcPropertySetDefinitionSet"):
+        return definition.wrappedValue
+    return (definition,)
+
+
+def _decode_definition(definition, plan):
+    """仅解码查找计划需要的属性"""
+    ifc_class = definition.is_a()
+    pset_name = definition.Name
+    if ifc_class == "IfcPropertySet":
+        props = [p for p in definition.HasProperties or () if plan.wants(pset_name, p.Name)]
+        return ifcopenshell.util.element.get_properties(props)
+    if ifc_class == "IfcElementQuantity":
+        quantities = [q for q in definition.Quantities or () if plan.wants(pset_name, q.Name)]
+        return ifcopenshell.util.element.get_quantities(quantities)
+    props = ifcopenshell.util.element.get_property_definition(definition) or {}
+    return {k: v for k, v in props.items() if plan.wants(pset_name, k)}
+
+
+class PropertyIndex:
+    """
+    构件属性索引，仅包含查找计划中涉及的属性。
+    类型对象的属性集按类型只保存一份，构件实例只记录所属类型；实例自身的属性集按构件保存。
+    提取时每个类型的属性只解析一次，再叠加实例属性集（同名合并并覆盖类型值）。
+    """
+
+    def __init__(self):
+        self.occurrences = {}    # {构件 id: {属性集名: {属性名: 值}}}
+        self.element_types = {}  # {构件 id: 类型 id}，只记录含相关属性集的类型
+        self.type_psets = {}     # {类型 id: {属性集名: {属性名: 值}}}
+        self.spatial = None      # spatial.SpatialIndex，仅在查找计划需要位置时建立
+        self.fingerprints = None  # {构件 id: 指纹}，仅在缓存提取结果时计算（stream_scanner.ScanTables.fingerprints）
+
+    def __len__(self):
+        """含相关属性集的构件数"""
+        return len(self.occurrences) + sum(1 for obj_id in self.element_types if obj_id not in self.occurrences)
+
+    def add_type(self, obj_id, type_id, psets):
+        """记录构件所属类型及该类型解码后的属性集；无相关属性集的类型不记录"""
+        if psets:
+            self.type_psets[type_id] = psets
+            self.element_types[obj_id] = type_id
+
+    def psets(self, obj_id):
+        """返回构件合并后的属性集字典，结构与 ifcopenshell.util.element.get_psets 一致"""
+        type_id = self.element_types.get(obj_id)
+        merged = {k: dict(v) for k, v in self.type_psets[type_id].items()} if type_id is not None else {}
+        for pset_name, props in self.occurrences.get(obj_id, {}).items():
+            merged.setdefault(pset_name, {}).update(props)
+        return merged
+
+    def resolver(self, plan):
+        """返回 resolve(构件 id) -> 与 plan.columns 对齐的值列表；同一类型的属性在本次提取中只解析一次"""
+        occurrences = self.occurrences
+        if not plan.type_properties:
+            return lambda obj_id: plan.resolve(occurrences.get(obj_id, {}))
+
+        element_types = self.element_types
+        type_psets = self.type_psets
+        bases = {}
+
+        def resolve(obj_id):
+            overlay = occurrences.get(obj_id)
+            type_id = element_types.get(obj_id)
+            if type_id is None:
+                return plan.resolve(overlay or {})
+            base = bases.get(type_id)
+            if base is None:
+                base = bases[type_id] = plan.resolve_base(type_psets[type_id])
+            if not overlay:
+                return list(base[0])
+            return plan.resolve_overlay(base, overlay)
+
+        return resolve
+
+    def value_kinds(self, plan):
+        """
+        由索引中出现的值类型推断每个属性列的类型（rowstore.KIND_*），与 plan.columns 对齐。
+        纯属性名按所有同名属性的值类型推断，结果可能比实际取到的值略宽（例如整数列推断为浮点）。
+        """
+        return [rowstore.infer_kind(column_types) for column_types in self.value_types(plan)]
+
+    def value_types(self, plan):
+        """索引中每个属性列出现的非空值的 Python 类型集合，与 plan.columns 对齐"""
+        seen = set()
+        sources = list(self.occurrences.values())
+        if plan.type_properties:
+            sources.extend(self.type_psets.values())
+        for psets in sources:
+            for pset_name, props in psets.items():
+                seen.update((pset_name, p_name, type(value)) for p_name, value in props.items()
+                            if value is not None)
+
+        types = [set() for _ in plan.columns]
+        for pset_name, p_name, value_type in seen:
+            for idx in plan.qualified.get(pset_name, {}).get(p_name, ()):
+                types[idx].add(value_type)
+            for idx in plan.bare.get(p_name, ()):
+                types[idx].add(value_type)
+        return types
+
+
+def _decode_type_psets(element_type, plan, cache):
+    """解码类型对象的属性集，按类型 id 缓存"""
+    type_id = element_type.id()
+    psets = cache.get(type_id)
+    if psets is None:
+        psets = {}
+        for definition in element_type.HasPropertySets or ():
+            psets.setdefault(definition.Name, {}).update(_decode_definition(definition, plan))
+        cache[type_id] = psets
+    return psets
+
+
+def index_type_relations(ifc_file, plan, stop_event=None, wanted=None):
+    """
+    遍历 IfcRelDefinesByType，返回只含类型继承属性集的 PropertyIndex；用户取消时返回 None。
+    wanted 为需要提取的构件 id 集合，其他构件不解析属性集；为 None 时不限制。
+    plan.type_properties 为假时不解析类型属性集，直接返回空索引。
+    """
+    index = PropertyIndex()
+    if not plan.type_properties:
+        return index
+    type_cache = {}
+    typed = set()
+    for rel in ifc_file.by_type("IfcRelDefinesByType"):
+        element_type = rel.RelatingType
+        for obj in rel.RelatedObjects or ():
+            obj_id = obj.id()
+            if obj_id in typed or (wanted is not None and obj_id not in wanted):
+                continue
+            typed.add(obj_id)
+            index.add_type(obj_id, element_type.id(), _decode_type_psets(element_type, plan, type_cache))
+        if stop_event is not None and stop_event.is_set():
+            return None
+    return index
+
+
+def decode_property_relations(rels, plan, wanted=None):
+    """
+    解码一组 IfcRelDefinesByProperties，返回 [(构件 id 元组, [(属性集名, 属性字典)])]。
+    给定 wanted 时只保留其中的构件，不涉及任何所需构件的关系不解码。
+    """
+    decoded_rels = []
+    for rel in rels:
+        related = tuple(obj.id() for obj in rel.RelatedObjects or ())
+        if wanted is not None:
+            related = tuple(obj_id for obj_id in related if obj_id in wanted)
+            if not related:
+                continue
+        decoded = [(d.Name, _decode_definition(d, plan))
+                   for d in _unpack_definitions(rel.RelatingPropertyDefinition)]
+        decoded_rels.append((related, decoded))
+    return decoded_rels
+
+
+def merge_property_relations(index, decoded_rels):
+    """按关系顺序将解码结果合并进索引的实例属性集，同名属性集合并"""
+    occurrences = index.occurrences
+    for related, decoded in decoded_rels:
+        for obj_id in related:
+            entry = occurrences.setdefault(obj_id, {})
+            for pset_name, props in decoded:
+                entry.setdefault(pset_name, {}).update(props)
+
+
+def build_property_index(ifc_file, plan, stop_event=None, progress=None, wanted=None):
+    """
+    一次遍历 IfcRelDefinesByType 与 IfcRelDefinesByProperties，返回 PropertyIndex。
+    属性集顺序与覆盖规则与 ifcopenshell.util.element.get_psets 保持一致：
+    类型属性集在前，实例属性集同名合并并覆盖类型值。
+    progress(已处理关系数, 关系总数) 每处理 CHUNK_SIZE 个关系调用一次。
+    wanted 为需要提取的构件 id 集合，参见 index_type_relations。用户取消时返回 None。
+    """
+    index = index_type_relations(ifc_file, plan, stop_event, wanted)
+    if index is None:
+        return None
+
+    # 实例属性集：每个关系只解码一次，再分配给所有关联构件
+    rels = ifc_file.by_type("IfcRelDefinesByProperties")
+    for count, rel in enumerate(rels):
+        if not count % CHUNK_SIZE:
+            if stop_event is not None and stop_event.is_set():
+                return None
+            if progress is not None:
+                progress(count, len(rels))
+        merge_property_relations(index, decode_property_relations((rel,), plan, wanted))
+
+    return index
\ No newline at end of file
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""工作线程与界面之间的消息通道：有界、合并重复警告，可选将完整日志写入文件"""
+
+import threading
+from collections import Counter, deque
+
+from ifc_prop_getter import utils
+from ifc_prop_getter.constants import LOG_QUEUE_SIZE, WARNING_REPEAT_LIMIT
+
+# 必须送达的消息类型，不受容量限制
+_EVENT_TYPES = ("complete", "catalog", "error", "finished")
+
+
+class MessageChannel:
+    """
+    工作线程通过 put() 发送消息（与 queue.Queue.put 用法相同），界面线程定时调用 drain() 批量取出。
+    - status / progress 只保留最新一条；
+    - log 消息最多缓存 LOG_QUEUE_SIZE 条，超出部分计数后丢弃；
+    - 同一 key 的警告（未指定 key 时为相同文本的警告）只送达前 WARNING_REPEAT_LIMIT 条，其余合并计数，
+      在任务结束时汇总为一条日志；
+    - complete / catalog / error / finished 总会送达。
+    spill_path 不为空时，所有日志（包括被合并或丢弃的）按时间顺序完整写入该文件。
+    """
+
+    def __init__(self, max_logs=LOG_QUEUE_SIZE, repeat_limit=WARNING_REPEAT_LIMIT):
+        self.max_logs = max_logs
+        self.repeat_limit = repeat_limit
+        self._lock = threading.Lock()
+        self._spill = None
+        self.reset()
+
+    def reset(self, spill_path=None):
+        """开始新任务前清空状态；spill_path 为完整日志文件路径"""
+        with self._lock:
+            self._close_spill()
+            self._logs = deque()
+            self._latest = {}
+            self._events = []
+            self._repeats = Counter()
+            self._suppressed = Counter()
+            self._dropped = 0
+            if spill_path:
+                self._spill = open(spill_path, "w", encoding="utf-8")
+
+    def put(self, msg):
+        """发送一条消息；不会阻塞工作线程"""
+        mtype = msg.get('type')
+        with self._lock:
+            if mtype == 'log':
+                self._put_log(msg)
+            elif mtype in _EVENT_TYPES:
+                self._summarize()
+                self._events.append(msg)
+                if mtype == 'error' and self._spill is not None:
+                    self._write_spill(f"错误: {msg['message']}")
+                elif mtype == 'complete' and self._spill is not None:
+                    self._write_spill(f"{msg['message']}: {msg['filepath']}")
+                if mtype == 'finished':
+                    self._close_spill()
+            else:
+                self._latest[mtype] = msg
+
+    def _put_log(self, msg):
+        text = msg['message']
+        if self._spill is not None:
+            self._write_spill(text)
+        key = msg.get('key') or (text if text.startswith("警告") else None)
+        if key is not None:
+            self._repeats[key] += 1
+            if self._repeats[key] > self.repeat_limit:
+                self._suppressed[key] += 1
+                return
+            if self._repeats[key] == self.repeat_limit:
+                msg = dict(msg, message=f"{text}（后续同类警告将合并计数）")
+        if len(self._logs) >= self.max_logs:
+            self._dropped += 1
+            return
+        self._logs.append(msg)
+
+    def _summarize(self):
+        """将合并计数与丢弃计数转为汇总日志，追加在待取出的日志末尾"""
+        for key, count in self._suppressed.items():
+            label = key if key.startswith("警告") else f"警告: {key}"
+            self._logs.append({'type': 'log', 'message': f"{label} 另有 {count} 条同类警告未显示"})
+        self._suppressed.clear()
+        if self._dropped:
+            self._logs.append({'type': 'log', 'message': f"日志过多，另有 {self._dropped} 条未显示"})
+            self._dropped = 0
+
+    def _write_spill(self, text):
+        try:
+            self._spill.write(f"[{utils.format_timestamp()}] {text}\n")
+        except (OSError, ValueError):
+            self._spill = None
+
+    def _close_spill(self):
+        if self._spill is not None:
+            try:
+                self._spill.close()
+            except OSError:
+                pass
+            self._spill = None
+
+    def drain(self):
+        """取出当前全部待处理消息：最新的 status/progress 在前，其次为日志，最后为结束类消息"""
+        with self._lock:
+            messages = list(self._latest.values())
+            messages.extend(self._logs)
+            messages.extend(self._events)
+            self._latest.clear()
+            self._logs.clear()
+            self._events = []
+        return messages
\ No newline at end of file
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+"""多进程分片提取模块"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from ifc_prop_getter import indexer, stream_scanner
+from ifc_prop_getter.utils import default_workers
+from ifc_prop_getter.constants import PARALLEL_MIN_SHARD_BYTES, PARALLEL_MIN_SHARD_RELATIONS
+
+# 子进程中由 _init_rel_worker 设置的已加载模型与需要提取的构件 id（只存在于分片子进程中）
+_worker_file = None
+_worker_wanted = None
+
+
+def _portable(value):
+    """将属性值转换为可跨进程传递的形式；复杂值按最终输出的字符串形式传递"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)) and all(
+            v is None or isinstance(v, (str, int, float, bool)) for v in value):
+        return value
+    return str(value)
+
+
+def _init_rel_worker(ifc_file, wanted):
+    """子进程初始化：保存 fork 时随进程参数继承（不经过序列化）的已加载模型"""
+    global _worker_file, _worker_wanted
+    _worker_file, _worker_wanted = ifc_file, wanted
+
+
+def _decode_rel_shard(start, stop, plan):
+    """子进程：解码第 [start, stop) 个 IfcRelDefinesByProperties"""
+    rels = _worker_file.by_type("IfcRelDefinesByProperties")[start:stop]
+    decoded_rels = indexer.decode_property_relations(rels, plan, _worker_wanted)
+    return [
+        (related, [(name, {k: _portable(v) for k, v in props.items()}) for name, props in decoded])
+        for related, decoded in decoded_rels
+    ]
+
+
+def _split(start, stop, count):
+    """将区间均分为 count 段"""
+    step = (stop - start) / count
+    bounds = [start + round(step * i) for i in range(count)] + [stop]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def run_shards(func, shard_args, workers, stop_event, progress=None, mp_context=None, cancel_event=None,
+               initializer=None, initargs=()):
+    """
+    在进程池中执行分片任务，按分片顺序返回结果列表；每完成一个分片调用 progress(已完成数, 分片数)。
+    用户取消时撤销尚未开始的分片并返回 None。
+    cancel_event 为分片函数检查的跨进程取消标志（如 multiprocessing.Manager().Event()）：取消时将其置位，
+    并等待已在执行的分片提前结束，不在后台留下仍在运行的任务。initializer / initargs 参见 ProcessPoolExecutor。
+    """
+    results = [None] * len(shard_args)
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(shard_args)), mp_context=mp_context,
+                               initializer=initializer, initargs=initargs)
+    try:
+        futures = {pool.submit(func, *args): i for i, args in enumerate(shard_args)}
+        pending = set(futures)
+        finished = 0
+        while pending:
+            done, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+                finished += 1
+            if done and progress is not None:
+                progress(finished, len(shard_args))
+            if stop_event.is_set():
+                if cancel_event is not None:
+                    cancel_event.set()
+                return None
+    finally:
+        pool.shutdown(wait=cancel_event is not None, cancel_futures=True)
+    return results
+
+
+def scan_tables(ifc_path, plan, workers, queue, stop_event, progress=None, entity_filter=None, fingerprint=False):
+    """
+    将 DATA 段按字节区间切分，各进程独立扫描分片后按分片顺序合并实体表。
+    返回 (schema 标识, stream_scanner.ScanTables)；用户取消时返回 None。
+    progress(已扫描字节数, 总字节数) 报告扫描进度；并行时按已完成分片的字节数计算。
+    entity_filter 为 entity_filter.EntityFilter，只收集允许类型的构件。
+    fingerprint 为真时同时收集计算构件指纹所需的内容（ScanTables.fingerprints）。
+    """
+    schema_id, data_offset = stream_scanner.read_header(ifc_path)
+    keywords = entity_filter.keywords(schema_id) if entity_filter is not None else None
+    size = os.path.getsize(ifc_path)
+    shard_count = min(workers * 4, (size - data_offset) // PARALLEL_MIN_SHARD_BYTES)
+    if workers <= 1 or shard_count < 2:
+        tables = stream_scanner.scan_range(ifc_path, schema_id, data_offset, size, plan, stop_event, align=False,
+                                           progress=progress, product_keywords=keywords, fingerprint=fingerprint)
+        return None if tables is None else (schema_id, tables)
+
+    queue.put({'type': 'log', 'message': f"并行扫描: {workers} 个进程, {shard_count} 个分片"})
+    shard_args = [
+        (ifc_path, schema_id, start, stop, plan, None, i > 0, None, keywords, fingerprint)
+        for i, (start, stop) in enumerate(_split(data_offset, size, shard_count))
+    ]
+    shard_progress = None
+    if progress is not None:
+        total = size - data_offset
+
+        def shard_progress(finished, count):
+            progress(total * finished // count, total)
+
+    results = run_shards(stream_scanner.scan_range, shard_args, workers, stop_event, shard_progress)
+    if results is None:
+        return None
+
+    tables = results[0]
+    for shard in results[1:]:
+        tables.merge(shard)
+    return schema_id, tables
+
+
+def scan_stream(ifc_path, plan, workers, queue, stop_event, progress=None, entity_filter=None, fingerprint=False):
+    """
+    流式引擎的并行版本：按 scan_tables 扫描实体表后建立索引。
+    返回 (products, property_index)；用户取消时返回 None。参数参见 scan_tables，
+    fingerprint 为真时同时计算构件指纹，记入 property_index.fingerprints。
+    """
+    scanned = scan_tables(ifc_path, plan, workers, queue, stop_event, progress, entity_filter, fingerprint)
+    if scanned is None:
+        return None
+    schema_id, tables = scanned
+    fingerprints = tables.fingerprints(plan) if fingerprint else None
+    built = tables.build(stream_scanner.schema_info_for(schema_id), plan, stop_event)
+    if built is not None:
+        built[1].fingerprints = fingerprints
+    return built
+
+
+def build_index(ifc_file, plan, workers, queue, stop_event, progress=None, wanted=None):
+    """
+    完整加载引擎的并行版本：子进程通过 fork 继承已加载的模型，
+    分片解码 IfcRelDefinesByProperties 后按关系顺序合并。用户取消时返回 None。
+    关系数量较少、平台不支持 fork（Windows）或进程中还有其他线程（图形界面与提取服务的工作线程，
+    多线程进程中 fork 可能死锁）时使用单进程；这些情况下需要并行请使用流式引擎。
+    progress(已处理关系数, 关系总数) 报告进度；并行时按已完成分片的关系数计算。
+    wanted 为需要提取的构件 id 集合，其他构件的属性集不解析。
+    """
+    rel_count = len(ifc_file.by_type("IfcRelDefinesByProperties"))
+    shard_count = min(workers * 4, rel_count // PARALLEL_MIN_SHARD_RELATIONS)
+    if workers <= 1 or shard_count < 2:
+        return indexer.build_property_index(ifc_file, plan, stop_event, progress, wanted)
+    if "fork" not in multiprocessing.get_all_start_methods():
+        queue.put({'type': 'log', 'message': "当前平台不支持 fork，完整加载引擎使用单进程建立索引（需要并行请使用流式引擎）"})
+        return indexer.build_property_index(ifc_file, plan, stop_event, progress, wanted)
+    if threading.active_count() > 1:
+        queue.put({'type': 'log', 'message': "多线程进程中不能安全地 fork，完整加载引擎使用单进程建立索引（需要并行请使用流式引擎）"})
+        return indexer.build_property_index(ifc_file, plan, stop_event, progress, wanted)
+
+    index = indexer.index_type_relations(ifc_file, plan, stop_event, wanted)
+    if index is None:
+        return None
+
+    queue.put({'type': 'log', 'message': f"并行建立索引: {workers} 个进程, {shard_count} 个分片"})
+    shard_progress = None
+    if progress is not None:
+        def shard_progress(finished, count):
+            progress(rel_count * finished // count, rel_count)
+
+    # 模型作为子进程初始化参数传入：fork 时随进程参数直接继承，不经过序列化，也不需要本进程的全局状态
+    results = run_shards(_decode_rel_shard, [(start, stop, plan) for start, stop in _split(0, rel_count, shard_count)],
+                         workers, stop_event, shard_progress, mp_context=multiprocessing.get_context("fork"),
+                         initializer=_init_rel_worker, initargs=(ifc_file, wanted))
+    if results is None:
+        return None
+
+    for decoded_rels in results:
+        indexer.merge_property_relations(index, decoded_rels)
+    return index
\ No newline at end of file
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""性能分析模块：按阶段记录耗时、CPU 时间、处理数量与内存，任务结束后写出 JSON 报告"""
+
+import cProfile
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# 报告中列出的 cProfile 热点函数数量
+HOTSPOT_LIMIT = 30
+
+_local = threading.local()
+
+
+def current():
+    """返回当前线程正在记录的 JobProfiler；未启用性能分析时返回 None"""
+    return getattr(_local, "profiler", None)
+
+
+def measure(name, **counts):
+    """在当前 JobProfiler 中累计一段代码的耗时与计数；未启用时不做任何事"""
+    job = current()
+    return job.measure(name, **counts) if job is not None else nullcontext()
+
+
+def rss_bytes():
+    """当前进程的常驻内存；无法获取时返回 None"""
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/self/statm") as fp:
+                return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class _Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+        counters = _Counters()
+        counters.cb = ctypes.sizeof(counters)
+        try:
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        except (AttributeError, OSError):
+            pass
+    return None
+
+
+def _peak_rss_bytes():
+    """进程启动以来的峰值常驻内存；平台不支持时返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mb(value):
+    return None if value is None else round(value / 1048576, 1)
+
+
+def _snapshot():
+    times = os.times()
+    return {
+        'wall': time.perf_counter(),
+        'cpu': time.process_time(),
+        'children_cpu': times.children_user + times.children_system,
+        'rss': rss_bytes(),
+    }
+
+
+class JobProfiler:
+    """
+    单个提取任务的性能记录。以 with 语句在工作线程中启用后：
+    - progress.PhaseProgress 自动记录各阶段（打开、索引、提取、写入）的起止；
+    - measure() 累计子步骤（如写出器的批量写入与保存）的耗时与计数；
+    - hot_loop 为真时用 cProfile 记录整个任务的函数级耗时。
+    CPU 时间为整个进程的 CPU 时间（含界面线程），子进程 CPU 时间只统计已结束的并行子进程。
+    """
+
+    def __init__(self, hot_loop=False):
+        self.hot_loop = hot_loop
+        self.phases = []
+        self.steps = {}
+        self.info = {}
+        self._open_phases = {}
+        self._profile = cProfile.Profile() if hot_loop else None
+        self._start = None
+        self._end = None
+
+    def __enter__(self):
+        _local.profiler = self
+        self._start = _snapshot()
+        if self._profile is not None:
+            self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        if self._profile is not None:
+            self._profile.disable()
+        self._end = _snapshot()
+        _local.profiler = None
+        return False
+
+    def phase_started(self, phase, label):
+        """阶段开始（由 PhaseProgress 调用）"""
+        self._open_phases[phase] = {'phase': phase, 'label': label, 'start': _snapshot()}
+
+    def phase_finished(self, phase, done, total, unit):
+        """阶段结束（由 PhaseProgress 调用）"""
+        record = self._open_phases.pop(phase, None)
+        if record is None:
+            return
+        record.update(end=_snapshot(), done=done, total=total, unit=unit)
+        self.phases.append(record)
+
+    @contextmanager
+    def measure(self, name, **counts):
+        """累计 with 块的耗时与调用次数，counts 中的数值一并累加"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            step = self.steps.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            step['seconds'] += time.perf_counter() - started
+            step['calls'] += 1
+            for key, value in counts.items():
+                step[key] = step.get(key, 0) + value
+
+    def set_info(self, **info):
+        """记录任务级信息（输入文件、行数、状态等）"""
+        self.info.update(info)
+
+    @staticmethod
+    def _phase_report(record, start, end):
+        wall = end['wall'] - start['wall']
+        report = {
+            'phase': record['phase'],
+            'label': record['label'],
+            'wall_s': round(wall, 4),
+            'cpu_s': round(end['cpu'] - start['cpu'], 4),
+            'children_cpu_s': round(end['children_cpu'] - start['children_cpu'], 4),
+            'rss_start_mb': _mb(start['rss']),
+            'rss_end_mb': _mb(end['rss']),
+        }
+        if start['rss'] is not None and end['rss'] is not None:
+            report['rss_delta_mb'] = _mb(end['rss'] - start['rss'])
+        if record.get('done') is not None:
+            report.update(done=record['done'], total=record['total'], unit=record['unit'])
+            if wall > 0:
+                report['rate_per_s'] = round(record['done'] / wall, 1)
+        return report
+
+    def _hotspots(self):
+        stats = pstats.Stats(self._profile)
+        hotspots = []
+        for (filename, line, func), (_, calls, total, cumulative, _) in stats.stats.items():
+            hotspots.append({'function': f"{func} ({os.path.basename(filename)}:{line})", 'calls': calls,
+                             'tottime_s': round(total, 4), 'cumtime_s': round(cumulative, 4)})
+        hotspots.sort(key=lambda item: item['tottime_s'], reverse=True)
+        return hotspots[:HOTSPOT_LIMIT]
+
+    def report(self):
+        """生成报告字典；未正常结束的阶段按任务结束时刻截止"""
+        end = self._end or _snapshot()
+        phases = [self._phase_report(record, record['start'], record['end']) for record in self.phases]
+        for record in self._open_phases.values():
+            phases.append(dict(self._phase_report(record, record['start'], end), unfinished=True))
+        steps = {name: dict(step, seconds=round(step['seconds'], 4)) for name, step in self.steps.items()}
+        report = {
+            'created': datetime.now().isoformat(timespec="seconds"),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                            'cpu_count': os.cpu_count()},
+            'job': dict(self.info),
+            'total': self._phase_report({'phase': "total", 'label': "总计"}, self._start, end),
+            'peak_rss_mb': _mb(_peak_rss_bytes()),
+            'phases': phases,
+            'steps': steps,
+        }
+        if self._profile is not None:
+            report['hotspots'] = self._hotspots()
+        return report
+
+    def write(self, report_path):
+        """写出 JSON 报告；启用 cProfile 时另存同名 .prof 文件（可用 pstats/snakeviz 查看）。返回报告字典"""
+        report = self.report()
+        if self._profile is not None:
+            profile_path = f"{os.path.splitext(report_path)[0]}.prof"
+            self._profile.dump_stats(profile_path)
+            report['profile_file'] = profile_path
+        with open(report_path, "w", encoding="utf-8") as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=2)
+        return report
+
+
+def summary_lines(report):
+    """将报告概括为几行日志"""
+    total = report['total']
+    lines = [f"性能报告: 总耗时 {total['wall_s']:.2f} s, CPU {total['cpu_s']:.2f} s, "
+             f"峰值内存 {report['peak_rss_mb'] if report['peak_rss_mb'] is not None else '-'} MB"]
+    for phase in report['phases']:
+        text = f"  {phase['label']}: {phase['wall_s']:.2f} s (CPU {phase['cpu_s']:.2f} s"
+        if phase.get('rss_delta_mb') is not None:
+            text += f", 内存 {phase['rss_delta_mb']:+.0f} MB"
+        text += ")"
+        if phase.get('rate_per_s') is not None and phase['done']:
+            done, rate, unit = phase['done'], phase['rate_per_s'], phase['unit']
+            if unit == "B":
+                done, rate, unit = done / 1048576, rate / 1048576, "MB"
+            digits = 1 if unit == "MB" else 0
+            text += f", {done:,.{digits}f} {unit}, {rate:,.{digits}f} {unit}/秒"
+        if phase.get('unfinished'):
+            text += "，未完成"
+        lines.append(text)
+    for name, step in report['steps'].items():
+        lines.append(f"  {name}: {step['seconds']:.2f} s / {step['calls']} 次")
+    for hotspot in report.get('hotspots', [])[:5]:
+        lines.append(f"  热点 {hotspot['function']}: {hotspot['tottime_s']:.2f} s, {hotspot['calls']} 次")
+    return lines
\ No newline at end of file
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""进度报告模块：按阶段向界面发送已处理数量、吞吐量与预计剩余时间"""
+
+import time
+
+from ifc_prop_getter import profiler
+from ifc_prop_getter.constants import PROGRESS_INTERVAL
+
+
+class PhaseProgress:
+    """
+    单个阶段（打开、索引、提取、写入）的进度。
+    调用方在热循环中每处理 CHUNK_SIZE 个条目调用一次 update()，
+    实际发送的 'progress' 消息再按 PROGRESS_INTERVAL 秒限流。
+    total 为 None 表示总量未知（例如 ifcopenshell 加载模型），界面显示为不确定进度。
+    启用性能分析时（profiler.JobProfiler），阶段的起止同时记入性能报告。
+    """
+
+    def __init__(self, queue, phase, label, total=None, unit="构件"):
+        self.queue = queue
+        self.phase = phase
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.done = 0
+        self.started = time.perf_counter()
+        self._last_sent = self.started
+        self._profiler = profiler.current()
+        if self._profiler is not None:
+            self._profiler.phase_started(phase, label)
+        self._send(self.started)
+
+    def update(self, done, total=None):
+        """记录已处理数量；距上次发送超过 PROGRESS_INTERVAL 秒时发送进度消息"""
+        self.done = done
+        if total is not None:
+            self.total = total
+        now = time.perf_counter()
+        if now - self._last_sent >= PROGRESS_INTERVAL:
+            self._send(now)
+
+    def finish(self):
+        """阶段结束：发送最终进度"""
+        if self.total is not None:
+            self.done = self.total
+        self._send(time.perf_counter())
+        if self._profiler is not None:
+            self._profiler.phase_finished(self.phase, self.done, self.total, self.unit)
+
+    def _send(self, now):
+        self._last_sent = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total is not None and rate > 0:
+            eta = max(self.total - self.done, 0) / rate
+        self.queue.put({'type': 'progress', 'phase': self.phase, 'label': self.label,
+                        'done': self.done, 'total': self.total, 'unit': self.unit,
+                        'rate': rate, 'eta': eta, 'elapsed': elapsed})
+
+
+def _format_seconds(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def format_progress(msg):
+    """将 'progress' 消息格式化为一行文字，例如 "提取属性 1200/5000 构件 · 850 构件/秒 · 剩余 00:04" """
+    done, total, rate, unit = msg['done'], msg['total'], msg['rate'], msg['unit']
+    if unit == "B":
+        done, total, rate, unit = done / 1048576, total and total / 1048576, rate / 1048576, "MB"
+        amount = f"{done:.0f}/{total:.0f} MB" if total else f"{done:.0f} MB"
+    else:
+        amount = f"{done}/{total} {unit}" if total else f"{done} {unit}"
+    if not done:
+        if total:
+            return f"{msg['label']} {amount}"
+        return f"{msg['label']} · 已用时 {_format_seconds(msg['elapsed'])}"
+    text = f"{msg['label']} {amount} · {rate:,.0f} {unit}/秒"
+    if msg['eta'] is not None:
+        text += f" · 剩余 {_format_seconds(msg['eta'])}"
+    return text
\ No newline at end of file
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+"""
+行过滤模块：解析过滤表达式并编译为 Python 函数，在提取循环中逐个构件求值，不满足条件的构件不保存也不写出。
+
+表达式语法（关键字不区分大小写）：
+  字段      GlobalId、Name、Class（IFC 类名）、Site、Building、Storey（所属场地、建筑、楼层），或提取列表中的属性名；
+            含空格等特殊字符的属性名写在方括号中，例如 [Assembly/Cast unit top elevation]
+  常量      数字 12000、-1.5；字符串 'PC-1' 或 "PC-1"（\' \" \\ 为转义，其余反斜杠原样保留）；布尔值 true / false
+  比较      = != < <= > >=（== 与 <> 亦可），两侧都可转为数字时按数值比较，否则按文本比较
+  文本      contains、startswith、endswith、matches（正则表达式，部分匹配即可）
+  集合      字段 in ('A', 'B', 3)
+  缺失      字段 is missing / 字段 is not missing
+  组合      and、or、not 与括号
+缺失值不满足任何比较（包括 !=），需要时用 is missing 判断。
+示例: [Cast unit top elevation] > 12000 and ([Cast unit Mark] startswith 'PC-' or Class = 'IfcColumn')
+"""
+
+import operator
+import re
+
+from ifc_prop_getter.spatial import LOCATION_FIELDS, NO_LOCATION
+
+# 不需要写在方括号中的内置字段 → 编译后函数中的取值表达式
+SPECIAL_FIELDS = {"GlobalId": "global_id", "Name": "name", "Class": "ifc_class"}
+SPECIAL_FIELDS.update((field, f"location[{i}]") for i, field in enumerate(LOCATION_FIELDS))
+
+_KEYWORDS = {"and", "or", "not", "in", "is", "missing", "contains", "startswith", "endswith", "matches",
+             "true", "false"}
+
+_COMPARISONS = {"=": "_eq", "==": "_eq", "!=": "_ne", "<>": "_ne", "<": "_lt", "<=": "_le", ">": "_gt",
+                ">=": "_ge"}
+
+_TEXT_OPERATORS = {"contains": "_contains", "startswith": "_startswith", "endswith": "_endswith"}
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<field>\[[^\]]*\])
+  | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+  | (?P<op><=|>=|!=|<>|==|=|<|>|\(|\)|,)
+  | (?P<word>[^\s()\[\],=!<>'"]+)
+)""", re.VERBOSE)
+
+_NUMBER = re.compile(r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?$")
+
+
+def as_number(value):
+    """转为数值；布尔值与无法转换的值返回 None"""
+    if value.__class__ is int or value.__class__ is float:
+        return value
+    if isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _boolean(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip(".").lower()
+    return True if text in ("true", "t") else False if text in ("false", "f") else None
+
+
+def _coerce(left, right):
+    """将比较的两侧转为同一类型：布尔、数值或文本；任一侧缺失或无法转换时返回 None"""
+    if left is None or right is None:
+        return None
+    if isinstance(left, bool) or isinstance(right, bool):
+        pair = _boolean(left), _boolean(right)
+        return None if None in pair else pair
+    if not (isinstance(left, str) and isinstance(right, str)):
+        pair = as_number(left), as_number(right)
+        if None not in pair:
+            return pair
+    return str(left), str(right)
+
+
+def _comparison(op):
+    def compare(left, right):
+        pair = _coerce(left, right)
+        return pair is not None and op(*pair)
+    return compare
+
+
+def _text_test(method):
+    def test(value, text):
+        return value is not None and method(str(value), text)
+    return test
+
+
+_HELPERS = {
+    "_eq": _comparison(operator.eq),
+    "_ne": _comparison(operator.ne),
+    "_lt": _comparison(operator.lt),
+    "_le": _comparison(operator.le),
+    "_gt": _comparison(operator.gt),
+    "_ge": _comparison(operator.ge),
+    "_contains": _text_test(str.__contains__),
+    "_startswith": _text_test(str.startswith),
+    "_endswith": _text_test(str.endswith),
+}
+
+
+def _in(value, options):
+    eq = _HELPERS["_eq"]
+    return any(eq(value, option) for option in options)
+
+
+def _matches(value, pattern):
+    return value is not None and pattern.search(str(value)) is not None
+
+
+_HELPERS.update(_in=_in, _matches=_matches)
+
+
+def _tokenize(expression):
+    """返回 [(类别, 值, 位置)]；类别为 field / string / number / op / word"""
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if match is None or match.end() == pos:
+            raise ValueError(f"第 {pos + 1} 个字符附近无法识别: {expression[pos:pos + 10]}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        start = match.start(kind)
+        if kind == "field":
+            value = text[1:-1].strip()
+        elif kind == "string":
+            value = re.sub(r"\\([\\'\"])", r"\1", text[1:-1])  # 其他反斜杠原样保留（如正则中的 \d）
+        elif kind == "word" and _NUMBER.match(text):
+            kind, value = "number", float(text)
+        elif kind == "word" and text.lower() in _KEYWORDS:
+            kind, value = "keyword", text.lower()
+        else:
+            value = text
+        tokens.append((kind, value, start))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """递归下降解析，直接生成 Python 表达式源码"""
+
+    def __init__(self, expression, properties):
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+        self.slots = {}
+        for idx, prop in enumerate(properties):
+            self.slots.setdefault(prop, idx)
+        self.constants = {}
+        self.fields = []
+
+    def _peek(self, offset=0):
+        idx = self.pos + offset
+        return self.tokens[idx] if idx < len(self.tokens) else (None, None, None)
+
+    def _error(self, message):
+        position = self._peek()[2]
+        where = "末尾" if position is None else f"第 {position + 1} 个字符"
+        return ValueError(f"{where}: {message}")
+
+    def _accept(self, kind, value=None):
+        token = self._peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return token
+        return None
+
+    def _expect(self, kind, value, description):
+        token = self._accept(kind, value)
+        if token is None:
+            raise self._error(f"缺少 {description}")
+        return token
+
+    def _constant(self, value):
+        name = f"_c{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("过滤条件为空")
+        source = self._or()
+        if self.pos < len(self.tokens):
+            raise self._error(f"多余的内容: {self._peek()[1]}")
+        return source
+
+    def _or(self):
+        parts = [self._and()]
+        while self._accept("keyword", "or"):
+            parts.append(self._and())
+        return parts[0] if len(parts) == 1 else "(" + " or ".join(parts) + ")"
+
+    def _and(self):
+        parts = [self._not()]
+        while self._accept("keyword", "and"):
+            parts.append(self._not())
+        return parts[0] if len(parts) == 1 else "(" + " and ".join(parts) + ")"
+
+    def _not(self):
+        if self._accept("keyword", "not"):
+            return f"(not {self._not()})"
+        return self._predicate()
+
+    def _predicate(self):
+        if self._accept("op", "("):
+            source = self._or()
+            self._expect("op", ")", "右括号 )")
+            return source
+
+        left = self._operand()
+        kind, value, _ = self._peek()
+        if kind == "op" and value in _COMPARISONS:
+            self.pos += 1
+            return f"{_COMPARISONS[value]}({left}, {self._operand()})"
+        if kind == "keyword" and value in _TEXT_OPERATORS:
+            self.pos += 1
+            return f"{_TEXT_OPERATORS[value]}({left}, {self._text_literal(value)})"
+        if kind == "keyword" and value == "matches":
+            self.pos += 1
+            pattern = self._text_literal(value, raw=True)
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                raise self._error(f"正则表达式无效: {e}") from None
+            return f"_matches({left}, {self._constant(compiled)})"
+        if kind == "keyword" and value == "in":
+            self.pos += 1
+            self._expect("op", "(", "左括号 (")
+            options = [self._literal()]
+            while self._accept("op", ","):
+                options.append(self._literal())
+            self._expect("op", ")", "右括号 )")
+            return f"_in({left}, {self._constant(tuple(options))})"
+        if kind == "keyword" and value == "is":
+            self.pos += 1
+            negate = self._accept("keyword", "not") is not None
+            self._expect("keyword", "missing", "missing")
+            return f"({left} is {'not ' if negate else ''}None)"
+        raise self._error("缺少比较运算符（= != < <= > >= contains startswith endswith matches in is）")
+
+    def _operand(self):
+        token = self._peek()
+        if token[0] in ("field", "word"):
+            source = self._field(token[1])
+            self.pos += 1
+            return source
+        return repr(self._literal())
+
+    def _field(self, name):
+        if name in SPECIAL_FIELDS:
+            self.fields.append(name)
+            return SPECIAL_FIELDS[name]
+        if name not in self.slots:
+            raise self._error(f"属性不在提取列表中: {name}")
+        self.fields.append(name)
+        return f"values[{self.slots[name]}]"
+
+    def _literal(self):
+        kind, value, _ = self._peek()
+        if kind in ("string", "number"):
+            self.pos += 1
+            return value
+        if kind == "keyword" and value in ("true", "false"):
+            self.pos += 1
+            return value == "true"
+        raise self._error("缺少常量（数字、带引号的字符串、true 或 false）")
+
+    def _text_literal(self, operator_name, raw=False):
+        value = self._literal()
+        if isinstance(value, bool):
+            raise self._error(f"{operator_name} 需要字符串")
+        if isinstance(value, str):
+            text = value
+        else:
+            text = repr(int(value)) if value.is_integer() else repr(value)  # contains 125 匹配 "125" 而非 "125.0"
+        return text if raw else repr(text)
+
+
+class RowFilter:
+    """
+    编译后的行过滤条件。test(values, ifc_class, global_id, name, location) 返回是否保留该构件，
+    values 为按提取列表对齐的原始属性值（缺失为 None），location 为 spatial 模块的位置元组。
+    """
+
+    def __init__(self, expression, properties):
+        self.expression = expression.strip()
+        parser = _Parser(self.expression, properties)
+        self.source = parser.parse()
+        self.fields = tuple(dict.fromkeys(parser.fields))
+        self._constants = {name: getattr(value, "pattern", value) for name, value in parser.constants.items()}
+        namespace = dict(_HELPERS, _no_location=NO_LOCATION, **parser.constants)
+        self.test = eval(compile(
+            f"lambda values, ifc_class, global_id, name, location=_no_location: bool({self.source})",
+            "<row_filter>", "eval"), namespace)
+
+    def cache_spec(self):
+        """用于缓存键的规范化表示（不受空白与关键字大小写影响）"""
+        return f"{self.source} {self._constants!r}"
+
+
+def compile_filter(expression, properties):
+    """编译过滤表达式；表达式为空时返回 None。语法错误时抛出 ValueError"""
+    if not expression or not expression.strip():
+        return None
+    return RowFilter(expression, properties)
\ No newline at end of file
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+"""列式结果存储模块：按列保存提取结果，重复字符串字典编码，缺失值记录在位图中"""
+
+from array import array
+
+import numpy as np
+import pandas as pd
+
+# 缺失值的输出形式
+MISSING = "N/A"
+
+# 类型化模式下的列类型
+KIND_STRING = "string"
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_BOOL = "bool"
+
+_NUMPY_TYPES = {KIND_INT: np.int64, KIND_FLOAT: np.float64, KIND_BOOL: np.bool_}
+
+
+def infer_kind(types):
+    """由一列中出现的 Python 值类型推断列类型：整数与浮点数混合为浮点，其他混合情况为字符串"""
+    types = set(types)
+    if not types:
+        return KIND_STRING
+    if types == {bool}:
+        return KIND_BOOL
+    if types <= {int}:
+        return KIND_INT
+    if types <= {int, float}:
+        return KIND_FLOAT
+    return KIND_STRING
+
+
+def converter(kind):
+    """返回将非空原始值转换为该列类型的函数"""
+    if kind == KIND_FLOAT:
+        return float
+    if kind == KIND_STRING:
+        return str
+    return lambda value: value
+
+
+class _Column:
+    """字典编码列：codes 为每行值在 dictionary 中的序号，valid 位图的第 i 位表示第 i 行是否有值"""
+
+    __slots__ = ("codes", "valid", "dictionary", "_lookup")
+
+    def __init__(self):
+        self.codes = array('i')
+        self.valid = bytearray()
+        self.dictionary = []
+        self._lookup = {}
+
+    def encode(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        return code
+
+
+class ColumnStore:
+    """
+    提取结果容器：每列一个字典编码的序号数组与一个有效位图。
+    相同的属性值在一列中只保存一份，缺失值不占用字符串对象；读取时再还原为输出字符串。
+    给定 kinds（每列的 KIND_*）时为类型化模式：各列保存同一类型的原生值，缺失值读取为 None / 空值，
+    调用方负责按 converter(kind) 转换写入的值。
+    """
+
+    def __init__(self, columns, kinds=None):
+        self.columns = list(columns)
+        self.kinds = list(kinds) if kinds is not None else None
+        self._data = [_Column() for _ in self.columns]
+        self._rows = 0
+
+    def __len__(self):
+        return self._rows
+
+    def append(self, values):
+        """追加一行，values 与 columns 对齐，None 表示缺失"""
+        n = self._rows
+        byte, bit = n >> 3, 1 << (n & 7)
+        new_byte = not n & 7
+        for col, value in zip(self._data, values):
+            if new_byte:
+                col.valid.append(0)
+            if value is None:
+                col.codes.append(0)
+            else:
+                col.codes.append(col.encode(value))
+                col.valid[byte] |= bit
+        self._rows = n + 1
+
+    @property
+    def missing(self):
+        """读取时缺失值的表示：字符串模式为 N/A，类型化模式为 None"""
+        return MISSING if self.kinds is None else None
+
+    def extend(self, other):
+        """追加另一个列相同的 ColumnStore 的全部行"""
+        offset = self._rows
+        for col, src in zip(self._data, other._data):
+            mapping = [col.encode(value) for value in src.dictionary]
+            col.codes.extend(array('i', [mapping[code] for code in src.codes]) if mapping else src.codes)
+            if not offset & 7:
+                col.valid.extend(src.valid)
+                continue
+            # 行数未按字节对齐时逐位拼接
+            for i in range(len(other)):
+                n = offset + i
+                if not n & 7:
+                    col.valid.append(0)
+                if src.valid[i >> 3] >> (i & 7) & 1:
+                    col.valid[n >> 3] |= 1 << (n & 7)
+        self._rows += len(other)
+
+    def column_parts(self, idx, start=0, stop=None):
+        """返回第 idx 列 [start, stop) 行的 (序号数组, 有效掩码, 字典列表)"""
+        stop = self._rows if stop is None else stop
+        col = self._data[idx]
+        codes = np.frombuffer(col.codes, dtype=np.int32)[start:stop] if stop > start else np.zeros(0, np.int32)
+        lo = start >> 3
+        bits = np.unpackbits(np.frombuffer(bytes(col.valid[lo:(stop + 7) >> 3]), dtype=np.uint8),
+                             bitorder='little')
+        mask = bits[start - lo * 8:stop - lo * 8].astype(bool)
+        return codes, mask, col.dictionary
+
+    def decode_column(self, idx, start=0, stop=None):
+        """还原第 idx 列为 Python 对象数组，缺失值为 missing"""
+        codes, mask, dictionary = self.column_parts(idx, start, stop)
+        lookup = np.empty(len(dictionary) + 1, dtype=object)
+        lookup[:-1] = dictionary
+        lookup[-1] = self.missing
+        return lookup[np.where(mask, codes, len(dictionary))]
+
+    def _typed_array(self, idx):
+        """类型化模式下还原第 idx 列为 pandas 可空数组（Int64 / Float64 / boolean）或对象数组"""
+        kind = self.kinds[idx]
+        if kind not in _NUMPY_TYPES:
+            return self.decode_column(idx)
+        codes, mask, dictionary = self.column_parts(idx)
+        dtype = _NUMPY_TYPES[kind]
+        values = np.asarray(dictionary, dtype=dtype)[codes] if dictionary else np.zeros(len(codes), dtype)
+        if kind == KIND_INT:
+            return pd.arrays.IntegerArray(values, ~mask)
+        if kind == KIND_FLOAT:
+            return pd.arrays.FloatingArray(values, ~mask)
+        return pd.arrays.BooleanArray(values, ~mask)
+
+    def iter_batches(self, size):
+        """按 size 行一批产出数据行（元组），供逐行写出的格式使用"""
+        for start in range(0, self._rows, size):
+            stop = min(start + size, self._rows)
+            columns = [self.decode_column(i, start, stop).tolist() for i in range(len(self.columns))]
+            yield list(zip(*columns))
+
+    def to_dataframe(self):
+        """还原为 DataFrame：字符串模式下全部为字符串，类型化模式下数值列为可空数值类型"""
+        decode = self.decode_column if self.kinds is None else self._typed_array
+        df = pd.DataFrame({i: decode(i) for i in range(len(self.columns))})
+        df.columns = self.columns
+        return df
\ No newline at end of file
@@ -0,0 +1,495 @@
+# -*- coding: utf-8 -*-
+
+"""
+本地提取服务：解析后的模型与属性索引常驻内存，通过 HTTP/JSON 接口重复查询，同一模型的后续查询不再解析文件。
+用法: python -m ifc_prop_getter.service [--host 127.0.0.1] [--port 8765] [--memory 4096]
+接口:
+  GET  /status   常驻模型、属性索引与内存占用
+  POST /extract  请求体为 JSON，字段与 extract_properties 的参数同名（ifc_path、properties 必填）；
+                 给定 output_dir 时写出文件并返回路径，否则直接返回 columns 与 rows
+  POST /evict    {"ifc_path": ...} 释放该模型；省略 ifc_path 时释放全部
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ifcopenshell
+
+from ifc_prop_getter import catalog, extractor, parallel, profiler, progress, spatial, stream_scanner, writers
+from ifc_prop_getter.constants import (DEFAULT_COMPRESSION, OUTPUT_FORMATS, SERVICE_HOST, SERVICE_INDEX_SLOTS,
+                                       SERVICE_MEMORY_BYTES, SERVICE_PORT)
+from ifc_prop_getter.aggregate import compile_aggregation
+from ifc_prop_getter.entity_filter import EntityFilter
+from ifc_prop_getter.row_filter import compile_filter
+
+# 无法读取进程内存时，按文件大小估算常驻模型占用的倍数
+_MEMORY_FACTOR = {"ifcopenshell": 10, "stream": 3}
+
+# /extract 请求中可选字段的默认值
+_EXTRACT_DEFAULTS = {
+    'include_globalid': True,
+    'include_name': False,
+    'engine': "ifcopenshell",
+    'workers': None,
+    'output_dir': None,
+    'base_filename': "extract",
+    'file_format': "CSV",
+    'compression': DEFAULT_COMPRESSION,
+    'previous_export': None,
+    'change_report': False,
+    'include_types': None,
+    'exclude_types': None,
+    'type_properties': True,
+    'typed_values': False,
+    'row_filter': None,
+    'group_by': None,
+    'measures': None,
+    'locations': None,
+    'profile': None,
+}
+
+
+def _file_stamp(path):
+    """文件大小与修改时间，用于判断常驻模型是否过期"""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class _ResidentModel:
+    """一个常驻内存的模型：ifcopenshell 文件或流式扫描的实体表，以及在其上建立的属性索引"""
+
+    def __init__(self, path, engine, stamp, source, schema_id, memory):
+        self.path = path
+        self.engine = engine
+        self.stamp = stamp
+        self.source = source
+        self.schema_id = schema_id
+        self.memory = memory
+        self.indexes = OrderedDict()  # {(type_properties, include, exclude): (products, property_index)}
+        self.hits = 0
+        self.loaded = time.time()
+
+
+class ModelStore:
+    """
+    常驻模型的 LRU 缓存，总内存不超过 max_bytes（至少保留最近使用的一个模型）。
+    每个模型最多保留 index_slots 个属性索引（按类型过滤条件与是否继承类型属性区分）；
+    索引包含全部属性与空间结构，因此同一模型换用任意属性列表或位置列都不需要重建。
+    查询已有索引时可并发进行；加载模型与建立索引串行执行，避免同时解析多个大文件。
+    """
+
+    def __init__(self, max_bytes=SERVICE_MEMORY_BYTES, index_slots=SERVICE_INDEX_SLOTS):
+        self.max_bytes = max_bytes
+        self.index_slots = index_slots
+        self._models = OrderedDict()  # {(绝对路径, 引擎): _ResidentModel}
+        self._stream_unsupported = {}  # {绝对路径: 文件状态}，含流式引擎不解析的属性、改用完整加载的模型
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def _lookup(self, key, stamp, index_key):
+        """在 _lock 内查找模型与索引并更新 LRU 顺序；模型文件已修改时丢弃。返回 (模型, 索引)"""
+        model = self._models.get(key)
+        if model is not None and model.stamp != stamp:
+            del self._models[key]
+            model = None
+        if model is None:
+            return None, None
+        self._models.move_to_end(key)
+        loaded = model.indexes.get(index_key)
+        if loaded is not None:
+            model.indexes.move_to_end(index_key)
+            model.hits += 1
+        return model, loaded
+
+    def _evict(self):
+        """在 _lock 内按 LRU 顺序释放模型，直到总内存不超过预算"""
+        while len(self._models) > 1 and sum(m.memory for m in self._models.values()) > self.max_bytes:
+            self._models.popitem(last=False)
+
+    def scan(self, ifc_path, plan, engine, workers, queue, stop_event, entity_filter):
+        """
+        与 extractor._scan 相同：返回 (products, property_index)；失败或取消时返回 None。
+        流式引擎遇到不解析的属性类型时与 extractor 一样改用完整加载引擎，之后该文件的请求直接使用完整加载的模型
+        """
+        key = (os.path.abspath(ifc_path), engine)
+        index_key = (bool(plan.type_properties), entity_filter.include, entity_filter.exclude)
+        stamp = _file_stamp(ifc_path)
+        if engine == "stream" and self._stream_unsupported.get(key[0]) == stamp:
+            return self.scan(ifc_path, plan, "ifcopenshell", workers, queue, stop_event, entity_filter)
+        with self._lock:
+            loaded = self._lookup(key, stamp, index_key)[1]
+        if loaded is not None:
+            queue.put({'type': 'log', 'message': "使用常驻属性索引"})
+            return loaded
+
+        with self._build_lock:
+            with self._lock:
+                model, loaded = self._lookup(key, stamp, index_key)
+            if loaded is not None:
+                queue.put({'type': 'log', 'message': "使用常驻属性索引"})
+                return loaded
+            if model is None:
+                model = self._load(key[0], engine, stamp, workers, queue, stop_event)
+                if model is None:
+                    return None
+                with self._lock:
+                    self._models[key] = model
+                    self._evict()
+            else:
+                queue.put({'type': 'log', 'message': "使用常驻模型，正在建立属性索引"})
+
+            index_plan = catalog.AllPropertiesPlan()
+            index_plan.type_properties = plan.type_properties
+            index_plan.locations = True
+            before = profiler.rss_bytes()
+            try:
+                if engine == "stream":
+                    loaded = extractor.index_tables(model.schema_id, model.source, index_plan, queue, stop_event,
+                                                    entity_filter)
+                else:
+                    loaded = extractor.index_model(model.source, index_plan, workers, queue, stop_event,
+                                                   entity_filter)
+            except stream_scanner.UnsupportedPropertyError as e:
+                queue.put({'type': 'log', 'message': f"警告: {str(e)}，改用完整加载引擎"})
+                with self._lock:
+                    self._models.pop(key, None)
+                    self._stream_unsupported[key[0]] = stamp
+                loaded = None
+            else:
+                if loaded is None:
+                    return None
+                after = profiler.rss_bytes()
+                with self._lock:
+                    if before is not None and after is not None:
+                        model.memory += max(after - before, 0)
+                    model.indexes[index_key] = loaded
+                    while len(model.indexes) > self.index_slots:
+                        model.indexes.popitem(last=False)
+                    self._evict()
+                return loaded
+        return self.scan(ifc_path, plan, "ifcopenshell", workers, queue, stop_event, entity_filter)
+
+    @staticmethod
+    def _load(path, engine, stamp, workers, queue, stop_event):
+        """解析模型并估算其内存占用；失败或取消时返回 None"""
+        before = profiler.rss_bytes()
+        if engine == "stream":
+            scanning = progress.PhaseProgress(queue, "open", "流式扫描", total=stamp[0], unit="B")
+            try:
+                # 收集全部构件、属性与空间结构，类型过滤与属性选择在建立索引时进行
+                scan_plan = catalog.AllPropertiesPlan()
+                scan_plan.locations = True
+                scanned = parallel.scan_tables(path, scan_plan, workers, queue, stop_event, scanning.update,
+                                               EntityFilter(exclude=()))
+            except Exception as e:
+                queue.put({'type': 'error', 'message': f"文件解析失败: {str(e)}"})
+                return None
+            if scanned is None:
+                queue.put({'type': 'log', 'message': "任务已被用户取消"})
+                return None
+            schema_id, source = scanned
+        else:
+            scanning = progress.PhaseProgress(queue, "open", "打开模型")
+            try:
+                source = ifcopenshell.open(path)
+            except Exception as e:
+                queue.put({'type': 'error', 'message': f"文件打开失败: {str(e)}"})
+                return None
+            schema_id = source.schema
+        scanning.finish()
+
+        after = profiler.rss_bytes()
+        if before is not None and after is not None:
+            memory = max(after - before, stamp[0])
+        else:
+            memory = stamp[0] * _MEMORY_FACTOR[engine]
+        queue.put({'type': 'log', 'message': f"模型已常驻内存: 约 {memory / 1048576:.0f} MB"})
+        return _ResidentModel(path, engine, stamp, source, schema_id, memory)
+
+    def status(self):
+        """常驻模型列表（按最近使用排序，最新在后）与内存占用"""
+        with self._lock:
+            models = [{
+                'ifc_path': model.path,
+                'engine': model.engine,
+                'schema': model.schema_id,
+                'memory_mb': round(model.memory / 1048576, 1),
+                'indexes': len(model.indexes),
+                'hits': model.hits,
+                'loaded': time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(model.loaded)),
+            } for model in self._models.values()]
+        return {
+            'models': models,
+            'memory_mb': round(sum(m['memory_mb'] for m in models), 1),
+            'budget_mb': round(self.max_bytes / 1048576, 1),
+        }
+
+    def evict(self, ifc_path=None):
+        """释放指定文件（所有引擎）的常驻模型；ifc_path 为空时释放全部。返回释放的模型数"""
+        with self._lock:
+            if ifc_path is None:
+                keys = list(self._models)
+            else:
+                path = os.path.abspath(ifc_path)
+                keys = [key for key in self._models if key[0] == path]
+            for key in keys:
+                del self._models[key]
+        return len(keys)
+
+
+class _Collector:
+    """代替消息队列传给提取函数：收集日志、第一条错误与完成消息"""
+
+    def __init__(self):
+        self.logs = []
+        self.error = None
+        self.complete = None
+
+    def put(self, msg):
+        mtype = msg.get('type')
+        if mtype == 'log':
+            self.logs.append(msg['message'])
+        elif mtype == 'error' and self.error is None:
+            self.error = msg['message']
+        elif mtype == 'complete':
+            self.complete = msg
+
+
+def _json_default(value):
+    """numpy 标量转为 Python 数值"""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def handle_extract(store, request):
+    """执行一次 /extract 请求，返回响应字典；请求参数有误时抛出 ValueError"""
+    unknown = set(request) - set(_EXTRACT_DEFAULTS) - {"ifc_path", "properties"}
+    if unknown:
+        raise ValueError(f"未知的请求字段: {', '.join(sorted(unknown))}")
+    if not request.get("ifc_path") or not request.get("properties"):
+        raise ValueError("缺少 ifc_path 或 properties")
+    options = dict(_EXTRACT_DEFAULTS, **request)
+    if not os.path.isfile(options['ifc_path']):
+        raise ValueError(f"文件不存在: {options['ifc_path']}")
+    if options['file_format'] not in OUTPUT_FORMATS:
+        raise ValueError(f"未知的输出格式: {options['file_format']}")
+    writers.check_compression(options['file_format'], options['compression'])
+    workers = options['workers'] or parallel.default_workers()
+    try:
+        compile_filter(options['row_filter'], options['properties'])
+    except ValueError as e:
+        raise ValueError(f"过滤条件无效: {str(e)}") from None
+    try:
+        compile_aggregation(options['group_by'], options['measures'], options['properties'])
+    except ValueError as e:
+        raise ValueError(f"汇总设置无效: {str(e)}") from None
+    try:
+        locations = spatial.parse_locations(options['locations'])
+    except ValueError as e:
+        raise ValueError(f"位置列无效: {str(e)}") from None
+
+    collector = _Collector()
+    started = time.perf_counter()
+    response = {}
+    if options['output_dir']:
+        extractor.extract_properties(
+            options['ifc_path'], list(options['properties']), options['include_globalid'], options['include_name'],
+            options['output_dir'], options['base_filename'], options['file_format'], collector, threading.Event(),
+            engine=options['engine'], workers=workers, previous_export=options['previous_export'],
+            change_report=options['change_report'], compression=options['compression'],
+            include_types=options['include_types'], exclude_types=options['exclude_types'],
+            type_properties=options['type_properties'], profile=options['profile'],
+            typed_values=options['typed_values'], models=store, row_filter=options['row_filter'],
+            group_by=options['group_by'], measures=options['measures'], locations=locations)
+        if collector.complete is not None:
+            response.update(filepath=collector.complete['filepath'], rows=collector.complete.get('rows'),
+                            message=collector.complete.get('message'))
+    else:
+        table = extractor.extract_table(
+            options['ifc_path'], list(options['properties']), options['include_globalid'], options['include_name'],
+            collector, threading.Event(), engine=options['engine'], workers=workers,
+            include_types=options['include_types'], exclude_types=options['exclude_types'],
+            type_properties=options['type_properties'], typed_values=options['typed_values'], models=store,
+            row_filter=options['row_filter'], group_by=options['group_by'], measures=options['measures'],
+            locations=locations)
+        if table is not None:
+            df = table.to_dataframe()
+            response.update(columns=list(df.columns), rows=df.astype(object).where(df.notna(), None).values.tolist())
+    response.update(ok=collector.error is None and bool(response), error=collector.error, logs=collector.logs,
+                    seconds=round(time.perf_counter() - started, 4))
+    return response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """HTTP 请求处理；server.store 为共享的 ModelStore"""
+
+    server_version = "IFCPropGetter"
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, default=_json_default).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length).decode("utf-8")) if length else {}
+        if not isinstance(data, dict):
+            raise ValueError("请求体必须是 JSON 对象")
+        return data
+
+    def do_GET(self):
+        if self.path == "/status":
+            self._send(200, self.server.store.status())
+        else:
+            self._send(404, {'ok': False, 'error': f"未知的接口: {self.path}"})
+
+    def do_POST(self):
+        if self.path not in ("/extract", "/evict"):
+            self._send(404, {'ok': False, 'error': f"未知的接口: {self.path}"})
+            return
+        try:
+            request = self._read_json()
+            if self.path == "/evict":
+                self._send(200, {'ok': True, 'evicted': self.server.store.evict(request.get("ifc_path"))})
+            else:
+                self._send(200, handle_extract(self.server.store, request))
+        except ValueError as e:
+            self._send(400, {'ok': False, 'error': str(e)})
+        except Exception as e:
+            self._send(500, {'ok': False, 'error': f"未捕获的异常: {str(e)}", 'logs': [traceback.format_exc()]})
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_server(host=SERVICE_HOST, port=SERVICE_PORT, store=None, quiet=False):
+    """创建（未启动的）服务；调用 serve_forever() 开始处理请求"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.store = store if store is not None else ModelStore()
+    server.quiet = quiet
+    return server
+
+
+class ServiceClient:
+    """提取服务的客户端；连接失败时抛出 OSError"""
+
+    def __init__(self, url=f"http://{SERVICE_HOST}:{SERVICE_PORT}", timeout=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _call(self, path, body=None):
+        data = None if body is None else json.dumps(body, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(self.url + path, data=data,
+                                     headers={"Content-Type": "application/json; charset=utf-8"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            # 服务端的错误响应同样是 JSON，{'ok': False, 'error': ...}
+            with e:
+                return json.loads(e.read().decode("utf-8"))
+
+    def status(self):
+        return self._call("/status")
+
+    def extract(self, **request):
+        """参数与 /extract 请求字段相同"""
+        return self._call("/extract", request)
+
+    def evict(self, ifc_path=None):
+        return self._call("/evict", {} if ifc_path is None else {'ifc_path': ifc_path})
+
+
+def extract_remote(url, request, queue, stop_event):
+    """
+    工作线程函数：通过提取服务执行提取，消息格式与 extractor.extract_properties 相同。
+    取消时只停止等待，服务端已开始的任务仍会完成。
+    """
+    try:
+        queue.put({'type': 'log', 'message': f"使用提取服务: {url}"})
+        queue.put({'type': 'status', 'message': "正在等待提取服务..."})
+        result = {}
+
+        def call():
+            try:
+                result['response'] = ServiceClient(url).extract(**request)
+            except Exception as e:
+                result['exception'] = e
+
+        caller = threading.Thread(target=call, daemon=True)
+        caller.start()
+        while caller.is_alive():
+            if stop_event.is_set():
+                queue.put({'type': 'log', 'message': "任务已被用户取消（服务端任务仍会完成）"})
+                return
+            caller.join(0.2)
+
+        if 'exception' in result:
+            queue.put({'type': 'error', 'message': f"无法连接提取服务: {str(result['exception'])}"})
+            return
+        response = result['response']
+        for line in response.get('logs', ()):
+            queue.put({'type': 'log', 'message': line})
+        if response.get('error') or not response.get('ok'):
+            queue.put({'type': 'error', 'message': response.get('error') or "提取服务未返回结果"})
+            return
+        queue.put({'type': 'log', 'message': f"服务端耗时 {response['seconds']:.2f} s"})
+        queue.put({
+            'type': 'complete',
+            'filepath': response['filepath'],
+            'rows': response.get('rows'),
+            'message': response.get('message') or "导出成功",
+        })
+
+    except Exception as e:
+        queue.put({'type': 'error', 'message': f"未捕获的异常: {str(e)}"})
+        queue.put({'type': 'log', 'message': traceback.format_exc()})
+    finally:
+        queue.put({'type': 'finished'})
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m ifc_prop_getter.service",
+        description="本地提取服务：模型与属性索引常驻内存，通过 HTTP/JSON 接口查询")
+    parser.add_argument("--host", default=SERVICE_HOST, help="监听地址，默认 %(default)s（仅本机）")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help="端口，默认 %(default)s")
+    parser.add_argument("--memory", type=int, default=SERVICE_MEMORY_BYTES // 1048576,
+                        help="常驻模型的内存预算 (MB)，默认 %(default)s")
+    parser.add_argument("--index-slots", type=int, default=SERVICE_INDEX_SLOTS,
+                        help="每个模型保留的属性索引数，默认 %(default)s")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不打印请求日志")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = ModelStore(args.memory * 1048576, args.index_slots)
+    server = make_server(args.host, args.port, store, args.quiet)
+    print(f"提取服务已启动: http://{args.host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
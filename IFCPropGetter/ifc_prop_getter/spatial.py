@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+空间结构模块：一次遍历 IfcRelContainedInSpatialStructure 与 IfcRelAggregates，建立构件到所属场地、建筑、楼层的索引。
+构件沿"包含于空间结构 → 聚合父对象"向上查找，装配体的零件（如预制构件中的钢筋、埋件）继承父装配体所在的楼层；
+房间（IfcSpace）等中间层级按聚合关系继续向上。位置取空间结构实体的 Name，同一容器的查找结果只计算一次。
+"""
+
+import re
+
+# 位置字段（输出列名与过滤、汇总中的字段名），顺序与位置元组一致
+LOCATION_FIELDS = ("Site", "Building", "Storey")
+
+# 位置字段的界面显示名
+LOCATION_LABELS = {"Site": "场地", "Building": "建筑", "Storey": "楼层"}
+
+# 与 LOCATION_FIELDS 对齐的空间结构类（含子类）
+LEVEL_CLASSES = ("IfcSite", "IfcBuilding", "IfcBuildingStorey")
+
+# 没有所属空间结构时的位置元组
+NO_LOCATION = (None,) * len(LOCATION_FIELDS)
+
+# 向上查找的最大层数，防止错误的循环聚合关系导致死循环
+MAX_DEPTH = 64
+
+_SEPARATORS = re.compile(r"[\s,;，；]+")
+
+
+class SpatialIndex:
+    """
+    构件所属空间结构的索引：containers 与 parents 记录向上一级的对象，levels 记录场地、建筑、楼层的名称。
+    关系按实体 id 顺序加入；同一对象出现在多个关系中时以第一个为准。
+    """
+
+    def __init__(self):
+        self.containers = {}  # {构件 id: 空间结构 id}
+        self.parents = {}     # {被聚合对象 id: 聚合父对象 id}
+        self.levels = {}      # {空间结构 id: (LOCATION_FIELDS 序号, 名称)}
+
+    def __len__(self):
+        """直接包含于空间结构的对象数"""
+        return len(self.containers)
+
+    def add_contained(self, structure_id, element_ids):
+        for element_id in element_ids:
+            self.containers.setdefault(element_id, structure_id)
+
+    def add_aggregated(self, parent_id, child_ids):
+        for child_id in child_ids:
+            self.parents.setdefault(child_id, parent_id)
+
+    def add_level(self, entity_id, level, name):
+        self.levels[entity_id] = (level, name)
+
+    def resolver(self):
+        """返回 locate(构件 id) -> 与 LOCATION_FIELDS 对齐的名称元组（缺失为 None）；上级对象的结果在本次提取中缓存"""
+        containers = self.containers
+        parents = self.parents
+        levels = self.levels
+        memo = {}
+
+        def locate(entity_id):
+            chain = []
+            node = entity_id
+            location = NO_LOCATION
+            while node is not None:
+                found = memo.get(node)
+                if found is not None:
+                    location = found
+                    break
+                if len(chain) >= MAX_DEPTH:
+                    break
+                chain.append(node)
+                node = containers.get(node, parents.get(node))
+            # 自上而下填入层级名称，较低的层级覆盖较高的同类层级
+            for node in reversed(chain):
+                level = levels.get(node)
+                if level is not None:
+                    location = location[:level[0]] + (level[1],) + location[level[0] + 1:]
+                if node != entity_id:
+                    memo[node] = location
+            return location
+
+        return locate
+
+
+def build_spatial_index(ifc_file):
+    """在已加载的模型上一次遍历空间包含与聚合关系，返回 SpatialIndex"""
+    index = SpatialIndex()
+    for rel in ifc_file.by_type("IfcRelContainedInSpatialStructure"):
+        if rel.RelatingStructure is not None:
+            index.add_contained(rel.RelatingStructure.id(), [e.id() for e in rel.RelatedElements or ()])
+    for rel in ifc_file.by_type("IfcRelAggregates"):
+        if rel.RelatingObject is not None:
+            index.add_aggregated(rel.RelatingObject.id(), [o.id() for o in rel.RelatedObjects or ()])
+    for level, ifc_class in enumerate(LEVEL_CLASSES):
+        for entity in ifc_file.by_type(ifc_class):
+            index.add_level(entity.id(), level, entity.Name)
+    return index
+
+
+def parse_locations(value):
+    """
+    解析位置列（逗号分隔的文本或列表，不区分大小写），按给定顺序去重后返回 LOCATION_FIELDS 中的字段名列表。
+    含未知字段时抛出 ValueError
+    """
+    names = _SEPARATORS.split(value) if isinstance(value, str) else list(value or ())
+    lookup = {field.lower(): field for field in LOCATION_FIELDS}
+    fields = []
+    for name in names:
+        if not name:
+            continue
+        field = lookup.get(str(name).lower())
+        if field is None:
+            raise ValueError(f"未知的位置列: {name}（可选 {', '.join(LOCATION_FIELDS)}）")
+        if field not in fields:
+            fields.append(field)
+    return fields
+
+
+def uses_location(fields):
+    """字段列表中是否引用了位置字段（行过滤或汇总用到位置时也需要建立空间结构索引）"""
+    return any(field in LOCATION_FIELDS for field in fields)
\ No newline at end of file
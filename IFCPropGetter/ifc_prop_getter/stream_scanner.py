@@ -0,0 +1,793 @@
+# -*- coding: utf-8 -*-
+
+"""流式扫描模块：逐行读取 STEP 物理文件 (SPF)，不加载完整模型即可提取属性"""
+
+import hashlib
+import os
+import re
+from functools import lru_cache
+
+import ifcopenshell.ifcopenshell_wrapper as ifc_wrapper
+
+from ifc_prop_getter import indexer, spatial
+
+# 实体行头部：#123=IFCNAME(
+_ENTITY_HEAD = re.compile(r"\s*#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\(")
+_ENTITY_HEAD_BYTES = re.compile(rb"\s*#\d+\s*=\s*([A-Za-z0-9_]+)\s*\(")
+# 快速路径：单个简单参数（字符串、引用或空值）及其后的分隔符
+_SIMPLE_ARG = re.compile(r"\s*(?:'((?:[^']|'')*)'|#(\d+)|([$*]))\s*[,)]")
+# 快速路径：引用列表 (#1,#2,...) 及其后的分隔符
+_REF_LIST = re.compile(r"\s*\(([#\d,\s]*)\)\s*[,)]")
+_DIGITS = re.compile(r"\d+")
+# 实体引用或字符串字面量；计算内容指纹时去掉引用的 id，字符串中的 # 保持不变
+_REF_OR_STRING = re.compile(r"('(?:[^']|'')*')|#\d+")
+# 快速路径：单个带类型的简单值 IFCXXX('...') / IFCXXX(1.5) / IFCXXX(.T.)，或空值
+_TYPED_SIMPLE = re.compile(r"""\s*(?:([A-Za-z][A-Za-z0-9_]*)\s*\(\s*(?:
+    '((?:[^']|'')*)'
+  | ([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | \.([A-Za-z0-9_]+)\.
+)\s*\)|(\$))\s*[,)]""", re.VERBOSE)
+_DATA_SECTION = re.compile(rb"(?:^|;)\s*DATA\s*;", re.IGNORECASE)
+_FILE_SCHEMA = re.compile(r"FILE_SCHEMA\s*\(\s*\(\s*'([^']*)'", re.IGNORECASE)
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<str>'(?:[^']|'')*')
+  | \#(?P<ref>\d+)
+  | (?P<enum>\.[A-Za-z0-9_]+\.)
+  | (?P<num>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<typed>[A-Za-z][A-Za-z0-9_]*)\s*\(
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<comma>,)
+  | (?P<null>[$*])
+)""", re.VERBOSE)
+_STRING_ESCAPE = re.compile(r"\\X2\\((?:[0-9A-Fa-f]{4})*)\\X0\\|\\X4\\((?:[0-9A-Fa-f]{8})*)\\X0\\"
+                            r"|\\X\\([0-9A-Fa-f]{2})|\\S\\(.)|\\P[A-Z]?\\|\\\\")
+
+_QUANTITY_TYPES = ("IfcQuantityLength", "IfcQuantityArea", "IfcQuantityVolume",
+                   "IfcQuantityCount", "IfcQuantityWeight", "IfcQuantityTime", "IfcQuantityNumber")
+
+# 流式引擎不解析的属性类型：ifcopenshell 将其解码为包含实体 id 与实体对象的字典，
+# 所需属性属于这些类型时改用完整加载引擎，保证两种引擎输出一致
+COMPLEX_PROPERTY_KEYWORDS = frozenset({"IFCPROPERTYBOUNDEDVALUE", "IFCPROPERTYTABLEVALUE", "IFCCOMPLEXPROPERTY",
+                                       "IFCPHYSICALCOMPLEXQUANTITY"})
+
+
+class UnsupportedPropertyError(ValueError):
+    """所需属性属于流式引擎不解析的类型（见 COMPLEX_PROPERTY_KEYWORDS）；names 为这些属性名"""
+
+    def __init__(self, names):
+        self.names = names
+        super().__init__(f"流式引擎不支持以下属性的类型（有界值、表格值、复合属性或引用其他实体的属性）: {', '.join(names)}")
+
+
+class _Ref(int):
+    """实体引用 #id"""
+
+
+class _Enum(str):
+    """枚举值 .XXX."""
+
+
+class _Typed(list):
+    """带类型值 IFCXXX(...)：首元素为类型名，其后为参数"""
+
+
+def _decode_escape(match):
+    """解码 STEP 字符串中的单个转义序列"""
+    x2, x4, x, s = match.group(1, 2, 3, 4)
+    if x2 is not None:
+        return bytes.fromhex(x2).decode("utf-16-be")
+    if x4 is not None:
+        return bytes.fromhex(x4).decode("utf-32-be")
+    if x is not None:
+        return chr(int(x, 16))
+    if s is not None:
+        return chr(ord(s) + 128)
+    if match.group(0) == "\\\\":
+        return "\\"
+    return ""
+
+
+def _decode_string(raw):
+    """将 SPF 字符串字面量（不含外层引号）解码为 Python 字符串"""
+    raw = raw.replace("''", "'")
+    if "\\" in raw:
+        raw = _STRING_ESCAPE.sub(_decode_escape, raw)
+    return raw
+
+
+def _leading_args(text, pos, count):
+    """
+    快速读取从 text[pos] 开始的 count 个简单参数（字符串、引用或空值），不经过完整的词法分析。
+    返回 (参数列表, 结束位置)；遇到其他形式的参数时返回 (None, pos)，调用方应退回 _parse_args。
+    """
+    values = []
+    for _ in range(count):
+        match = _SIMPLE_ARG.match(text, pos)
+        if match is None:
+            return None, pos
+        string, ref, _ = match.groups()
+        if string is not None:
+            values.append(_decode_string(string))
+        elif ref is not None:
+            values.append(_Ref(ref))
+        else:
+            values.append(None)
+        pos = match.end()
+    return values, pos
+
+
+def _single_value(text, pos, schema_info):
+    """
+    快速读取 text[pos] 处的带类型简单值并按 schema 转换。
+    返回 (是否成功, 值)；列表、嵌套等其他形式返回 (False, None)，调用方应退回 _parse_args。
+    """
+    match = _TYPED_SIMPLE.match(text, pos)
+    if match is None:
+        return False, None
+    type_name, string, number, enum, null = match.groups()
+    if null is not None:
+        return True, None
+    if string is not None:
+        value = _decode_string(string)
+    elif number is not None:
+        value = float(number) if "." in number or "e" in number or "E" in number else int(number)
+    else:
+        value = _Enum(enum)
+    return True, _coerce(value, schema_info.value_type(type_name))
+
+
+def _ref_list(text, pos):
+    """快速读取 text[pos] 处的引用列表，返回 (id 元组, 结束位置)；不是引用列表时返回 (None, pos)"""
+    match = _REF_LIST.match(text, pos)
+    if match is None:
+        return None, pos
+    return tuple(int(i) for i in _DIGITS.findall(match.group(1))), match.end()
+
+
+def _parse_args(text, pos):
+    """从 text[pos] 处解析实体参数列表（左括号之后），返回参数列表"""
+    stack = [[]]
+    for match in _TOKEN.finditer(text, pos):
+        kind = match.lastgroup
+        current = stack[-1]
+        if kind == "comma":
+            continue
+        if kind == "str":
+            current.append(_decode_string(match.group("str")[1:-1]))
+        elif kind == "ref":
+            current.append(_Ref(match.group("ref")))
+        elif kind == "num":
+            token = match.group("num")
+            if "." in token or "e" in token or "E" in token:
+                current.append(float(token))
+            else:
+                current.append(int(token))
+        elif kind == "enum":
+            current.append(_Enum(match.group("enum")[1:-1]))
+        elif kind == "null":
+            current.append(None)
+        elif kind == "typed":
+            typed = _Typed([match.group("typed")])
+            current.append(typed)
+            stack.append(typed)
+        elif kind == "open":
+            child = []
+            current.append(child)
+            stack.append(child)
+        elif kind == "close":
+            stack.pop()
+            if not stack:
+                return current
+    raise ValueError("实体参数不完整")
+
+
+class _SchemaInfo:
+    """按文件头 FILE_SCHEMA 查询实体继承关系与值类型"""
+
+    def __init__(self, identifier):
+        identifier = (identifier or "IFC4").upper()
+        try:
+            self.schema = ifc_wrapper.schema_by_name(identifier)
+        except Exception:
+            self.schema = ifc_wrapper.schema_by_name(identifier.split("_")[0])
+        self._value_types = {}
+        self.names = {}
+        # 与 ifcopenshell by_type 相同：子类型深度优先遍历顺序
+        self.product_order = {}
+        self._walk(self.schema.declaration_by_name("IfcProduct"), self.product_order)
+        self.type_objects = {}
+        self._walk(self.schema.declaration_by_name("IfcTypeObject"), self.type_objects)
+        # 场地、建筑、楼层（含子类）→ spatial.LOCATION_FIELDS 序号
+        self.levels = {}
+        for level, name in enumerate(spatial.LEVEL_CLASSES):
+            walked = {}
+            self._walk(self.schema.declaration_by_name(name), walked)
+            self.levels.update(dict.fromkeys(walked, level))
+        self.quantity_value_types = {}
+        for name in _QUANTITY_TYPES:
+            try:
+                decl = self.schema.declaration_by_name(name)
+            except Exception:
+                continue
+            self.names[name.upper()] = name
+            self.quantity_value_types[name.upper()] = self._simple_type(
+                decl.attribute_by_index(3).type_of_attribute())
+        # 需要解析属性值的实体：单值、枚举值、列表值属性与简单工程量
+        self.property_keywords = frozenset(
+            ["IFCPROPERTYSINGLEVALUE", "IFCPROPERTYENUMERATEDVALUE", "IFCPROPERTYLISTVALUE"]
+            + list(self.quantity_value_types))
+        # 预定义属性集（IFC4 的 IfcPreDefinedPropertySet 子类，如门窗衬板、面板属性，及 IFC2X3 中的同类实体）
+        # → [(属性名, 简单类型)]；与 ifcopenshell get_property_definition 一样从第 5 个属性起作为属性
+        self.predefined_psets = {}
+        walked = {}
+        self._walk(self.schema.declaration_by_name("IfcPropertySetDefinition"), walked)
+        for keyword in walked:
+            decl = self.schema.declaration_by_name(self.names[keyword])
+            if keyword in _PSET_REFS_INDEX or decl.is_abstract():
+                continue
+            self.predefined_psets[keyword] = [(attribute.name(), self._simple_type(attribute.type_of_attribute()))
+                                              for attribute in decl.all_attributes()[4:]]
+
+    def scan_keywords(self, product_keywords=None, locations=False):
+        """
+        流式扫描需要的全部实体关键字（大写 bytes），供 _iter_statements 在字节层面跳过其他实体。
+        locations 为真时另外保留空间包含、聚合关系与场地、建筑、楼层实体
+        """
+        keywords = set(self.property_keywords) | set(self.type_objects) | set(_PSET_REFS_INDEX)
+        keywords |= set(self.predefined_psets)
+        keywords |= COMPLEX_PROPERTY_KEYWORDS
+        keywords |= {"IFCRELDEFINESBYPROPERTIES", "IFCRELDEFINESBYTYPE"}
+        keywords |= set(self.product_order if product_keywords is None else product_keywords)
+        if locations:
+            keywords |= {"IFCRELCONTAINEDINSPATIALSTRUCTURE", "IFCRELAGGREGATES"} | set(self.levels)
+        return frozenset(keyword.encode("ascii") for keyword in keywords)
+
+    def _walk(self, decl, order):
+        name = decl.name()
+        self.names[name.upper()] = name
+        order[name.upper()] = len(order)
+        for sub in decl.subtypes():
+            self._walk(sub, order)
+
+    @staticmethod
+    def _simple_type(parameter_type):
+        """沿命名类型链解析到底层简单类型（real/integer/string/...）"""
+        while parameter_type is not None:
+            simple = parameter_type.as_simple_type()
+            if simple is not None:
+                return simple.declared_type()
+            named = parameter_type.as_named_type()
+            if named is None:
+                return None
+            declaration = named.declared_type().as_type_declaration()
+            if declaration is None:
+                return None
+            parameter_type = declaration.declared_type()
+        return None
+
+    def value_type(self, type_name):
+        """返回带类型值（如 IFCLABEL）的底层简单类型"""
+        if type_name not in self._value_types:
+            try:
+                decl = self.schema.declaration_by_name(type_name).as_type_declaration()
+                self._value_types[type_name] = self._simple_type(decl.declared_type()) if decl else None
+            except Exception:
+                self._value_types[type_name] = None
+        return self._value_types[type_name]
+
+
+def _coerce(value, simple_type):
+    """按 schema 简单类型转换原始值，与 ifcopenshell 的 wrappedValue 一致"""
+    if value is None:
+        return None
+    if simple_type in ("real", "number"):
+        return float(value)
+    if simple_type == "integer":
+        return int(value)
+    if simple_type in ("boolean", "logical") and isinstance(value, _Enum):
+        if value == "T":
+            return True
+        if value == "F":
+            return False
+        return "UNKNOWN"
+    if isinstance(value, _Enum):
+        return str(value)
+    return value
+
+
+def _typed_value(value, schema_info):
+    """解码 IFCLABEL('...') 形式的带类型值"""
+    if isinstance(value, _Typed):
+        inner = value[1] if len(value) > 1 else None
+        return _coerce(inner, schema_info.value_type(value[0]))
+    return value
+
+
+def read_header(ifc_path):
+    """读取文件头，返回 (schema 标识, DATA 段起始字节偏移)；DATA; 之后同一行中的语句也属于 DATA 段"""
+    schema_id = None
+    offset = 0
+    with open(ifc_path, "rb") as fp:
+        for raw in fp:
+            line = raw.decode("utf-8", "replace")
+            match = _FILE_SCHEMA.search(line)
+            if match:
+                schema_id = match.group(1)
+            data = _DATA_SECTION.search(raw)
+            if data is not None:
+                return schema_id, offset + data.end()
+            offset += len(raw)
+    raise ValueError("不是有效的 IFC (STEP) 文件：缺少 DATA 段")
+
+
+def _split_statements(data, in_string):
+    """
+    按字符串外的 ; 拆分一行字节（分号与单引号均为 ASCII，不会出现在 UTF-8 多字节字符中）。
+    in_string 表示行首是否处于字符串内（字符串跨行时）。
+    返回 ([以 ; 结尾的片段], 行末未结束的剩余部分的起始位置, 行末是否处于字符串内)
+    """
+    parts = []
+    start = pos = 0
+    while True:
+        quote = data.find(b"'", pos)
+        if in_string:
+            if quote < 0:
+                return parts, start, True
+            # '' 转义相当于离开后立即重新进入字符串
+            pos, in_string = quote + 1, False
+            continue
+        semicolon = data.find(b";", pos)
+        if semicolon >= 0 and (quote < 0 or semicolon < quote):
+            parts.append(data[start:semicolon + 1])
+            start = pos = semicolon + 1
+        elif quote >= 0:
+            pos, in_string = quote + 1, True
+        else:
+            return parts, start, False
+
+
+def _iter_statements(fp, start, end, align, keywords=None):
+    """
+    逐条产出字节区间 [start, end) 内开始的行中的实体语句；语句按字符串外的 ; 拆分，
+    一行可含多条语句，一条语句也可跨多行，跨分片边界的语句由其首行所在的分片产出。
+    align 为 True 时先跳过 start 所在的不完整行，再跳到下一条以实体开头的行（分片扫描时使用）。
+    keywords 为需要的实体关键字（大写 bytes）集合：其他实体的语句在字节层面跳过，
+    不解码也不产出（几何等无关实体通常占文件的大部分）；None 表示产出全部语句。
+    """
+    offset = start
+    if align and start > 0:
+        fp.seek(start - 1)
+        if fp.read(1) != b"\n":
+            offset += len(fp.readline())
+    fp.seek(offset)
+    pending = []       # 未结束语句的已读部分
+    in_string = False
+    aligned = not align
+    for raw in fp:
+        line_start = offset
+        offset += len(raw)
+        if not pending:
+            if line_start >= end:
+                return
+            head = _ENTITY_HEAD_BYTES.match(raw)
+            if head is not None:
+                aligned = True
+                # 快速路径：整行是单条完整语句（常见的写法），不需要的直接跳过
+                if raw.count(b";") == 1 and raw.rstrip().endswith(b";") and raw.count(b"'") % 2 == 0:
+                    if keywords is None or head.group(1).upper() in keywords:
+                        yield raw.decode("utf-8", "replace").strip()
+                    continue
+            elif not aligned:
+                continue
+        data = raw.strip()
+        if not data:
+            continue
+        parts, rest, in_string = _split_statements(data, in_string)
+        for part in parts:
+            if pending:
+                pending.append(part)
+                part = b"".join(pending)
+                pending = []
+            statement = part.strip()
+            if not statement:
+                continue
+            if statement[:6].upper() == b"ENDSEC":
+                return
+            if keywords is not None:
+                head = _ENTITY_HEAD_BYTES.match(statement)
+                if head is not None and head.group(1).upper() not in keywords:
+                    continue
+            yield statement.decode("utf-8", "replace")
+        if rest < len(data):
+            pending.append(data[rest:])
+
+
+def _ids(refs):
+    """将引用列表压缩为 int 元组，便于跨进程传递"""
+    return tuple(int(r) for r in refs or () if isinstance(r, int))
+
+
+# 属性集定义中属性引用列表的参数位置（IfcPropertySet.HasProperties、IfcElementQuantity.Quantities）
+_PSET_REFS_INDEX = {"IFCPROPERTYSET": 4, "IFCELEMENTQUANTITY": 5}
+
+
+def _pset_definition(statement, pos, refs_index):
+    """读取属性集定义，返回 (属性集名, 属性 id 元组)；先走快速路径，失败时完整解析"""
+    leading, end = _leading_args(statement, pos, refs_index)
+    refs = _ref_list(statement, end)[0] if leading is not None else None
+    if refs is None:
+        args = _parse_args(statement, pos)
+        return args[2], _ids(args[refs_index])
+    return leading[2], refs
+
+
+def _predefined_definition(statement, pos, entity_id, attributes, names):
+    """
+    读取预定义属性集，返回 (属性集名, {属性名: 值}, 不解析的属性名元组)，只保留 names 中的属性。
+    与 ifcopenshell get_property_definition 一致：空值省略，另附 id；引用其他实体或列表形式的值不解析
+    """
+    args = _parse_args(statement, pos)
+    props = {}
+    unsupported = []
+    for (name, simple_type), value in zip(attributes, args[4:]):
+        if value is None or name not in names:
+            continue
+        if isinstance(value, (_Ref, list)):
+            unsupported.append(name)
+        else:
+            props[name] = _coerce(value, simple_type)
+    if "id" in names:
+        props["id"] = entity_id
+    return args[2], props, tuple(unsupported)
+
+
+def _read_property(statement, pos, keyword, schema_info, names):
+    """解析属性实体，返回 (属性名, 值)；先只读取属性名，属性名不在 names 中时不做完整解析并返回 None"""
+    leading, end = _leading_args(statement, pos, 2)
+    if leading is not None and leading[0] not in names:
+        return None
+    if leading is not None and keyword == "IFCPROPERTYSINGLEVALUE":
+        parsed, value = _single_value(statement, end, schema_info)
+        if parsed:
+            return leading[0], value
+    args = _parse_args(statement, pos)
+    if args[0] in names:
+        return args[0], _property_value(keyword, args, schema_info)
+    return None
+
+
+def _content_digest(statement):
+    """实体内容指纹：去掉实体 id 与引用 id 后的语句文本的哈希；被引用实体的内容由调用方另行计入"""
+    text = statement[statement.index("=") + 1:]
+    if "#" in text:
+        text = _REF_OR_STRING.sub(lambda match: match.group(1) or "#", text)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+def _property_value(keyword, args, schema_info):
+    """由完整解析的属性实体参数取得属性值：单值、枚举值或列表值的值列表、工程量值"""
+    if keyword == "IFCPROPERTYSINGLEVALUE":
+        return _typed_value(args[2], schema_info)
+    if keyword in ("IFCPROPERTYENUMERATEDVALUE", "IFCPROPERTYLISTVALUE"):
+        return [_typed_value(v, schema_info) for v in args[2]] if args[2] else None
+    return _coerce(args[3], schema_info.quantity_value_types[keyword])
+
+
+class ScanTables:
+    """一次扫描（或一个分片）收集到的实体表，只含属性解析所需的最少信息"""
+
+    def __init__(self, product_keywords=None, fingerprint=False):
+        # 允许收集的构件类型关键字（大写）；None 表示全部 IfcProduct
+        self.product_keywords = product_keywords
+        # 为真时收集计算构件指纹所需的内容：所需属性保留语句原文，建立索引时才解析用到的属性
+        self.fingerprint = fingerprint
+        self.products = {}       # {id: (类名大写, GlobalId, Name)}
+        self.product_digests = {}  # {id: 构件实体的内容指纹}，仅 fingerprint 为真时收集
+        self.properties = {}     # {id: (属性名, 值) 或语句原文}，仅保留查找计划需要的属性名
+        self.complex_properties = {}  # {id: 属性名}，查找计划需要的、流式引擎不解析的属性
+        self.psets = {}          # {id: (属性集名, 属性 id 元组)}
+        self.predefined_psets = {}  # {id: (属性集名, {属性名: 值}, 不解析的属性名元组)}，见 _predefined_definition
+        self.type_psets = {}     # {类型 id: 属性集 id 元组}
+        self.rels_by_props = []  # [(关系 id, 构件 id 元组, 属性集 id 元组)]
+        self.rels_by_type = []   # [(关系 id, 构件 id 元组, 类型 id)]
+        self.rels_contained = []   # [(关系 id, 构件 id 元组, 空间结构 id)]，仅查找计划需要位置时收集
+        self.rels_aggregates = []  # [(关系 id, 父对象 id, 子对象 id 元组)]
+        self.levels = {}           # {场地/建筑/楼层 id: (LOCATION_FIELDS 序号, 名称)}
+
+    def merge(self, other):
+        """合并另一个分片的实体表"""
+        self.products.update(other.products)
+        self.product_digests.update(other.product_digests)
+        self.properties.update(other.properties)
+        self.complex_properties.update(other.complex_properties)
+        self.psets.update(other.psets)
+        self.predefined_psets.update(other.predefined_psets)
+        self.type_psets.update(other.type_psets)
+        self.rels_by_props.extend(other.rels_by_props)
+        self.rels_by_type.extend(other.rels_by_type)
+        self.rels_contained.extend(other.rels_contained)
+        self.rels_aggregates.extend(other.rels_aggregates)
+        self.levels.update(other.levels)
+
+    def add(self, statement, schema_info, plan):
+        """解析单条实体语句，仅收集需要的实体类型"""
+        head = _ENTITY_HEAD.match(statement)
+        if head is None:
+            return
+        entity_id = int(head.group(1))
+        keyword = head.group(2).upper()
+
+        pos = head.end()
+
+        if keyword in schema_info.product_order:
+            wanted = self.product_keywords is None or keyword in self.product_keywords
+            level = schema_info.levels.get(keyword) if plan.locations else None
+            if wanted or level is not None:
+                args = _leading_args(statement, pos, 3)[0] or _parse_args(statement, pos)
+                if wanted:
+                    self.products[entity_id] = (keyword, args[0], args[2])
+                    if self.fingerprint:
+                        self.product_digests[entity_id] = _content_digest(statement)
+                if level is not None:
+                    self.levels[entity_id] = (level, args[2])
+        elif keyword in schema_info.property_keywords:
+            if self.fingerprint:
+                name = (_leading_args(statement, pos, 1)[0] or _parse_args(statement, pos))[0]
+                if name in plan.names:
+                    self.properties[entity_id] = statement
+                return
+            prop = _read_property(statement, pos, keyword, schema_info, plan.names)
+            if prop is not None:
+                self.properties[entity_id] = prop
+        elif keyword in COMPLEX_PROPERTY_KEYWORDS:
+            name = (_leading_args(statement, pos, 1)[0] or _parse_args(statement, pos))[0]
+            if name in plan.names:
+                self.complex_properties[entity_id] = name
+        elif keyword in _PSET_REFS_INDEX:
+            psets = _pset_definition(statement, pos, _PSET_REFS_INDEX[keyword])
+            self.psets[entity_id] = psets
+        elif keyword in schema_info.predefined_psets:
+            self.predefined_psets[entity_id] = _predefined_definition(
+                statement, pos, entity_id, schema_info.predefined_psets[keyword], plan.names)
+        elif keyword == "IFCRELDEFINESBYPROPERTIES":
+            leading, end = _leading_args(statement, pos, 4)
+            related, end = _ref_list(statement, end) if leading is not None else (None, end)
+            definition = _leading_args(statement, end, 1)[0] if related is not None else None
+            if definition is not None and definition[0] is not None:
+                self.rels_by_props.append((entity_id, related, (int(definition[0]),)))
+                return
+            args = _parse_args(statement, pos)
+            definition = args[5]
+            # IfcPropertySetDefinitionSet 以带类型列表形式出现
+            if isinstance(definition, _Typed):
+                definition = definition[1] if len(definition) > 1 else ()
+            else:
+                definition = (definition,)
+            self.rels_by_props.append((entity_id, _ids(args[4]), _ids(definition)))
+        elif keyword == "IFCRELDEFINESBYTYPE":
+            leading, end = _leading_args(statement, pos, 4)
+            related, end = _ref_list(statement, end) if leading is not None else (None, end)
+            type_ref = _leading_args(statement, end, 1)[0] if related is not None else None
+            if type_ref is None:
+                args = _parse_args(statement, pos)
+                related, type_ref = _ids(args[4]), args[5:6]
+            self.rels_by_type.append((entity_id, related, int(type_ref[0])))
+        elif keyword == "IFCRELCONTAINEDINSPATIALSTRUCTURE":
+            if not plan.locations:
+                return
+            leading, end = _leading_args(statement, pos, 4)
+            related, end = _ref_list(statement, end) if leading is not None else (None, end)
+            structure = _leading_args(statement, end, 1)[0] if related is not None else None
+            if structure is None or structure[0] is None:
+                args = _parse_args(statement, pos)
+                related, structure = _ids(args[4]), args[5:6]
+            if structure[0] is not None:
+                self.rels_contained.append((entity_id, related, int(structure[0])))
+        elif keyword == "IFCRELAGGREGATES":
+            if not plan.locations:
+                return
+            leading, end = _leading_args(statement, pos, 5)
+            related = _ref_list(statement, end)[0] if leading is not None else None
+            if related is None:
+                leading = _parse_args(statement, pos)
+                related = _ids(leading[5])
+            if leading[4] is not None:
+                self.rels_aggregates.append((entity_id, int(leading[4]), related))
+        elif keyword in schema_info.type_objects:
+            leading, end = _leading_args(statement, pos, 5)
+            refs = _ref_list(statement, end)[0] if leading is not None else None
+            self.type_psets[entity_id] = refs if refs is not None else _ids(_parse_args(statement, pos)[5])
+
+    def build(self, schema_info, plan, stop_event=None):
+        """
+        由实体表建立 (products, property_index)；只解析已收集构件涉及的属性集。用户取消时返回 None。
+        已收集构件的属性集中含流式引擎不解析的所需属性时抛出 UnsupportedPropertyError
+        """
+        psets = self.psets
+        predefined_psets = self.predefined_psets
+        properties = self.properties
+        complex_properties = self.complex_properties
+        products = self.products
+        unsupported = set()
+
+        def decode(definition_id):
+            if definition_id in predefined_psets:
+                pset_name, props, unparsed = predefined_psets[definition_id]
+                unsupported.update(name for name in unparsed if plan.wants(pset_name, name))
+                return pset_name, {name: value for name, value in props.items() if plan.wants(pset_name, name)}
+            pset_name, prop_ids = psets[definition_id]
+            props = {}
+            for prop_id in prop_ids:
+                prop = properties.get(prop_id)
+                if prop.__class__ is str:
+                    # 保留原文的属性在首次用到时解析
+                    head = _ENTITY_HEAD.match(prop)
+                    prop = properties[prop_id] = _read_property(prop, head.end(), head.group(2).upper(),
+                                                                schema_info, plan.names)
+                if prop is not None:
+                    if plan.wants(pset_name, prop[0]):
+                        props[prop[0]] = prop[1]
+                elif prop_id in complex_properties and plan.wants(pset_name, complex_properties[prop_id]):
+                    unsupported.add(complex_properties[prop_id])
+            return pset_name, props
+
+        # 与 by_type 一致，关系按实体 id 顺序处理
+        self.rels_by_type.sort(key=lambda rel: rel[0])
+        self.rels_by_props.sort(key=lambda rel: rel[0])
+
+        index = indexer.PropertyIndex()
+        type_cache = {}
+        typed = set()
+        for _, related, type_id in self.rels_by_type if plan.type_properties else ():
+            related = [obj_id for obj_id in related if obj_id in products and obj_id not in typed]
+            if not related:
+                continue
+            decoded = type_cache.get(type_id)
+            if decoded is None:
+                decoded = {}
+                for definition_id in self.type_psets.get(type_id, ()):
+                    if definition_id in psets or definition_id in predefined_psets:
+                        pset_name, props = decode(definition_id)
+                        decoded.setdefault(pset_name, {}).update(props)
+                type_cache[type_id] = decoded
+            for obj_id in related:
+                typed.add(obj_id)
+                index.add_type(obj_id, type_id, decoded)
+
+        for _, related, definitions in self.rels_by_props:
+            related = [obj_id for obj_id in related if obj_id in products]
+            if not related:
+                continue
+            decoded = [decode(d) for d in definitions if d in psets or d in predefined_psets]
+            indexer.merge_property_relations(index, ((related, decoded),))
+            if stop_event is not None and stop_event.is_set():
+                return None
+
+        if unsupported:
+            raise UnsupportedPropertyError(sorted(unsupported))
+        if plan.locations:
+            index.spatial = self.build_spatial()
+
+        order = schema_info.product_order
+        product_list = [
+            (entity_id, schema_info.names[keyword], global_id, name)
+            for entity_id, (keyword, global_id, name)
+            in sorted(self.products.items(), key=lambda item: (order[item[1][0]], item[0]))
+        ]
+        return product_list, index
+
+    def fingerprints(self, plan):
+        """已收集构件的内容指纹 {构件 id: 整数}（需以 fingerprint=True 扫描），不受实体 id 重新编号影响"""
+        psets = self.psets
+        predefined_psets = self.predefined_psets
+        properties = self.properties
+        complex_properties = self.complex_properties
+        pset_digests = {}
+
+        def pset_digest(definition_id):
+            digest = pset_digests.get(definition_id)
+            if digest is None and definition_id in predefined_psets:
+                # 预定义属性集扫描时已解码，只含所需属性
+                digest = pset_digests[definition_id] = hashlib.blake2b(
+                    repr(predefined_psets[definition_id]).encode("utf-8"), digest_size=8).digest()
+            if digest is None:
+                pset_name, prop_ids = psets[definition_id]
+                hasher = hashlib.blake2b(repr(pset_name).encode("utf-8"), digest_size=8)
+                for prop_id in prop_ids:
+                    text = properties.get(prop_id)
+                    if text is not None:
+                        hasher.update(_content_digest(text))
+                    elif prop_id in complex_properties:
+                        hasher.update(repr(complex_properties[prop_id]).encode("utf-8"))
+                digest = pset_digests[definition_id] = hasher.digest()
+            return digest
+
+        def definitions_digest(tag, definitions):
+            digests = [pset_digest(d) for d in definitions if d in psets or d in predefined_psets]
+            return b"%s%d:" % (tag, len(digests)) + b"".join(digests)
+
+        parts = {entity_id: [self.product_digests[entity_id]] for entity_id in self.products}
+        self.rels_by_type.sort(key=lambda rel: rel[0])
+        self.rels_by_props.sort(key=lambda rel: rel[0])
+        if plan.type_properties:
+            # 与 build 一致，构件只继承第一个类型关系的类型
+            typed = set()
+            for _, related, type_id in self.rels_by_type:
+                digest = None
+                for obj_id in related:
+                    if obj_id in parts and obj_id not in typed:
+                        typed.add(obj_id)
+                        if digest is None:
+                            digest = definitions_digest(b"T", self.type_psets.get(type_id, ()))
+                        parts[obj_id].append(digest)
+        for _, related, definitions in self.rels_by_props:
+            digest = None
+            for obj_id in related:
+                if obj_id in parts:
+                    if digest is None:
+                        digest = definitions_digest(b"P", definitions)
+                    parts[obj_id].append(digest)
+        if plan.locations:
+            locate = self.build_spatial().resolver()
+            for entity_id, element_parts in parts.items():
+                element_parts.append(repr(locate(entity_id)).encode("utf-8"))
+        return {entity_id: int.from_bytes(hashlib.blake2b(b"".join(element_parts), digest_size=8).digest(), "little")
+                for entity_id, element_parts in parts.items()}
+
+    def build_spatial(self):
+        """由收集到的空间包含与聚合关系建立 spatial.SpatialIndex；与 ifcopenshell 引擎一样按关系 id 顺序处理"""
+        index = spatial.SpatialIndex()
+        for _, related, structure_id in sorted(self.rels_contained, key=lambda rel: rel[0]):
+            index.add_contained(structure_id, related)
+        for _, parent_id, related in sorted(self.rels_aggregates, key=lambda rel: rel[0]):
+            index.add_aggregated(parent_id, related)
+        for entity_id, (level, name) in self.levels.items():
+            index.add_level(entity_id, level, name)
+        return index
+
+
+@lru_cache(maxsize=8)
+def schema_info_for(schema_id):
+    """按 schema 标识获取（并缓存）schema 信息"""
+    return _SchemaInfo(schema_id)
+
+
+def scan_range(ifc_path, schema_id, start, end, plan, stop_event=None, align=True, progress=None,
+               product_keywords=None, fingerprint=False):
+    """
+    扫描 DATA 段中 [start, end) 字节区间开始的语句，返回 ScanTables；用户取消时返回 None。
+    progress(已扫描字节数, 区间字节数) 每 10000 条语句调用一次。
+    product_keywords 为允许收集的构件类型关键字（大写）集合，None 表示全部 IfcProduct。
+    fingerprint 为真时收集计算构件指纹所需的内容，参见 ScanTables.fingerprints。
+    """
+    schema_info = schema_info_for(schema_id)
+    tables = ScanTables(product_keywords, fingerprint)
+    keywords = schema_info.scan_keywords(product_keywords, plan.locations)
+    with open(ifc_path, "rb") as fp:
+        for count, statement in enumerate(_iter_statements(fp, start, end, align, keywords)):
+            if count % 10000 == 0:
+                if stop_event is not None and stop_event.is_set():
+                    return None
+                if progress is not None:
+                    progress(min(fp.tell(), end) - start, end - start)
+            tables.add(statement, schema_info, plan)
+    return tables
+
+
+def scan_file(ifc_path, plan, stop_event=None, progress=None, product_keywords=None):
+    """
+    单次流式扫描 IFC 文件，只保留解析
+    IfcPropertySingleValue/IfcPropertyEnumeratedValue/IfcPropertyListValue/IfcPhysicalSimpleQuantity
+    → IfcPropertySet/IfcElementQuantity（及预定义属性集） → IfcRelDefinesByProperties/IfcRelDefinesByType → IfcProduct
+    所需的实体。返回 (products, property_index)：
+    products 为按 ifcopenshell by_type("IfcProduct") 顺序排列的 (id, 类名, GlobalId, Name)，
+    property_index 为 indexer.PropertyIndex，覆盖规则与 indexer.build_property_index 一致。
+    progress、product_keywords 参见 scan_range。用户取消时返回 None。
+    """
+    schema_id, data_offset = read_header(ifc_path)
+    tables = scan_range(ifc_path, schema_id, data_offset, os.path.getsize(ifc_path), plan,
+                        stop_event, align=False, progress=progress, product_keywords=product_keywords)
+    if tables is None:
+        return None
+    return tables.build(schema_info_for(schema_id), plan, stop_event)
\ No newline at end of file
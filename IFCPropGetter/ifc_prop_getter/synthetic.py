@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""合成 IFC 模型生成模块：按指定规模直接写出 SPF 文本，供基准测试使用"""
+
+import random
+import uuid
+
+import ifcopenshell.guid
+import ifcopenshell.ifcopenshell_wrapper as ifc_wrapper
+
+# 生成的构件类型，按构件序号轮流使用
+ELEMENT_CLASSES = ["IfcBeam", "IfcColumn", "IfcPlate", "IfcMechanicalFastener", "IfcElementAssembly"]
+
+# 类型对象上的属性集；TYPE_SHARED_PROP 与实例属性集同名，用于覆盖规则
+TYPE_PSET = "Pset_BenchType"
+TYPE_PROPS = ["TypeMark", "Weight"]
+TYPE_SHARED_PROP = "Prop0"
+
+# 可选的列表值属性（IfcPropertyListValue）与有界值属性（IfcPropertyBoundedValue），位于第一个实例属性集
+LIST_PROP = "ListProp"
+BOUNDED_PROP = "RangeProp"
+
+
+def pset_name(index):
+    """第 index 个实例属性集的名称"""
+    return f"Pset_Bench{index}"
+
+
+def prop_name(index):
+    """属性集中第 index 个属性的名称"""
+    return f"Prop{index}"
+
+
+def default_properties(psets, props):
+    """
+    与生成参数对应的提取属性列表：全部纯属性名（按属性集顺序取首个命中）、
+    最后一个属性集的限定名、类型属性，以及一个模型中不存在的属性。
+    """
+    properties = [prop_name(q) for q in range(props)]
+    properties += [f"{pset_name(psets - 1)}.{prop_name(q)}" for q in range(props)]
+    properties += TYPE_PROPS + ["Pset_Missing.Missing"]
+    return properties
+
+
+class _SpfWriter:
+    """
+    顺序分配实体 id 并写出实体语句，未给出的属性按 schema 补齐为 $。
+    每行写 statements_per_line 条语句（SPF 允许一行多条语句），全部写完后调用 flush()
+    """
+
+    def __init__(self, fp, schema, statements_per_line=1):
+        self.fp = fp
+        self.schema = schema
+        self.next_id = 0
+        self._counts = {}
+        self._per_line = max(1, statements_per_line)
+        self._line = []
+
+    def entity(self, ifc_class, *args):
+        count = self._counts.get(ifc_class)
+        if count is None:
+            count = self._counts[ifc_class] = self.schema.declaration_by_name(ifc_class).attribute_count()
+        values = list(args) + ["$"] * (count - len(args))
+        self.next_id += 1
+        self._line.append(f"#{self.next_id}={ifc_class.upper()}({','.join(values)});")
+        if len(self._line) >= self._per_line:
+            self.flush()
+        return self.next_id
+
+    def flush(self):
+        if self._line:
+            self.fp.write("".join(self._line) + "\n")
+            self._line = []
+
+
+def _refs(ids):
+    return f"({','.join(f'#{i}' for i in ids)})"
+
+
+def generate_ifc(path, elements, psets=3, props=6, types=20, type_share=0.5, missing=0.2, storeys=3, seed=1,
+                 list_values=False, bounded_values=False, statements_per_line=1):
+    """
+    写出合成 IFC4 文件并返回实体总数。
+    elements: 构件数；psets/props: 每个构件的属性集数与每个属性集的属性数；
+    types: 类型对象数，type_share 为关联到类型对象的构件比例；missing: 属性缺失比例；
+    storeys: 楼层数，构件按序号均匀分配到各楼层；seed 固定时生成结果完全相同。
+    list_values/bounded_values 为真时第一个实例属性集另含 LIST_PROP/BOUNDED_PROP（同样按 missing 缺失）；
+    statements_per_line 为每行写出的语句数，用于检验一行多条语句的解析。
+    """
+    rnd = random.Random(seed)
+
+    def guid():
+        return f"'{ifcopenshell.guid.compress(uuid.UUID(int=rnd.getrandbits(128)).hex)}'"
+
+    with open(path, "w", encoding="ascii", newline="\n") as fp:
+        fp.write("ISO-10303-21;\nHEADER;\n"
+                 "FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');\n"
+                 "FILE_NAME('synthetic.ifc','2024-01-01T00:00:00',(''),(''),'IFCPropGetter','','');\n"
+                 "FILE_SCHEMA(('IFC4'));\nENDSEC;\nDATA;\n")
+        out = _SpfWriter(fp, ifc_wrapper.schema_by_name("IFC4"), statements_per_line)
+
+        def write_pset(name, values, extra=()):
+            ids = [out.entity("IfcPropertySingleValue", f"'{key}'", "$", value) for key, value in values]
+            return out.entity("IfcPropertySet", guid(), "$", f"'{name}'", "$", _refs(ids + list(extra)))
+
+        # 空间结构
+        project = out.entity("IfcProject", guid(), "$", "'Benchmark'")
+        site = out.entity("IfcSite", guid(), "$", "'Site'")
+        building = out.entity("IfcBuilding", guid(), "$", "'Building'")
+        storey_ids = [out.entity("IfcBuildingStorey", guid(), "$", f"'Level {i + 1}'") for i in range(storeys)]
+        out.entity("IfcRelAggregates", guid(), "$", "$", "$", f"#{project}", _refs([site]))
+        out.entity("IfcRelAggregates", guid(), "$", "$", "$", f"#{site}", _refs([building]))
+        if storey_ids:
+            out.entity("IfcRelAggregates", guid(), "$", "$", "$", f"#{building}", _refs(storey_ids))
+
+        # 类型对象：每个构件类型分得若干个，属性值按类型序号区分
+        type_objects = {cls: [] for cls in ELEMENT_CLASSES}
+        for t in range(types):
+            cls = ELEMENT_CLASSES[t % len(ELEMENT_CLASSES)]
+            pset = write_pset(TYPE_PSET, [
+                (TYPE_PROPS[0], f"IFCLABEL('T{t}')"),
+                (TYPE_PROPS[1], f"IFCMASSMEASURE({t * 1.5:.1f})"),
+            ])
+            shared = write_pset(pset_name(0), [(TYPE_SHARED_PROP, f"IFCLABEL('TypeDefault{t}')")])
+            type_id = out.entity(f"{cls}Type", guid(), "$", f"'T{t}'", "$", "$", _refs([pset, shared]))
+            type_objects[cls].append((type_id, []))
+
+        contained = [[] for _ in storey_ids]
+        for i in range(elements):
+            cls = ELEMENT_CLASSES[i % len(ELEMENT_CLASSES)]
+            element = out.entity(cls, guid(), "$", f"'E{i}'")
+            if contained:
+                contained[i * len(contained) // elements].append(element)
+            if type_objects[cls] and rnd.random() < type_share:
+                rnd.choice(type_objects[cls])[1].append(element)
+            for p in range(psets):
+                values = []
+                for q in range(props):
+                    if rnd.random() < missing:
+                        continue
+                    if q == 0:
+                        value = f"IFCLABEL('M{rnd.randint(0, 500)}')"
+                    elif q == 1:
+                        value = f"IFCLABEL('PC-{rnd.randint(0, 50)}')"
+                    elif q == 2:
+                        value = f"IFCLENGTHMEASURE({rnd.randint(0, 30) * 1000}.)"
+                    elif q % 2:
+                        value = f"IFCREAL({rnd.random():.3f})"
+                    else:
+                        value = f"IFCINTEGER({rnd.randint(0, 99)})"
+                    values.append((prop_name(q), value))
+                extra = []
+                if p == 0 and list_values and rnd.random() >= missing:
+                    items = ",".join(f"IFCINTEGER({rnd.randint(0, 9)})" for _ in range(rnd.randint(1, 3)))
+                    extra.append(out.entity("IfcPropertyListValue", f"'{LIST_PROP}'", "$", f"({items})"))
+                if p == 0 and bounded_values and rnd.random() >= missing:
+                    low = rnd.randint(0, 50)
+                    extra.append(out.entity("IfcPropertyBoundedValue", f"'{BOUNDED_PROP}'", "$",
+                                            f"IFCREAL({low + 10}.)", f"IFCREAL({low}.)"))
+                pset = write_pset(pset_name(p), values, extra)
+                out.entity("IfcRelDefinesByProperties", guid(), "$", "$", "$", _refs([element]), f"#{pset}")
+
+        for objects in type_objects.values():
+            for type_id, related in objects:
+                if related:
+                    out.entity("IfcRelDefinesByType", guid(), "$", "$", "$", _refs(related), f"#{type_id}")
+        for storey, related in zip(storey_ids, contained):
+            if related:
+                out.entity("IfcRelContainedInSpatialStructure", guid(), "$", "$", "$", _refs(related), f"#{storey}")
+
+        out.flush()
+        fp.write("ENDSEC;\nEND-ISO-10303-21;\n")
+    return out.next_id
\ No newline at end of file
@@ -2,14 +2,11 @@
 
 """工具函数模块"""
 
+import os
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
-import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
-
 from ifc_prop_getter.constants import DATE_FORMAT, INVALID_FILENAME_CHARS
 
 
@@ -36,6 +33,19 @@ def get_default_output_dir():
     return str(desktop if desktop.exists() else Path.home())
 
 
+def get_default_cache_dir():
+    """获取默认缓存目录（Windows 为 LOCALAPPDATA，其他平台为 ~/.cache）"""
+    root = os.environ.get("LOCALAPPDATA") or str(Path.home() / ".cache")
+    return os.path.join(root, "IFCPropGetter", "cache")
+
+
+def default_workers():
+    """默认并行进程数：当前进程可用的 CPU 核心数"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
 def make_output_filename(base, ext):
     """生成带时间戳的输出文件名"""
     date_str = datetime.now().strftime(DATE_FORMAT)
@@ -43,16 +53,21 @@ def make_output_filename(base, ext):
     return f"{safe_base}_{date_str}.{ext.lstrip('.')}"
 
 
-def export_to_excel_with_format(df, filepath):
-    """将 DataFrame 导出为带样式的 Excel 文件"""
-    # 写入数据
-    df.to_excel(filepath, index=False, sheet_name='Sheet1')
+def open_styled_workbook(columns):
+    """
+    创建只写模式的工作簿：设置列宽与行高并写入带样式的标题行。
+    返回 (workbook, append_row)，append_row(values) 追加一行带样式的数据，全部写完后调用 workbook.save()。
+    """
+    # 延迟导入：界面启动时不必加载 openpyxl
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
 
-    # 加载工作簿处理样式
-    wb = load_workbook(filepath)
-    ws = wb['Sheet1']
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Sheet1')
 
-    # 预定义样式对象
+    # 预定义样式对象，所有单元格共享
     thin_side = Side(style='thin')
     full_border = Border(left=thin_side, right=thin_side, top=thin_side, bottom=thin_side)
     center_align = Alignment(horizontal='center', vertical='center', wrap_text=False)
@@ -60,43 +75,143 @@ def export_to_excel_with_format(df, filepath):
     content_font = Font(name='Times New Roman', size=11, bold=False)
     header_fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
 
-    max_row = ws.max_row
-    max_col = ws.max_column
-
-    # 批量应用样式
-    for row in ws.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col):
-        for cell in row:
-            cell.border = full_border
-            cell.alignment = center_align
-
-            if cell.row == 1:
-                cell.font = header_font
-                cell.fill = header_fill
-            else:
-                cell.font = content_font
-
-    # 设置列宽与行高
-    for col_idx, col_name in enumerate(df.columns, 1):
+    # 只写模式下列宽与行高必须在写入第一行之前设置
+    for col_idx, col_name in enumerate(columns, 1):
         col_letter = get_column_letter(col_idx)
         if col_name == "GlobalId":
             ws.column_dimensions[col_letter].width = 32
         else:
             ws.column_dimensions[col_letter].width = 24
-
     ws.row_dimensions[1].height = 32
+
+    header = []
+    for col_name in columns:
+        cell = WriteOnlyCell(ws, value=col_name)
+        cell.font = header_font
+        cell.fill = header_fill
+        cell.border = full_border
+        cell.alignment = center_align
+        header.append(cell)
+    ws.append(header)
+
+    body = []
+    for _ in columns:
+        cell = WriteOnlyCell(ws)
+        cell.font = content_font
+        cell.border = full_border
+        cell.alignment = center_align
+        body.append(cell)
+
+    def append_row(values):
+        # 只写模式在 append 时立即序列化单元格，因此每列可复用同一个已设置样式的单元格
+        for cell, value in zip(body, values):
+            cell.value = value
+        ws.append(body)
+
+    return wb, append_row
+
+
+def export_to_excel_with_format(df, filepath):
+    """将 DataFrame 一次写出为带样式的 Excel 文件"""
+    wb, append_row = open_styled_workbook(df.columns)
+    for row in df.itertuples(index=False, name=None):
+        append_row(row)
     wb.save(filepath)
 
 
+class PropertyPlan:
+    """
+    编译后的属性查找计划：每个任务只解析一次属性列表。
+    "属性集.属性名" 直接定位到列槽位；纯属性名通过反向表按属性集顺序取首个命中值。
+    type_properties 为假时不读取类型对象继承的属性集，只使用构件实例自身的属性集。
+    typed_values 为真时保留属性值的原生类型（整数、浮点数、布尔值），否则全部输出为字符串。
+    locations 为真时同时建立空间结构索引（spatial.SpatialIndex），用于输出或过滤所属楼层、建筑、场地。
+    """
+
+    def __init__(self, properties, type_properties=True, typed_values=False, locations=False):
+        self.columns = list(properties)
+        self.type_properties = type_properties
+        self.typed_values = typed_values
+        self.locations = locations
+        self.qualified = {}  # {属性集名: {属性名: [列序号]}}
+        self.bare = {}       # {属性名: [列序号]}
+        for idx, prop_name in enumerate(self.columns):
+            if '.' in prop_name:
+                pset_name, p_name = prop_name.split('.', 1)
+                self.qualified.setdefault(pset_name, {}).setdefault(p_name, []).append(idx)
+            else:
+                self.bare.setdefault(prop_name, []).append(idx)
+        self.names = set(self.bare)
+        for props in self.qualified.values():
+            self.names.update(props)
+
+    def wants(self, pset_name, prop_name):
+        """判断属性集中的某个属性是否需要解码"""
+        if prop_name in self.bare:
+            return True
+        props = self.qualified.get(pset_name)
+        return props is not None and prop_name in props
+
+    def resolve(self, psets):
+        """按计划解析单个构件的属性集字典，返回与 columns 对齐的原始值列表（缺失为 None）"""
+        values = [None] * len(self.columns)
+        seen = set()
+        for pset_name, props in psets.items():
+            slots = self.qualified.get(pset_name)
+            for p_name, value in props.items():
+                if slots is not None:
+                    for idx in slots.get(p_name, ()):
+                        values[idx] = value
+                if p_name in self.bare and p_name not in seen:
+                    seen.add(p_name)
+                    for idx in self.bare[p_name]:
+                        values[idx] = value
+        return values
+
+    def resolve_base(self, psets):
+        """
+        预先解析可被覆盖的基础属性集（类型对象的属性集），供 resolve_overlay 反复使用。
+        返回 (值列表, {属性集名: 顺序位置}, {纯属性名: 首个命中的属性集位置})。
+        """
+        positions = {pset_name: pos for pos, pset_name in enumerate(psets)}
+        first_hits = {}
+        for pos, props in enumerate(psets.values()):
+            for p_name in props:
+                if p_name in self.bare and p_name not in first_hits:
+                    first_hits[p_name] = pos
+        return self.resolve(psets), positions, first_hits
+
+    def resolve_overlay(self, base, overlay):
+        """
+        在 resolve_base 的结果上叠加实例属性集，结果与 resolve(合并后的属性集) 相同：
+        同名属性集沿用基础属性集的位置并覆盖其值，新属性集依次排在其后；纯属性名取合并顺序中的首个命中。
+        """
+        base_values, positions, first_hits = base
+        values = list(base_values)
+        hits = dict(first_hits)
+        appended = len(positions)
+        for pset_name, props in overlay.items():
+            pos = positions.get(pset_name)
+            if pos is None:
+                pos = appended
+                appended += 1
+            slots = self.qualified.get(pset_name)
+            for p_name, value in props.items():
+                if slots is not None:
+                    for idx in slots.get(p_name, ()):
+                        values[idx] = value
+                if p_name in self.bare and pos <= hits.get(p_name, pos):
+                    hits[p_name] = pos
+                    for idx in self.bare[p_name]:
+                        values[idx] = value
+        return values
+
+
+@lru_cache(maxsize=256)
+def _single_property_plan(prop_name):
+    return PropertyPlan([prop_name])
+
+
 def extract_property_from_psets(psets, prop_name):
     """从属性集字典中提取指定属性值"""
-    if '.' in prop_name:
-        pset_name, p_name = prop_name.split('.', 1)
-        props = psets.get(pset_name)
-        if props:
-            return safe_str(props.get(p_name))
-        return "N/A"
-    else:
-        for props in psets.values():
-            if prop_name in props:
-                return safe_str(props[prop_name])
-        return "N/A"
\ No newline at end of file
+    return safe_str(_single_property_plan(prop_name).resolve(psets)[0])
\ No newline at end of file
@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+
+"""流式写出模块：按批次将数据行写入输出文件，任务中断时保留带标记的部分结果"""
+
+import csv
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from ifc_prop_getter import profiler, rowstore, utils
+from ifc_prop_getter.constants import (COLUMNAR_BATCH_ROWS, DEFAULT_COMPRESSION, FORMAT_COMPRESSION_CHOICES,
+                                       SQLITE_TABLE, WRITE_BATCH_ROWS)
+
+# 未完成文件的文件名标记，例如 model_data_10-17.partial.csv
+PARTIAL_TAG = ".partial"
+
+
+def partial_path(filepath):
+    """返回写入过程中使用的未完成文件路径"""
+    root, ext = os.path.splitext(filepath)
+    return f"{root}{PARTIAL_TAG}{ext}"
+
+
+class TableWriter:
+    """
+    写出器基类：数据先写入带 .partial 标记的文件，close() 成功后改名为正式文件名；
+    abort() 时保留已写出的部分结果，文件名中的 .partial 即为未完成标记。
+    kinds 为每列的 rowstore.KIND_*（类型化模式），为 None 时所有列均为字符串、缺失值为 N/A。
+    """
+
+    def __init__(self, filepath, columns, kinds=None):
+        self.filepath = filepath
+        self.partial_path = partial_path(filepath)
+        self.columns = list(columns)
+        self.kinds = list(kinds) if kinds is not None else None
+        self.rows = 0
+
+    def write_rows(self, rows):
+        """写入一批数据行（每行为与 columns 对齐的列表）"""
+        raise NotImplementedError
+
+    def write_store(self, store):
+        """写入一个 rowstore.ColumnStore 中的全部行"""
+        with profiler.measure("写出数据行", rows=len(store)):
+            for rows in store.iter_batches(WRITE_BATCH_ROWS):
+                self.write_rows(rows)
+
+    def _finish(self):
+        """写出尚未落盘的内容并关闭文件"""
+        raise NotImplementedError
+
+    def close(self):
+        """完成写入并改名为正式文件，返回正式文件路径"""
+        with profiler.measure("保存输出文件"):
+            self._finish()
+        os.replace(self.partial_path, self.filepath)
+        return self.filepath
+
+    def abort(self, keep=True):
+        """中断写入；keep 为真且已有数据时保留未完成文件并返回其路径，否则删除并返回 None"""
+        try:
+            self._finish()
+        except Exception:
+            keep = False
+        if keep and self.rows:
+            return self.partial_path
+        try:
+            os.remove(self.partial_path)
+        except OSError:
+            pass
+        return None
+
+
+class CsvTableWriter(TableWriter):
+    """CSV 写出器：每批写入后立即刷新到磁盘，内存中不保留数据行；类型化模式下缺失值为空单元格"""
+
+    def __init__(self, filepath, columns, kinds=None):
+        super().__init__(filepath, columns, kinds)
+        self._fp = open(self.partial_path, 'w', newline='', encoding='utf-8-sig')
+        self._writer = csv.writer(self._fp, lineterminator=os.linesep)
+        self._writer.writerow(self.columns)
+
+    def write_rows(self, rows):
+        self._writer.writerows(rows)
+        self._fp.flush()
+        self.rows += len(rows)
+
+    def _finish(self):
+        if not self._fp.closed:
+            self._fp.close()
+
+
+class ExcelTableWriter(TableWriter):
+    """Excel 写出器：只写模式逐行写入带样式的单元格，保存时一次生成文件；数值写为数值单元格"""
+
+    def __init__(self, filepath, columns, kinds=None):
+        super().__init__(filepath, columns, kinds)
+        self._workbook, self._append_row = utils.open_styled_workbook(self.columns)
+        self._done = False
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._append_row(row)
+        self.rows += len(rows)
+
+    def _finish(self):
+        if self._done:
+            return
+        self._done = True
+        self._workbook.save(self.partial_path)
+
+
+def _require_pyarrow():
+    """导入 pyarrow；Parquet/Feather 输出依赖该库"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("输出 Parquet/Feather 需要安装 pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+
+class _ArrowTableWriter(TableWriter):
+    """
+    列式写出器基类：数据行累积到 COLUMNAR_BATCH_ROWS 行后转为一个记录批写出。
+    ColumnStore 的字典序号直接转为 Arrow 数组，不经过逐行的 Python 对象。
+    类型化模式下各列为 int64/float64/bool/string 类型，缺失值为 null。
+    """
+
+    def __init__(self, filepath, columns, compression, kinds=None):
+        super().__init__(filepath, columns, kinds)
+        self._pa = _require_pyarrow()
+        arrow_types = {rowstore.KIND_INT: self._pa.int64(), rowstore.KIND_FLOAT: self._pa.float64(),
+                       rowstore.KIND_BOOL: self._pa.bool_()}
+        self._schema = self._pa.schema([
+            (name, arrow_types.get(kind, self._pa.string()))
+            for name, kind in zip(self.columns, self.kinds or [rowstore.KIND_STRING] * len(self.columns))])
+        self._compression = None if compression == "none" else compression
+        self._buffer = rowstore.ColumnStore(self.columns, self.kinds)
+        self._sink = None
+
+    def write_rows(self, rows):
+        for row in rows:
+            self._buffer.append(row)
+        self.rows += len(rows)
+        if len(self._buffer) >= COLUMNAR_BATCH_ROWS:
+            self._flush()
+
+    def write_store(self, store):
+        with profiler.measure("写出数据行", rows=len(store)):
+            self._buffer.extend(store)
+            self.rows += len(store)
+            if len(self._buffer) >= COLUMNAR_BATCH_ROWS:
+                self._flush()
+
+    def _flush(self):
+        if not len(self._buffer):
+            return
+        pa = self._pa
+        arrays = []
+        for idx, field in enumerate(self._schema):
+            codes, mask, dictionary = self._buffer.column_parts(idx)
+            if self.kinds is None:
+                # 字典末尾追加缺失值，缺失行指向该位置
+                indices = pa.array(np.where(mask, codes, len(dictionary)), type=pa.int32())
+                arrays.append(pa.array(dictionary + [rowstore.MISSING], type=pa.string()).take(indices))
+            else:
+                # 缺失行的序号置为 null，take 后即为 null 值
+                indices = pa.array(codes, type=pa.int32(), mask=~mask)
+                arrays.append(pa.array(dictionary, type=field.type).take(indices))
+        self._buffer = rowstore.ColumnStore(self.columns, self.kinds)
+        self._sink.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    def _finish(self):
+        if self._sink is None:
+            return
+        try:
+            self._flush()
+        finally:
+            self._sink.close()
+            self._sink = None
+
+
+class ParquetTableWriter(_ArrowTableWriter):
+    """Parquet 写出器：每个记录批为一个行组，支持按列读取"""
+
+    def __init__(self, filepath, columns, compression=DEFAULT_COMPRESSION, kinds=None):
+        super().__init__(filepath, columns, compression, kinds)
+        import pyarrow.parquet as pq
+        self._sink = pq.ParquetWriter(self.partial_path, self._schema, compression=self._compression)
+
+
+class FeatherTableWriter(_ArrowTableWriter):
+    """Feather (Arrow IPC 文件) 写出器，仅支持 lz4、zstd 压缩或不压缩"""
+
+    def __init__(self, filepath, columns, compression=DEFAULT_COMPRESSION, kinds=None):
+        check_compression("Feather", compression)
+        super().__init__(filepath, columns, compression, kinds)
+        options = self._pa.ipc.IpcWriteOptions(compression=self._compression)
+        self._sink = self._pa.ipc.new_file(self.partial_path, self._schema, options=options)
+
+
+def check_compression(file_format, compression):
+    """压缩算法不适用于该输出格式时抛出 ValueError；非列式格式不检查"""
+    choices = FORMAT_COMPRESSION_CHOICES.get(file_format)
+    if choices is not None and compression not in choices:
+        raise ValueError(f"{file_format} 不支持 {compression} 压缩，可选 {'、'.join(choices)}")
+
+
+def _quote_identifier(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SqliteTableWriter(TableWriter):
+    """
+    SQLite 写出器：写入 properties 表，完成时在 GlobalId 列上建立索引。
+    类型化模式下数值列为 INTEGER/REAL，布尔列声明为 BOOLEAN（存为 0/1），缺失值为 NULL。
+    """
+
+    def __init__(self, filepath, columns, kinds=None):
+        super().__init__(filepath, columns, kinds)
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+        self._conn = sqlite3.connect(self.partial_path)
+        # 写入期间文件带 .partial 标记，无需回滚日志
+        self._conn.execute("PRAGMA journal_mode = OFF")
+        self._conn.execute("PRAGMA synchronous = OFF")
+        self._table = _quote_identifier(SQLITE_TABLE)
+        sql_types = {rowstore.KIND_INT: "INTEGER", rowstore.KIND_FLOAT: "REAL", rowstore.KIND_BOOL: "BOOLEAN"}
+        kinds = self.kinds or [rowstore.KIND_STRING] * len(self.columns)
+        self._conn.execute(f"CREATE TABLE {self._table} (" + ", ".join(
+            f"{_quote_identifier(name)} {sql_types.get(kind, 'TEXT')}" for name, kind in zip(self.columns, kinds))
+            + ")")
+        self._insert = f"INSERT INTO {self._table} VALUES ({', '.join('?' * len(self.columns))})"
+
+    def write_rows(self, rows):
+        self._conn.executemany(self._insert, rows)
+        self._conn.commit()
+        self.rows += len(rows)
+
+    def _finish(self):
+        if self._conn is None:
+            return
+        try:
+            if "GlobalId" in self.columns:
+                index = _quote_identifier(f"idx_{SQLITE_TABLE}_globalid")
+                self._conn.execute(f"CREATE INDEX {index} ON {self._table} ({_quote_identifier('GlobalId')})")
+            self._conn.commit()
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+def open_writer(filepath, file_format, columns, compression=DEFAULT_COMPRESSION, kinds=None):
+    """按输出格式创建写出器；compression 仅对 Parquet/Feather 生效，kinds 见 TableWriter"""
+    if file_format == "Excel":
+        return ExcelTableWriter(filepath, columns, kinds)
+    if file_format == "Parquet":
+        return ParquetTableWriter(filepath, columns, compression, kinds)
+    if file_format == "Feather":
+        return FeatherTableWriter(filepath, columns, compression, kinds)
+    if file_format == "SQLite":
+        return SqliteTableWriter(filepath, columns, kinds)
+    return CsvTableWriter(filepath, columns, kinds)
+
+
+def dataframe_kinds(df):
+    """由 DataFrame 的列类型推断 kinds；没有数值或布尔列时返回 None（字符串模式）"""
+    kinds = []
+    for dtype in df.dtypes:
+        if pd.api.types.is_bool_dtype(dtype):
+            kinds.append(rowstore.KIND_BOOL)
+        elif pd.api.types.is_integer_dtype(dtype):
+            kinds.append(rowstore.KIND_INT)
+        elif pd.api.types.is_float_dtype(dtype):
+            kinds.append(rowstore.KIND_FLOAT)
+        else:
+            kinds.append(rowstore.KIND_STRING)
+    return kinds if any(kind != rowstore.KIND_STRING for kind in kinds) else None
+
+
+def write_dataframe(df, filepath, file_format, compression=DEFAULT_COMPRESSION, progress=None):
+    """将已在内存中的 DataFrame 分批写出；每批写完后调用 progress(已写行数, 总行数)"""
+    kinds = dataframe_kinds(df)
+    writer = open_writer(filepath, file_format, df.columns, compression, kinds)
+    try:
+        for start in range(0, len(df), WRITE_BATCH_ROWS):
+            chunk = df.iloc[start:start + WRITE_BATCH_ROWS]
+            if kinds is not None:
+                # 可空数值列中的缺失值 (pd.NA) 转为 None
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+            with profiler.measure("写出数据行", rows=len(chunk)):
+                writer.write_rows(list(chunk.itertuples(index=False, name=None)))
+            if progress is not None:
+                progress(writer.rows, len(df))
+    except BaseException:
+        writer.abort(keep=False)
+        raise
+    return writer.close()
\ No newline at end of file
@@ -5,7 +5,11 @@
 程序启动脚本
 """
 
+import multiprocessing
+
 from ifc_prop_getter.main import main
 
 if __name__ == "__main__":
+    # 打包为可执行文件时，多进程子进程需要此调用
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
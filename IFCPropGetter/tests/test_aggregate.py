@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""汇总：count 与 count(字段)、非数值的跳过、类型化与字符串分组值、缺失分组的排序，并与 pandas groupby 对照"""
+
+import threading
+
+import pandas as pd
+import pytest
+
+from ifc_prop_getter import aggregate, extractor, rowstore, synthetic
+from ifc_prop_getter.messages import MessageChannel
+
+PROPERTIES = synthetic.default_properties(2, 6)
+
+MEASURES = "count, count(Prop4), sum(Prop2), sum(Prop1), min(Weight), max(Prop3), distinct(Prop1)"
+
+
+def _summarize(group_by, measures, rows, kinds=None):
+    """rows 为 (values, ifc_class) 列表，返回 (列名, 汇总表各行)"""
+    accumulator = aggregate.compile_aggregation(group_by, measures, ["A", "B"]).accumulator(kinds)
+    for i, (values, ifc_class) in enumerate(rows):
+        accumulator.add(values, ifc_class, f"G{i}", f"E{i}")
+    store = accumulator.to_store()
+    return store.columns, [row for batch in store.iter_batches(100) for row in batch]
+
+
+def test_count_and_count_field():
+    rows = [([1, None], "IfcBeam"), ([None, "x"], "IfcBeam"), ([None, None], "IfcBeam"), ([2, ""], "IfcColumn")]
+    columns, table = _summarize("Class", "count, count(A), count(B)", rows)
+    assert columns == ["Class", "构件数", "计数(A)", "计数(B)"]
+    # count 统计全部构件，count(字段) 只统计有值的构件（空字符串算有值）
+    assert table == [("IfcBeam", 3, 1, 1), ("IfcColumn", 1, 1, 1)]
+
+
+def test_non_numeric_values_skipped():
+    rows = [(["10", "abc"], "IfcBeam"), ([2.5, True], "IfcBeam"), (["x", None], "IfcBeam"),
+            ([-1, "PC-1"], "IfcBeam"), (["1e1", 3], "IfcBeam")]
+    _, table = _summarize("Class", "sum(A), min(A), max(A), sum(B), count(A), distinct(A)", rows)
+    # 文本与布尔值不参与 sum/min/max，但参与 count 与 distinct；全部非数值时结果为缺失
+    assert table == [("IfcBeam", 21.5, -1.0, 10.0, 3.0, 5, 5)]
+    _, table = _summarize("Class", "sum(B), min(B), max(B)", [(["1", "abc"], "IfcBeam")])
+    assert table == [("IfcBeam", None, None, None)]
+
+
+def test_string_and_typed_group_keys():
+    rows = [([10, None], "IfcBeam"), ([9, None], "IfcBeam"), ([None, None], "IfcBeam"), ([9.0, None], "IfcBeam")]
+    # 字符串模式：分组值为输出字符串，按文本排序，缺失为 N/A 且排在最后
+    _, table = _summarize("A", "count", rows)
+    assert table == [("10", 1), ("9", 1), ("9.0", 1), (rowstore.MISSING, 1)]
+    # 类型化模式：分组值按列类型转换，9 与 9.0 为同一组，按数值排序，缺失为 None 且排在最后
+    kinds = [rowstore.KIND_FLOAT, rowstore.KIND_STRING]
+    _, table = _summarize("A", "count", rows, kinds)
+    assert table == [(9.0, 2), (10.0, 1), (None, 1)]
+    accumulator = aggregate.compile_aggregation("A, Class", "count", ["A", "B"]).accumulator(kinds)
+    assert accumulator.kinds == [rowstore.KIND_FLOAT, rowstore.KIND_STRING, rowstore.KIND_INT]
+
+
+def test_sort_order_with_missing_groups():
+    rows = [(["b", 2], "IfcBeam"), ([None, 1], "IfcBeam"), (["a", None], "IfcBeam"), (["a", 1], "IfcBeam"),
+            ([None, None], "IfcBeam"), (["b", 10], "IfcBeam")]
+    _, table = _summarize("A, B", "count", rows, kinds=[rowstore.KIND_STRING, rowstore.KIND_INT])
+    assert [row[:2] for row in table] == [("a", 1), ("a", None), ("b", 2), ("b", 10), (None, 1), (None, None)]
+    # 数值在前、文本在后、缺失最后
+    assert sorted([("x",), (None,), (3,), (1.5,)], key=aggregate._sort_key) == [(1.5,), (3,), ("x",), (None,)]
+
+
+def test_invalid_specifications():
+    with pytest.raises(ValueError, match="字段不在提取列表中"):
+        aggregate.compile_aggregation("C", "count", ["A"])
+    with pytest.raises(ValueError, match="未知的汇总函数"):
+        aggregate.compile_aggregation("A", "avg(A)", ["A"])
+    with pytest.raises(ValueError, match="需要指定字段"):
+        aggregate.compile_aggregation("A", "sum", ["A"])
+    with pytest.raises(ValueError, match="重复的列"):
+        aggregate.compile_aggregation("A", "count(A), count(A)", ["A"])
+    assert aggregate.compile_aggregation("", "", ["A"]) is None
+
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "synthetic.ifc"
+    synthetic.generate_ifc(str(path), 200, types=3)
+    return str(path)
+
+
+def _pandas_summary(table, group_by):
+    """由完整提取结果用 pandas groupby 计算同样的汇总，返回 {分组值元组: 汇总值列表}，按分组排序"""
+    df = table.to_dataframe().astype(object)
+    df = df.where(df.notna() & (df != rowstore.MISSING), None)
+    work = df[group_by].assign(**{f"_{field}": pd.to_numeric(df[field], errors="coerce")
+                                  for field in ("Prop1", "Prop2", "Prop3", "Weight")},
+                               Prop1=df["Prop1"], Prop4=df["Prop4"])
+    grouped = work.groupby(group_by, dropna=False)
+    result = pd.DataFrame({
+        "构件数": grouped.size(),
+        "计数(Prop4)": grouped["Prop4"].count(),
+        "合计(Prop2)": grouped["_Prop2"].sum(min_count=1),
+        "合计(Prop1)": grouped["_Prop1"].sum(min_count=1),
+        "最小值(Weight)": grouped["_Weight"].min(),
+        "最大值(Prop3)": grouped["_Prop3"].max(),
+        "不同值数(Prop1)": grouped["Prop1"].nunique(),
+    }).sort_index(na_position="last")
+    index = [key if isinstance(key, tuple) else (key,) for key in result.index]
+    return {tuple(None if pd.isna(value) else value for value in key): [None if pd.isna(value) else value
+                                                                          for value in row]
+            for key, row in zip(index, result.values.tolist())}
+
+
+@pytest.mark.parametrize("typed_values", [False, True])
+@pytest.mark.parametrize("group_by", [["Storey", "TypeMark"], ["Prop4"]])
+def test_matches_pandas_groupby(model, typed_values, group_by):
+    def extract(**options):
+        return extractor.extract_table(model, PROPERTIES, True, False, MessageChannel(), threading.Event(),
+                                       engine="stream", workers=1, typed_values=typed_values, **options)
+
+    expected = _pandas_summary(extract(locations="Storey"), group_by)
+    summary = extract(group_by=", ".join(group_by), measures=MEASURES)
+    actual = {}
+    for batch in summary.iter_batches(1000):
+        for row in batch:
+            # 汇总表为类型化表，缺失的汇总值为 None；字符串模式下缺失的分组值为 N/A
+            row = [None if value == rowstore.MISSING else value for value in row]
+            actual[tuple(row[:len(group_by)])] = row[len(group_by):]
+
+    assert summary.columns == group_by + ["构件数", "计数(Prop4)", "合计(Prop2)", "合计(Prop1)", "最小值(Weight)",
+                                          "最大值(Prop3)", "不同值数(Prop1)"]
+    assert list(actual) == list(expected)  # 分组及其顺序相同
+    for key, values in expected.items():
+        assert actual[key] == pytest.approx(values), key
+    assert len(expected) > 3 and any(None in key for key in expected)  # 包含缺失分组
\ No newline at end of file
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""命令行批处理：同名文件的输出不互相覆盖，单个文件的任务异常不影响汇总，压缩算法按输出格式检查"""
+
+import csv
+import glob
+import shutil
+
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pytest
+
+from ifc_prop_getter import cli, synthetic
+from ifc_prop_getter.constants import OUTPUT_FORMATS
+
+
+def _model(path):
+    """生成合成模型，返回其属性列表文件的路径"""
+    path.parent.mkdir(exist_ok=True)
+    synthetic.generate_ifc(str(path), 20, types=2)
+    properties = path.parent / "properties.txt"
+    properties.write_text("\n".join(synthetic.default_properties(2, 6)), encoding="utf-8")
+    return str(properties)
+
+
+def _read_summary(path):
+    with open(path, encoding="utf-8-sig") as fp:
+        return list(csv.DictReader(fp))
+
+
+def test_output_stems_disambiguates_duplicates():
+    files = ["A/model.ifc", "B/model.IFC", "C/other.ifc", "D/A/Model.ifc", "A_model.ifc"]
+    stems = cli.output_stems(files)
+    assert stems["C/other.ifc"] == "other"
+    assert stems["A_model.ifc"] == "A_model"
+    assert stems["B/model.IFC"] == "B_model"
+    # 前缀后与 A_model.ifc、A/model.ifc 仍重名时加序号
+    assert {stems["A/model.ifc"], stems["D/A/Model.ifc"]} == {"A_model_2", "A_Model_3"}
+    assert len({stem.lower() for stem in stems.values()}) == len(files)
+
+
+def test_same_name_files_in_different_folders(tmp_path):
+    model = tmp_path / "A" / "model.ifc"
+    properties = _model(model)
+    (tmp_path / "B").mkdir()
+    shutil.copy(model, tmp_path / "B" / "model.ifc")
+    output_dir = tmp_path / "out"
+    summary = tmp_path / "summary.csv"
+    code = cli.main([str(tmp_path / "*" / "model.ifc"), "-p", properties, "-o", str(output_dir), "-j", "1", "--engine", "stream",
+                     "--summary", str(summary)])
+    assert code == 0
+    outputs = sorted(path.split("/")[-1].split("_data_")[0] for path in glob.glob(str(output_dir / "*.csv")))
+    assert outputs == ["A_model", "B_model"]
+    assert [row["status"] for row in _read_summary(summary)] == ["ok", "ok"]
+
+
+def test_failed_job_is_recorded(tmp_path, monkeypatch):
+    good = tmp_path / "good.ifc"
+    properties = _model(good)
+    bad = tmp_path / "bad.ifc"
+    shutil.copy(good, bad)
+    run_job = cli.run_job
+
+    def flaky_job(ifc_path, options, stem=None):
+        if ifc_path.endswith("bad.ifc"):
+            raise MemoryError("worker died")
+        return run_job(ifc_path, options, stem)
+
+    monkeypatch.setattr(cli, "run_job", flaky_job)
+    summary = tmp_path / "summary.csv"
+    code = cli.main([str(good), str(bad), "-p", properties, "-o", str(tmp_path / "out"), "-j", "1", "--engine", "stream",
+                     "--summary", str(summary)])
+    assert code == 1
+    rows = {row["file"]: row for row in _read_summary(summary)}
+    assert rows[str(good)]["status"] == "ok"
+    assert rows[str(bad)]["status"] == "error"
+    assert "worker died" in rows[str(bad)]["message"]
+
+
+@pytest.mark.parametrize("compression", ["snappy", "gzip"])
+def test_feather_rejects_unsupported_compression(tmp_path, capsys, compression):
+    properties = _model(tmp_path / "model.ifc")
+    code = cli.main([str(tmp_path / "model.ifc"), "-p", properties, "-o", str(tmp_path / "out"), "-f", "Feather",
+                     "--compression", compression])
+    assert code == 2
+    assert f"Feather 不支持 {compression} 压缩" in capsys.readouterr().err
+    assert not glob.glob(str(tmp_path / "out" / "*"))
+
+
+@pytest.mark.parametrize("file_format, compression, codec", [
+    ("Parquet", "none", "UNCOMPRESSED"), ("Parquet", "gzip", "GZIP"), ("Parquet", "snappy", "SNAPPY"),
+    ("Feather", "lz4", None), ("Feather", "none", None), ("CSV", "gzip", None)])
+def test_compression_choices(tmp_path, file_format, compression, codec):
+    properties = _model(tmp_path / "model.ifc")
+    output_dir = tmp_path / "out"
+    code = cli.main([str(tmp_path / "model.ifc"), "-p", properties, "-o", str(output_dir), "-f", file_format,
+                     "--compression", compression, "-j", "1", "--engine", "stream"])
+    assert code == 0
+    [path] = glob.glob(str(output_dir / f"*_data_*.{OUTPUT_FORMATS[file_format]}"))
+    if file_format == "Parquet":
+        assert pq.ParquetFile(path).metadata.row_group(0).column(0).compression == codec
+    elif file_format == "Feather":
+        assert len(feather.read_table(path)) == 20
\ No newline at end of file
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""流式引擎与 ifcopenshell 引擎的一致性：同一合成模型两种引擎写出的 CSV 应完全相同"""
+
+import glob
+import threading
+
+import ifcopenshell
+import ifcopenshell.guid
+import pytest
+
+from ifc_prop_getter import extractor, parallel, synthetic
+from ifc_prop_getter.messages import MessageChannel
+
+PROPERTIES = synthetic.default_properties(3, 6) + [synthetic.LIST_PROP]
+
+
+def _extract(ifc_path, output_dir, properties, **options):
+    """提取为 CSV，返回 (文件内容, 日志与错误消息)"""
+    output_dir.mkdir()
+    channel = MessageChannel()
+    extractor.extract_properties(ifc_path, properties, True, True, str(output_dir), "out", "CSV", channel,
+                                 threading.Event(), **options)
+    messages = [msg['message'] for msg in channel.drain() if msg['type'] in ('log', 'error')]
+    files = glob.glob(str(output_dir / "*.csv"))
+    assert len(files) == 1, messages
+    with open(files[0], encoding="utf-8-sig") as fp:
+        return fp.read(), messages
+
+
+@pytest.fixture(scope="module", params=[1, 5], ids=["one-statement-per-line", "five-statements-per-line"])
+def model(request, tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "synthetic.ifc"
+    synthetic.generate_ifc(str(path), 200, types=10, list_values=True, bounded_values=True,
+                           statements_per_line=request.param)
+    return str(path)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("typed_values", [False, True])
+def test_stream_matches_ifcopenshell(model, tmp_path, monkeypatch, workers, typed_values):
+    # 缩小分片下限，使小模型也按字节区间分片扫描，覆盖跨分片边界的语句
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_SHARD_BYTES", 4096)
+    options = dict(typed_values=typed_values, locations="Storey")
+    expected, _ = _extract(model, tmp_path / "ifcopenshell", PROPERTIES, engine="ifcopenshell", **options)
+    actual, messages = _extract(model, tmp_path / "stream", PROPERTIES, engine="stream", workers=workers, **options)
+    assert actual == expected, messages
+    assert len(expected.splitlines()) == 201
+    assert "[" in expected  # 列表值属性已输出
+
+
+def test_unsupported_property_falls_back(model, tmp_path):
+    properties = PROPERTIES + [synthetic.BOUNDED_PROP]
+    expected, _ = _extract(model, tmp_path / "ifcopenshell", properties, engine="ifcopenshell")
+    actual, messages = _extract(model, tmp_path / "stream", properties, engine="stream")
+    assert actual == expected
+    assert any("改用完整加载引擎" in message for message in messages)
+
+
+@pytest.fixture(scope="module")
+def predefined_model(tmp_path_factory):
+    """门窗模型：类型与实例上的预定义属性集（门窗衬板、门面板），以及普通属性集"""
+    path = tmp_path_factory.mktemp("predefined") / "doors.ifc"
+    f = ifcopenshell.file(schema="IFC4")
+
+    def create(ifc_class, *args, **kwargs):
+        return f.create_entity(ifc_class, ifcopenshell.guid.new(), None, *args, **kwargs)
+
+    aspect = f.create_entity("IfcShapeAspect", ShapeRepresentations=(), Name="Lining", ProductDefinitional=True)
+    lining = create("IfcDoorLiningProperties", "Pset_DoorLining", LiningDepth=120.0, LiningThickness=40.5,
+                    ShapeAspectStyle=aspect)
+    panel = create("IfcDoorPanelProperties", "Pset_DoorPanel", PanelDepth=45.0, PanelOperation="SWINGING",
+                   PanelWidth=0.5, PanelPosition="LEFT")
+    common = create("IfcPropertySet", "Pset_DoorCommon", HasProperties=[
+        f.create_entity("IfcPropertySingleValue", "FireRating", None, f.create_entity("IfcLabel", "EI30"))])
+    door_type = create("IfcDoorType", "DT1", HasPropertySets=[lining, panel, common], PredefinedType="DOOR",
+                       OperationType="SINGLE_SWING_LEFT", ParameterTakesPrecedence=False)
+    doors = [create("IfcDoor", f"D{i}") for i in range(3)]
+    create("IfcRelDefinesByType", None, None, doors[:2], door_type)
+    # 实例上的同名预定义属性集覆盖类型值
+    create("IfcRelDefinesByProperties", None, None, doors[1:],
+           create("IfcDoorLiningProperties", "Pset_DoorLining", LiningDepth=150.0))
+    window = create("IfcWindow", "W1")
+    create("IfcRelDefinesByProperties", None, None, [window],
+           create("IfcWindowLiningProperties", "Pset_WindowLining", LiningDepth=80.0, LiningToPanelOffsetY=3.5))
+    f.write(str(path))
+    return str(path)
+
+
+PREDEFINED_PROPERTIES = ["LiningDepth", "Pset_DoorLining.LiningThickness", "PanelOperation", "PanelWidth",
+                         "Pset_WindowLining.LiningToPanelOffsetY", "FireRating"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("typed_values", [False, True])
+def test_predefined_property_sets(predefined_model, tmp_path, monkeypatch, workers, typed_values):
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_SHARD_BYTES", 512)
+    expected, _ = _extract(predefined_model, tmp_path / "ifcopenshell", PREDEFINED_PROPERTIES,
+                           engine="ifcopenshell", typed_values=typed_values)
+    actual, messages = _extract(predefined_model, tmp_path / "stream", PREDEFINED_PROPERTIES, engine="stream",
+                                workers=workers, typed_values=typed_values)
+    assert actual == expected, messages
+    assert not any("改用完整加载引擎" in message for message in messages)
+    rows = [line.split(",")[1:] for line in expected.splitlines()[1:]]
+    assert rows[0][1:5] == ["120.0", "40.5", "SWINGING", "0.5"]
+    assert [row[1] for row in rows] == ["120.0", "150.0", "150.0", "80.0"]
+
+
+def test_predefined_entity_attribute_falls_back(predefined_model, tmp_path):
+    # 引用其他实体的属性（ShapeAspectStyle）流式引擎不解析，改用完整加载引擎
+    properties = PREDEFINED_PROPERTIES + ["ShapeAspectStyle"]
+    expected, _ = _extract(predefined_model, tmp_path / "ifcopenshell", properties, engine="ifcopenshell")
+    actual, messages = _extract(predefined_model, tmp_path / "stream", properties, engine="stream")
+    assert actual == expected
+    assert any("ShapeAspectStyle" in message and "改用完整加载引擎" in message for message in messages)
\ No newline at end of file
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+"""联合提取：并行提取各成员模型时取消，子进程中的提取随之结束，不在后台继续运行"""
+
+import multiprocessing
+import threading
+import time
+
+from ifc_prop_getter import federation, synthetic
+from ifc_prop_getter.messages import MessageChannel
+
+
+def test_cancel_stops_member_processes(tmp_path):
+    paths = [str(tmp_path / f"member{i}.ifc") for i in range(2)]
+    for path in paths:
+        synthetic.generate_ifc(path, 6000, types=5)
+    channel = MessageChannel()
+    stop_event = threading.Event()
+    worker = threading.Thread(target=federation.extract_federated, args=(
+        paths, synthetic.default_properties(3, 6), True, False, str(tmp_path), "merged", "CSV", channel, stop_event),
+        kwargs=dict(engine="stream", workers=2))
+    worker.start()
+    time.sleep(0.5)
+    stop_event.set()
+    worker.join(60)
+    assert not worker.is_alive()
+    assert multiprocessing.active_children() == []
+    messages = [msg['message'] for msg in channel.drain() if msg['type'] in ('log', 'error')]
+    assert "任务已被用户取消" in messages, messages
\ No newline at end of file
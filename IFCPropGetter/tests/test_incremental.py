@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+"""增量提取：沿用上一版缓存结果、只重新提取变化构件的输出，应与完整提取后对比的结果完全相同"""
+
+import glob
+import re
+import threading
+
+import pytest
+
+from ifc_prop_getter import cache, extractor, stream_scanner, synthetic
+from ifc_prop_getter.messages import MessageChannel
+
+PROPERTIES = synthetic.default_properties(3, 6)
+
+
+def _extract(ifc_path, output_dir, **options):
+    """提取为 CSV，返回 ({文件名前缀: 文件内容}, 日志与错误消息)"""
+    output_dir.mkdir()
+    channel = MessageChannel()
+    extractor.extract_properties(ifc_path, PROPERTIES, True, True, str(output_dir), "out", "CSV", channel,
+                                 threading.Event(), engine="stream", workers=1, **options)
+    messages = [msg['message'] for msg in channel.drain() if msg['type'] in ('log', 'error')]
+    outputs = {}
+    for path in glob.glob(str(output_dir / "*.csv")):
+        with open(path, encoding="utf-8-sig") as fp:
+            outputs["changes" if "_changes_" in path else "data"] = fp.read()
+    assert "data" in outputs, messages
+    return outputs, messages
+
+
+def _revise(text):
+    """上一版的文本修改：改属性值（含值类型）、改构件名称、改 GlobalId（删除并新增）、改类型属性"""
+    text = text.replace("IFCLABEL('M201')", "IFCLABEL('M201-rev')", 1)
+    text = text.replace("IFCINTEGER(54)", "IFCREAL(54.5)", 1)
+    text = re.sub(r"(IFCCOLUMN\('[^']+',\$,)'E1'", r"\1'E1-rev'", text, count=1)
+    text = re.sub(r"(=IFCBEAM\(')[^']+'(,\$,'E5')", r"\g<1>0000000000000000000001'\2", text, count=1)
+    return text.replace("IFCLABEL('T0')", "IFCLABEL('T0-rev')", 1)
+
+
+@pytest.fixture(scope="module")
+def revisions(tmp_path_factory):
+    root = tmp_path_factory.mktemp("revisions")
+    old_path = root / "v1.ifc"
+    synthetic.generate_ifc(str(old_path), 60, types=3)
+    new_path = root / "v2.ifc"
+    new_path.write_text(_revise(old_path.read_text(encoding="utf-8")), encoding="utf-8")
+    return str(old_path), str(new_path)
+
+
+@pytest.mark.parametrize("typed_values", [False, True])
+@pytest.mark.parametrize("previous_kind", ["export", "ifc"])
+def test_incremental_matches_full(revisions, tmp_path, typed_values, previous_kind):
+    old_path, new_path = revisions
+    cache_dir = str(tmp_path / "cache")
+    options = dict(typed_values=typed_values, locations="Storey", change_report=True)
+    first, _ = _extract(old_path, tmp_path / "v1", cache=cache.ExtractionCache(cache_dir),
+                        typed_values=typed_values, locations="Storey")
+    if previous_kind == "export":
+        previous = glob.glob(str(tmp_path / "v1" / "*.csv"))[0]
+    else:
+        previous = old_path
+
+    expected, _ = _extract(new_path, tmp_path / "full", previous_export=previous, **options)
+    actual, messages = _extract(new_path, tmp_path / "incremental", previous_export=previous,
+                                cache=cache.ExtractionCache(cache_dir), **options)
+    assert actual == expected, messages
+    assert any(message.startswith("增量提取:") for message in messages), messages
+    assert any("沿用上一版结果" in message for message in messages), messages
+    assert expected["changes"].count("\n") > 4  # 修改、删除与新增均已报告
+
+
+
+def test_fallback_closes_previous_entry(revisions, tmp_path, monkeypatch):
+    old_path, new_path = revisions
+    cache_dir = str(tmp_path / "cache")
+    _extract(old_path, tmp_path / "v1", cache=cache.ExtractionCache(cache_dir))
+    expected, _ = _extract(new_path, tmp_path / "full", previous_export=old_path)
+
+    opened = []
+    table_entry = cache.TableEntry
+
+    class TrackedEntry(table_entry):
+        def __init__(self, path):
+            super().__init__(path)
+            opened.append(self)
+
+    def failing_extract(task, previous, cache_entry=None):
+        raise stream_scanner.UnsupportedPropertyError("unsupported")
+
+    monkeypatch.setattr(cache, "TableEntry", TrackedEntry)
+    monkeypatch.setattr(extractor, "_incremental_extract", failing_extract)
+    actual, messages = _extract(new_path, tmp_path / "fallback", previous_export=old_path,
+                                cache=cache.ExtractionCache(cache_dir))
+    assert actual == {"data": expected["data"]}, messages
+    assert any("增量提取失败" in message for message in messages), messages
+    assert opened and all(entry._fp.closed for entry in opened)
\ No newline at end of file
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+"""完整加载引擎的并行建立索引：主线程中分片并行，工作线程中退回单进程，两者结果与单进程一致"""
+
+import queue
+import threading
+
+import ifcopenshell
+import pytest
+
+from ifc_prop_getter import indexer, parallel, synthetic, utils
+
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "synthetic.ifc"
+    synthetic.generate_ifc(str(path), 200, types=5)
+    return ifcopenshell.open(str(path))
+
+
+def _build(model, messages):
+    plan = utils.PropertyPlan(synthetic.default_properties(3, 6), True, False, False)
+    index = parallel.build_index(model, plan, 2, messages, threading.Event())
+    expected = indexer.build_property_index(model, plan, threading.Event())
+    assert index.occurrences == expected.occurrences
+    assert index.type_psets == expected.type_psets
+    return [msg['message'] for msg in messages.queue]
+
+
+def test_build_index_in_main_thread(model, monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_SHARD_RELATIONS", 10)
+    if threading.active_count() > 1:
+        pytest.skip("测试进程中有其他线程")
+    messages = _build(model, queue.Queue())
+    assert any(message.startswith("并行建立索引") for message in messages), messages
+
+
+def test_build_index_off_main_thread_is_single_process(model, monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_MIN_SHARD_RELATIONS", 10)
+    messages = queue.Queue()
+    errors = []
+
+    def run():
+        try:
+            _build(model, messages)
+        except BaseException as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=run)
+    worker.start()
+    worker.join()
+    assert not errors, errors
+    assert any("使用单进程建立索引" in msg['message'] for msg in messages.queue)
\ No newline at end of file
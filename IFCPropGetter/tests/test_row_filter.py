@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""行过滤：运算符优先级、缺失值、数值与文本比较、集合，以及对未知字段与注入内容的拒绝"""
+
+import pytest
+
+from ifc_prop_getter.row_filter import compile_filter
+
+PROPERTIES = ["Height", "Mark", "Grade", "Cast unit top elevation"]
+
+
+def _test(expression, values, ifc_class="IfcColumn", global_id="0001", name="C1", properties=PROPERTIES):
+    return compile_filter(expression, properties).test(values, ifc_class, global_id, name)
+
+
+@pytest.mark.parametrize("expression, expected", [
+    # and 优先于 or：a or (b and c)
+    ("Height > 100 or Mark = 'X' and Grade = 'C30'", True),
+    ("(Height > 100 or Mark = 'X') and Grade = 'C30'", False),
+    # not 只作用于紧随其后的条件
+    ("not Height > 100 and Grade = 'C40'", False),
+    ("not Height > 500 and Grade = 'C30'", False),
+    ("not (Height > 500 and Grade = 'C30')", True),
+    ("not not Height > 100", True),
+    ("NOT Mark = 'X' OR Grade = 'C30'", True),
+])
+def test_precedence(expression, expected):
+    assert _test(expression, [200, "M1", "C40", None]) is expected
+
+
+def test_is_missing():
+    values = [None, "", 0, None]
+    assert _test("Height is missing", values)
+    assert not _test("Height is not missing", values)
+    assert _test("Mark is not missing and Grade is not missing", values)  # 空字符串与 0 不算缺失
+    # 缺失值不满足任何比较，包括 !=
+    assert not _test("Height = 1", values)
+    assert not _test("Height != 1", values)
+    assert not _test("Height contains ''", values)
+    assert _test("not Height != 1", values)
+
+
+@pytest.mark.parametrize("expression, value, expected", [
+    ("Height > 9", "10", True),        # 字符串属性值与数字常量：按数值比较
+    ("Height > '9'", "10", False),     # 两侧均为字符串：按文本比较
+    ("Height > '9'", 10, True),        # 数值属性值与可转为数字的字符串：按数值比较
+    ("Height = 12000", "12000.0", True),
+    ("Height = '12000'", "12000.0", False),
+    ("Height < 1e3", 999.5, True),
+    ("Height >= -1.5", "-1.5", True),
+    ("Height > 5", "abc", True),       # 无法转为数字时按文本比较: 'abc' > '5.0'
+    ("Height < 5", "abc", False),
+    ("Height = 'abc'", "abc", True),
+    ("Height = true", True, True),
+    ("Height = true", "T", True),
+    ("Height = 1", True, False),       # 布尔值不按数值比较
+])
+def test_numeric_and_text_comparison(expression, value, expected):
+    assert _test(expression, [value, None, None, None]) is expected
+
+
+def test_text_operators():
+    values = [None, "PC-101", None, 12500]
+    assert _test("Mark startswith 'PC-'", values)
+    assert _test("Mark endswith \"01\"", values)
+    assert _test("Mark contains 'C-1'", values)
+    assert _test("Mark matches '^PC-\\d+$'", values)
+    assert not _test("Mark matches '^\\d'", values)
+    assert _test("Mark matches '^PC-\\\\d{3}$'", values)  # 双反斜杠同样可用
+    assert _test("[Cast unit top elevation] contains 125", values)
+    assert _test("[Cast unit top elevation] > 12000 and Class = 'IfcColumn'", values)
+
+
+def test_in_list():
+    assert _test("Mark in ('A', 'M1', 'B')", [None, "M1", None, None])
+    assert not _test("Mark in ('A', 'B')", [None, "M1", None, None])
+    assert _test("Height in (1, 2.5, 3)", [None, None, None, None]) is False
+    assert _test("Height in (1, 2.5, 3)", ["2.50", None, None, None])
+    assert _test("Height in ('x', 3)", [3, None, None, None])
+    assert _test("Class in ('IfcBeam', 'IfcColumn')", [None] * 4)
+    assert _test("not Class in ('IfcBeam')", [None] * 4)
+
+
+def test_special_fields_and_keywords_are_case_insensitive():
+    a = compile_filter("Name = 'C1' and GlobalId startswith '00'", PROPERTIES)
+    b = compile_filter("Name  =  'C1'  AND  GlobalId STARTSWITH '00'", PROPERTIES)
+    assert a.cache_spec() == b.cache_spec()
+    assert a.test([None] * 4, "IfcColumn", "0001", "C1")
+    assert a.fields == ("Name", "GlobalId")
+    assert compile_filter("  ", PROPERTIES) is None
+
+
+@pytest.mark.parametrize("expression", [
+    "Weight > 1",                      # 不在提取列表中
+    "[Unknown property] = 'x'",
+    "name = 'C1'",                     # 内置字段区分大小写
+    "Height > Weight",
+])
+def test_unknown_fields_rejected(expression):
+    with pytest.raises(ValueError, match="属性不在提取列表中"):
+        compile_filter(expression, PROPERTIES)
+
+
+@pytest.mark.parametrize("expression", [
+    "__import__('os').system('echo x') = 1",
+    "Height > 1 or __builtins__",
+    "Height > 1; import os",
+    "Height > 1 and (lambda: 1)",
+    "Height.__class__ = 1",
+    "Height > 1)",
+    "(Height > 1",
+    "Height > 1 Mark = 'x'",
+    "Height >",
+    "Height",
+    "Height matches '('",
+    "Mark contains true",
+    "Height in ()",
+    "Height is None",
+    "Height > `1`",
+])
+def test_invalid_or_injected_expressions_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_filter(expression, PROPERTIES)
+
+
+def test_literals_and_property_names_are_not_code():
+    # 字符串常量与方括号中的属性名按原样处理，不会作为 Python 源码执行
+    payload = "') or True or ('"
+    row_filter = compile_filter(f"Mark = \"{payload}\"", PROPERTIES)
+    assert not row_filter.test([None, "M1", None, None], "IfcColumn", "0001", "C1")
+    assert row_filter.test([None, payload, None, None], "IfcColumn", "0001", "C1")
+
+    escaped = compile_filter(r"Mark = 'a\'b\\'", PROPERTIES)
+    assert escaped.test([None, "a'b\\", None, None], "IfcColumn", "0001", "C1")
+
+    odd_name = "x) or (True"
+    row_filter = compile_filter(f"[{odd_name}] = 1", [odd_name])
+    assert not row_filter.test([2], "IfcColumn", "0001", "C1")
+    assert row_filter.test(["1"], "IfcColumn", "0001", "C1")
\ No newline at end of file
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""列式存储：extend 在未按字节对齐的行数处拼接有效位图，以及各列类型的 to_dataframe 还原"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from ifc_prop_getter import rowstore
+
+KINDS = [rowstore.KIND_STRING, rowstore.KIND_INT, rowstore.KIND_FLOAT, rowstore.KIND_BOOL]
+COLUMNS = ["Text", "Int", "Float", "Bool"]
+
+
+def _rows(count, seed):
+    """随机行：约三分之一缺失，取值集合较小以便字典中出现重复值"""
+    rnd = random.Random(seed)
+    makers = [lambda: f"V{rnd.randint(0, 5)}", lambda: rnd.randint(-3, 3), lambda: rnd.randint(0, 4) / 2,
+              lambda: rnd.random() < 0.5]
+    return [tuple(None if rnd.random() < 0.35 else make() for make in makers) for _ in range(count)]
+
+
+def _store(rows, kinds):
+    store = rowstore.ColumnStore(COLUMNS, kinds)
+    for row in rows:
+        store.append(row)
+    return store
+
+
+def _read(store):
+    missing = store.missing
+    return [tuple(None if value is missing else value for value in row) for batch in store.iter_batches(5)
+            for row in batch]
+
+
+@pytest.mark.parametrize("kinds", [None, KINDS])
+@pytest.mark.parametrize("head", [0, 1, 3, 7, 8, 9, 13, 16])
+@pytest.mark.parametrize("tail", [0, 1, 6, 8, 11, 17])
+def test_extend_round_trip(kinds, head, tail):
+    first, second = _rows(head, seed=head), _rows(tail, seed=100 + tail)
+    store = _store(first, kinds)
+    store.extend(_store(second, kinds))
+    expected = _store(first + second, kinds)
+
+    assert len(store) == head + tail
+    assert _read(store) == first + second
+    # 拼接后的位图与逐行追加的完全相同（含末字节中未使用的高位为 0）
+    assert [bytes(col.valid) for col in store._data] == [bytes(col.valid) for col in expected._data]
+    pd.testing.assert_frame_equal(store.to_dataframe(), expected.to_dataframe())
+
+
+def test_extend_repeatedly_at_odd_offsets():
+    rows = _rows(100, seed=7)
+    store = _store([], KINDS)
+    start = 0
+    for size in (3, 5, 0, 1, 9, 2, 13, 7, 60):
+        store.extend(_store(rows[start:start + size], KINDS))
+        start += size
+        assert _read(store) == rows[:start]
+    # 按未对齐的区间读取
+    for lo, hi in ((1, 9), (7, 8), (13, 42), (99, 100)):
+        codes, mask, dictionary = store.column_parts(0, lo, hi)
+        assert [dictionary[code] if valid else None for code, valid in zip(codes, mask)] == \
+            [row[0] for row in rows[lo:hi]]
+
+
+def test_extend_remaps_dictionaries():
+    store = _store([("b", 2, None, True), ("a", None, 1.5, None)], KINDS)
+    other = _store([("a", 1, 1.5, False), (None, 2, 0.5, True), ("c", None, None, None)], KINDS)
+    assert other._data[0].dictionary == ["a", "c"]
+    store.extend(other)
+    assert store._data[0].dictionary == ["b", "a", "c"]
+    assert _read(store) == [("b", 2, None, True), ("a", None, 1.5, None), ("a", 1, 1.5, False),
+                            (None, 2, 0.5, True), ("c", None, None, None)]
+
+
+def test_to_dataframe_string_mode():
+    df = _store([("a", 1, 1.5, True), (None, None, None, None)], None).to_dataframe()
+    assert df.columns.tolist() == COLUMNS
+    assert df.astype(object).values.tolist() == [["a", 1, 1.5, True], ["N/A", "N/A", "N/A", "N/A"]]
+
+
+def test_to_dataframe_typed_kinds():
+    rows = _rows(21, seed=3) + [(None, None, None, None)]
+    df = _store(rows, KINDS).to_dataframe()
+    assert [str(dtype) for dtype in df.dtypes.tolist()[1:]] == ["Int64", "Float64", "boolean"]
+    for name, column in zip(COLUMNS, zip(*rows)):
+        values = df[name].astype(object).tolist()
+        assert [None if pd.isna(value) else value for value in values] == list(column), name
+    assert df.iloc[-1].isna().all()
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_to_dataframe_all_missing_and_empty(kind):
+    store = rowstore.ColumnStore(["X"], [kind])
+    assert len(store.to_dataframe()) == 0
+    for _ in range(11):
+        store.append([None])
+    df = store.to_dataframe()
+    assert len(df) == 11 and df["X"].isna().all()
+
+
+def test_infer_kind_and_converter():
+    assert rowstore.infer_kind([]) == rowstore.KIND_STRING
+    assert rowstore.infer_kind([bool]) == rowstore.KIND_BOOL
+    assert rowstore.infer_kind([int]) == rowstore.KIND_INT
+    assert rowstore.infer_kind([int, float]) == rowstore.KIND_FLOAT
+    assert rowstore.infer_kind([int, bool]) == rowstore.KIND_STRING
+    assert rowstore.infer_kind([float, str]) == rowstore.KIND_STRING
+    assert rowstore.converter(rowstore.KIND_FLOAT)(3) == 3.0
+    assert rowstore.converter(rowstore.KIND_STRING)(3) == "3"
\ No newline at end of file
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+"""提取服务：/extract 的默认列与命令行、图形界面一致，内存结果与 extractor.extract_table 相同"""
+
+import threading
+
+import pytest
+
+from ifc_prop_getter import extractor, service, synthetic
+from ifc_prop_getter.messages import MessageChannel
+
+PROPERTIES = synthetic.default_properties(2, 6)
+
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory):
+    path = tmp_path_factory.mktemp("model") / "synthetic.ifc"
+    synthetic.generate_ifc(str(path), 40, types=2)
+    return str(path)
+
+
+@pytest.mark.parametrize("engine", ["ifcopenshell", "stream"])
+def test_extract_defaults_match_extract_table(model, engine):
+    response = service.handle_extract(service.ModelStore(), {
+        "ifc_path": model, "properties": PROPERTIES, "engine": engine, "workers": 1})
+    assert response["ok"], response
+    assert response["columns"] == ["GlobalId"] + PROPERTIES  # 与 extract_properties 一样默认不含 Name 列
+
+    table = extractor.extract_table(model, PROPERTIES, True, False, MessageChannel(), threading.Event(),
+                                    engine=engine, workers=1)
+    df = table.to_dataframe()
+    assert response["rows"] == df.astype(object).where(df.notna(), None).values.tolist()
+
+
+def test_extract_aggregate(model):
+    response = service.handle_extract(service.ModelStore(), {
+        "ifc_path": model, "properties": PROPERTIES, "engine": "stream", "workers": 1, "group_by": "Class"})
+    assert response["ok"], response
+    assert response["columns"][0] == "Class"
+    assert sum(row[response["columns"].index("构件数")] for row in response["rows"]) > 0
+
+
+def test_extract_rejects_unsupported_compression(model, tmp_path):
+    with pytest.raises(ValueError, match="Feather 不支持 gzip 压缩"):
+        service.handle_extract(service.ModelStore(), {
+            "ifc_path": model, "properties": PROPERTIES, "output_dir": str(tmp_path), "file_format": "Feather",
+            "compression": "gzip"})
\ No newline at end of file